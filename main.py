@@ -9,46 +9,68 @@
 # by pubins.taylor
 # v1.0 - 2 JUN 2022
 
-import matplotlib.pyplot as plt
-import pandas as pd
+from __future__ import annotations
 
-import sources.Export.report_util as report_util
-from sources.Export.report_generator_example import generate_report
-from sources.Model.TRPLeagueManager import TRPLeagueManager as LeagueManager
+import argparse
+import sys
+import typing
 
-# instantiate the global objects
-lm = LeagueManager()
-hitters = lm.hitters
-pitchers = lm.pitchers
+import sources.Export.trace_util as trace_util
 
+if typing.TYPE_CHECKING:
+    import pandas as pd
 
-def TRPFilterPosGroup(pos: str) -> (str, pd.DataFrame):
+    from sources.Model.TRPLeagueConfig import TRPLeagueConfig
+    from sources.Model.TRPLeagueManager import TRPLeagueManager
+
+# Importing main.py is side-effect free: pandas, matplotlib and the report modules are imported by the functions that
+# need them and the global league is only built the first time it is accessed.  The stages run inside trace_util
+# spans, which cost nothing unless tracing is switched on (--trace/--profile).
+_lm: typing.Optional["TRPLeagueManager"] = None
+leagueOptions = {}  # keyword arguments for the TRPLeagueManager built by TRPLeague()
+
+
+def TRPLeague() -> "TRPLeagueManager":
+    """
+    :return: the global TRPLeagueManager, built with leagueOptions on first access
+    """
+    global _lm
+    if _lm is None:
+        from sources.Model.TRPLeagueManager import TRPLeagueManager
+        with trace_util.span("load cards", **leagueOptions):
+            _lm = TRPLeagueManager(**leagueOptions)
+    return _lm
+
+
+def __getattr__(name: str):
+    # keeps main.lm, main.hitters and main.pitchers working for callers while still deferring the load
+    if name == "lm":
+        return TRPLeague()
+    if name in ("hitters", "pitchers"):
+        return getattr(TRPLeague(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def TRPFilterPosGroup(pos: str, config: typing.Optional["TRPLeagueConfig"] = None) -> (str, pd.DataFrame):
     """
     Function that filters the Position Group
 
     :parameter pos: a string representation of the roster slot
+    :parameter config: league shape that decides how many players are kept, defaults to the 12 team TRPLeagueConfig
     :returns: tuple with the pos: str and the posGroup DataFrame
     """
-    if pos.__contains__("P"):
-        posPlayers = pitchers[pitchers["pos"].str.contains(pos)]
-        # the dataset is sorted on xERA so the top skill is already at the top of the list
-        if pos == "SP":
-            topPlayers = posPlayers.head(
-                12 * 5 + 26)  # 12 (num of teams) * 5 (potential SP slots) + 16 (arbitrary overage buffer)
-        else:
-            topPlayers = posPlayers.head(
-                12 * 4 + 26)  # 12 (num of teams) * 4 (potential RP slots) + 16 (arbitrary overage buffer)
-    else:
-        posPlayers = hitters[hitters["pos"].str.contains(pos)]
-        # trim the excess number of players for analysis
-        # the dataset is sorted on wRAA so the top skill is already at the top of the list
-        if pos == "OF":
-            topPlayers = posPlayers.head(60)  # 3x more OF than any other position so get 3x results
-        else:
-            topPlayers = posPlayers.head(20)
+    from sources.Model.TRPLeagueConfig import TRPLeagueConfig
+
+    config = config or TRPLeagueConfig()
+    lm = TRPLeague()
+    with trace_util.span("filter", pos=pos):
+        # trim the excess number of players for analysis: teams * slots + buffer for pitchers, a fixed cutoff for
+        # hitters; the best by wRAA (hitters) and xERA (pitchers) are selected, whatever order the Cards are stored in
+        topPlayers = lm.top(pos, k=config.pool_size(pos))
 
     # print(f"POS: {pos}")
-    topPlayers.to_string(f"sources/Export/txt/{pos}.txt")
+    with trace_util.span("export txt", pos=pos):
+        topPlayers.to_string(f"sources/Export/txt/{pos}.txt")
     return pos, topPlayers
 
 
@@ -61,57 +83,489 @@ def TRPScatterPlotBuilder(pos: str, data: pd.DataFrame):
     :param data: pd.DataFrame for the POS group
     :return: none
     """
-    xCat: str
-    yCat: str
-    sCat: str  # size category
-    if pos.__contains__("P"):
-        xCat = "WHIP"
-        yCat = "ERA"
-        sCat = "xERA"
-    else:
-        xCat = "OBP"
-        yCat = "SLG"
-        sCat = "wRAA"
+    import matplotlib.pyplot as plt
 
-    # extract the data
-    x = data[xCat].to_numpy()
-    y = data[yCat].to_numpy()
-    # size and color based on wRAA:
-    sizes = data[sCat].apply(lambda r: r * 10)
-    colors = data[sCat].apply(lambda r: r * 10)
+    from sources.Export.plot_util import draw_position_scatter
 
     # plot
-    plt.style.use('fivethirtyeight')
-    fig, ax = plt.subplots()
-
-    ax.scatter(x, y, s=sizes, c=colors, vmin=0, vmax=100, alpha=0.5)
-    # We only want to place the scatter plot labels only for those players that are Free Agents
-    for name in data["_name"]:
-        if data.fantasyTeam[data["_name"] == name].values[0] == "FA":  # 1st index value holds the string rep
-            plt.text(x=data[xCat][data["_name"] == name], y=data[yCat][data["_name"] == name], s=name)
-    ax.set_xlabel(xCat)
-    ax.set_ylabel(yCat)
-    ax.set_title(f'POS: {pos}')
-    plt.axvline(data[xCat].mean(), c='black', ls='-')
-    plt.axhline(data[yCat].mean(), c='black', ls='-')
-    plt.tight_layout()
-    plt.savefig(f"sources/Export/TRPReport/{pos}.png")
+    with trace_util.span("scatter draw", pos=pos):
+        plt.style.use('fivethirtyeight')
+        fig, ax = plt.subplots()
+
+        draw_position_scatter(ax, pos, data)
+    with trace_util.span("scatter layout", pos=pos):
+        plt.tight_layout()
+    with trace_util.span("scatter savefig", pos=pos):
+        plt.savefig(f"sources/Export/TRPReport/{pos}.png")
     plt.show()
 
 
-if __name__ == '__main__':
-    hitterData: (str, pd.DataFrame) = tuple()  # the only DataFrame that will be passed to the report generator
-    for player in lm.bats:
-        posGroup, dfPos = TRPFilterPosGroup(pos=player)
-        TRPScatterPlotBuilder(pos=posGroup, data=dfPos)
-        if posGroup == "1B":  # chooses the POS group to create a report from
-            hitterData = (posGroup, dfPos)
+def TRPRenderCharts(groups: list, workers: int = None) -> list:
+    """
+    Batch mode for the scatter plots: renders every POS group headless over a process pool.  Each worker only receives
+    the column arrays its chart needs and writes the same sources/Export/TRPReport/{pos}.png as TRPScatterPlotBuilder.
+
+    :param groups: list of (pos, pd.DataFrame) tuples from TRPFilterPosGroup
+    :param workers: number of worker processes, defaults to the number of cores
+    :return: list of the written file paths
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    from sources.Export.plot_util import render_scatter_png, scatter_columns, use_headless_backend
+
+    positions = [pos for pos, _ in groups]
+    columns = [scatter_columns(pos, data) for pos, data in groups]
+    paths = [f"sources/Export/TRPReport/{pos}.png" for pos in positions]
+    # the workers are not traced, the span covers the whole batch
+    with trace_util.span("render batch", charts=len(groups)), \
+            ProcessPoolExecutor(max_workers=workers, initializer=use_headless_backend) as pool:
+        return list(pool.map(render_scatter_png, positions, columns, paths))
+
+
+def TRPSelectedSlots(positions: typing.Optional[list]) -> list:
+    """
+    :param positions: roster slots picked on the command line, None for every slot
+    :return: the slots to process in lm.bats + lm.arms order
+    """
+    from sources.Model.TRPLeagueManager import TRPLeagueManager
+
+    slots = TRPLeagueManager.bats + TRPLeagueManager.arms
+    if not positions:
+        return slots
+    unknown = sorted(set(positions) - set(slots))
+    if unknown:
+        raise SystemExit(f"unknown roster slot(s): {', '.join(unknown)}")
+    return [slot for slot in slots if slot in positions]
+
+
+def TRPFilterCommand(args: argparse.Namespace) -> list:
+    """
+    filter: writes the sources/Export/txt/{pos}.txt export of every selected POS group
+
+    :return: list of (pos, pd.DataFrame) tuples
+    """
+    return [TRPFilterPosGroup(pos=slot) for slot in TRPSelectedSlots(args.pos)]
+
+
+def TRPRenderCommand(args: argparse.Namespace, groups: typing.Optional[list] = None):
+    """
+    render: draws the scatter plot of every selected POS group, one at a time on screen or headless with --batch
+    """
+    if groups is None:
+        groups = TRPFilterCommand(args)
+    if args.batch:
+        import matplotlib
+        matplotlib.use("Agg")
+        TRPRenderCharts(groups, workers=args.workers)
+    else:
+        for posGroup, dfPos in groups:
+            TRPScatterPlotBuilder(pos=posGroup, data=dfPos)
+
+
+def TRPReportCommand(args: argparse.Namespace, groups: typing.Optional[list] = None):
+    """
+    report: builds sources/Export/TRPReport/TRP_Positional_Report.html for the --report-pos group
+    """
+    import sources.Export.report_util as report_util
+    from sources.Export.report_generator_example import generate_report
 
-    for player in lm.arms:
-        posGroup, dfPos = TRPFilterPosGroup(pos=player)
-        TRPScatterPlotBuilder(pos=posGroup, data=dfPos)
+    if groups is None or args.report_pos not in [pos for pos, _ in groups]:
+        groups = [TRPFilterPosGroup(pos=args.report_pos)]
+    # the only DataFrame that will be passed to the report generator
+    hitterData: (str, pd.DataFrame) = next(group for group in groups if group[0] == args.report_pos)
 
-    report = generate_report(pos=hitterData[0], dataset=hitterData[1])
+    with trace_util.span("generate report", pos=hitterData[0]):
+        report = generate_report(pos=hitterData[0], dataset=hitterData[1])
 
-    html_generator = report_util.HTMLReportContext("sources/Export/TRPReport/")
+    html_generator = report_util.HTMLReportContext("sources/Export/TRPReport/", table_data=args.table_data)
     html_generator.generate(report, "TRP_Positional_Report")
+    print(html_generator.figure_cache_summary())
+
+
+def TRPLeagueReportCommand(args: argparse.Namespace):
+    """
+    league-report: builds sources/Export/TRPReport/TRP_League_Report.html with one section per selected POS group,
+    the sections written concurrently by --workers processes
+    """
+    import os
+
+    import sources.Export.report_util as report_util
+    from sources.Export.report_generator_example import generate_league_report
+
+    groups = TRPFilterCommand(args)
+    with trace_util.span("generate report", pos="all"):
+        report = generate_league_report(groups)
+
+    html_generator = report_util.HTMLReportContext("sources/Export/TRPReport/", table_data=args.table_data)
+    html_generator.generate(report, "TRP_League_Report", workers=args.workers or os.cpu_count())
+    print(html_generator.figure_cache_summary())
+
+
+def TRPServeCommand(args: argparse.Namespace):
+    """
+    serve: serves the report of every POS group on localhost, rendered on request from the Cards in memory
+    """
+    import asyncio
+
+    from sources.Export.report_server import ReportServer
+
+    try:
+        asyncio.run(ReportServer(TRPLeague(), host=args.host, port=args.port).serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+def TRPStatsCommand(args: argparse.Namespace):
+    """
+    stats: prints the size of every Cards frame and POS group
+    """
+    lm = TRPLeague()
+    for frame, size in lm.memory_usage().items():
+        print(f"{frame:<9} {len(getattr(lm, frame)):>7} players {size / 1024:>10.1f} KiB")
+    for slot in TRPSelectedSlots(args.pos):
+        print(f"{slot:<9} {len(lm.eligibility[slot]):>7} eligible")
+
+
+def TRPRunAll(args: argparse.Namespace):
+    """
+    default when no subcommand is given: filter, render and report every POS group like the original script
+    """
+    args.pos = None
+    groups = TRPFilterCommand(args)
+    TRPRenderCommand(args, groups)
+    TRPReportCommand(args, groups)
+
+
+def TRPCardsStamp() -> tuple:
+    """
+    :return: (size, mtime) of every Cards file, None for a missing one
+    """
+    import os
+
+    from sources.Model.TRPLeagueManager import TRPLeagueManager
+
+    stamps = []
+    for path in TRPLeagueManager.cardsPaths.values():
+        try:
+            stat = os.stat(path)
+            stamps.append((stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            stamps.append(None)
+    return tuple(stamps)
+
+
+def TRPRebuild(args: argparse.Namespace, groups: dict, slots: list) -> list:
+    """
+    Re-filters the given slots and redraws the text export, chart and (for --report-pos) report of every POS group
+    whose players actually changed
+
+    :param groups: dict of pos to the pd.DataFrame last built for it, updated in place
+    :param slots: roster slots that may have changed
+    :return: list of the rebuilt slots
+    """
+    from sources.Export.plot_util import render_scatter_png, scatter_columns
+    from sources.Model.TRPCardDiff import TRPCardDiff
+
+    rebuilt = []
+    for slot in slots:
+        pos, data = TRPFilterPosGroup(pos=slot)
+        if pos in groups and TRPCardDiff.same_cards(groups[pos], data):
+            continue  # the changed players sit outside the analysed top of the group
+        groups[pos] = data
+        with trace_util.span("render chart", pos=pos):
+            render_scatter_png(pos, scatter_columns(pos, data), f"sources/Export/TRPReport/{pos}.png")
+        rebuilt.append(pos)
+    if args.report_pos in rebuilt:
+        TRPReportCommand(args, list(groups.items()))
+    return rebuilt
+
+
+def TRPWatchCommand(args: argparse.Namespace):
+    """
+    watch: builds every POS group once, then polls resources/ and rebuilds only the groups whose players changed.  The
+    new Cards are diffed against the previous load by ESPN ID (TRPCardDiff).
+    """
+    import time
+
+    from sources.Export.plot_util import use_headless_backend
+    from sources.Model.TRPCardDiff import TRPCardDiff
+    from sources.Model.TRPLeagueManager import TRPLeagueManager
+
+    global _lm
+    use_headless_backend()
+    args.pos = None
+    groups = {}
+    stamp = TRPCardsStamp()
+    TRPRebuild(args, groups, TRPSelectedSlots(None))
+    print(f"watching {', '.join(TRPLeagueManager.cardsPaths.values())} (ctrl-c to stop)")
+    try:
+        while True:
+            time.sleep(args.interval)
+            current = TRPCardsStamp()
+            if current == stamp or None in current:
+                continue
+            time.sleep(args.settle)  # let the writer finish before reading
+            if TRPCardsStamp() != current:
+                continue  # still being written, picked up on the next poll
+            stamp = current
+            start = time.perf_counter()
+            try:
+                with trace_util.span("reload cards"):
+                    league = TRPLeagueManager(**leagueOptions)
+            except ValueError as error:
+                print(f"skipped unreadable Cards: {error}")
+                continue
+            diff = TRPCardDiff(TRPLeague(), league)
+            _lm = league
+            rebuilt = TRPRebuild(args, groups, diff.affected_slots)
+            print(f"{diff} rebuilt {', '.join(rebuilt) or 'nothing'} in {time.perf_counter() - start:.3f}s")
+    except KeyboardInterrupt:
+        pass
+
+
+def TRPSnapshotCommand(args: argparse.Namespace):
+    """
+    snapshot: appends the current Cards to the snapshot history under resources/snapshots
+    """
+    from sources.Model.TRPSnapshotStore import TRPSnapshotStore
+
+    store = TRPSnapshotStore()
+    try:
+        date = store.ingest(args.date)
+    except ValueError as error:  # the date is already in the history, a malformed date or repeated IDs
+        raise SystemExit(f"snapshot: {error.args[0]}")
+    print(f"snapshot {date} stored, {len(store.dates())} in the history")
+
+
+def TRPRisersCommand(args: argparse.Namespace):
+    """
+    risers: prints the players whose field rose the most over the last --days snapshots
+    """
+    import pandas as pd
+
+    from sources.Model.TRPLeagueManager import TRPLeagueManager
+    from sources.Model.TRPSnapshotStore import TRPSnapshotStore
+
+    kind = "pitchers" if args.pos in TRPLeagueManager.arms else "hitters"
+    fantasyTeam = None if args.fantasy_team == "any" else args.fantasy_team
+    try:
+        risers = TRPSnapshotStore().risers(kind, args.field, days=args.days, pos=args.pos, fantasy_team=fantasyTeam,
+                                           top=args.top)
+    except LookupError as error:  # too short a history or an unknown field
+        raise SystemExit(f"risers: {error.args[0]}")
+    with pd.option_context("display.width", 120, "display.max_columns", None):
+        print(risers)
+
+
+def TRPComparablesCommand(args: argparse.Namespace):
+    """
+    comparables: prints the free agents whose stat profile is closest to the named player's
+    """
+    import numpy as np
+    import pandas as pd
+
+    from sources.Model.TRPComparables import TRPComparables
+
+    lm = TRPLeague()
+    for kind in ("hitters", "pitchers"):
+        rows = np.flatnonzero(getattr(lm, kind)["_name"].to_numpy() == args.player)
+        if len(rows):
+            break
+    else:
+        raise SystemExit(f"no Card for {args.player!r}")
+    comparables = TRPComparables(lm).comparables(kind, int(rows[0]), k=args.k, pos=args.pos)
+    with pd.option_context("display.width", 120, "display.max_columns", None):
+        print(comparables)
+
+
+def TRPSimulateCommand(args: argparse.Namespace):
+    """
+    simulate: writes the rest-of-season percentiles of every player to sources/Export/TRP_<kind>_Simulation.csv
+    """
+    from sources.Model.TRPSimulator import TRPSimulator
+
+    lm = TRPLeague()
+    simulator = TRPSimulator(lm, trials=args.trials, seed=args.seed)
+    for kind in ("hitters", "pitchers"):
+        with trace_util.span("simulate", kind=kind, trials=args.trials):
+            simulation = simulator.simulate(kind, workers=args.workers)
+        simulation.insert(0, "_name", getattr(lm, kind)["_name"])
+        path = f"sources/Export/TRP_{kind.capitalize()}_Simulation.csv"
+        simulation.to_csv(path, index=False, float_format="%.3f")
+        print(f"{len(simulation)} {kind} x {args.trials} trials -> {path}")
+
+
+def TRPStandingsCommand(args: argparse.Namespace):
+    """
+    standings: prints the projected category standings and head-to-head matrix, or with --team the free agents that
+    improve that team's matchups the most
+    """
+    import pandas as pd
+
+    from sources.Model.TRPStandings import TRPStandings
+
+    standings = TRPStandings(TRPLeague())
+    if args.team is not None and args.team not in standings.teams:
+        raise SystemExit(f"unknown fantasy team {args.team!r}, the teams are: {', '.join(standings.teams)}")
+    with pd.option_context("display.width", 120, "display.max_columns", None):
+        if args.team is None:
+            print(standings.standings())
+            print(standings.matchups())
+        else:
+            for kind in ("hitters", "pitchers"):
+                print(standings.matchup_changes(args.team, kind).head(args.top))
+
+
+def TRPIngestCommand(args: argparse.Namespace):
+    """
+    ingest: builds the Cards from the ESPN universe, Fangraphs projection and Savant expected stats exports and writes
+    them as the Cards JSON together with its columnar Cards cache
+    """
+    from sources.Model.TRPIngest import TRPIngest
+
+    fangraphs = {"hitters": args.fangraphs_hitters, "pitchers": args.fangraphs_pitchers}
+    savant = {"hitters": args.savant_hitters, "pitchers": args.savant_pitchers}
+    ingest = TRPIngest(args.universe,
+                       {kind: path or TRPIngest.sourcePaths["fangraphs"][kind] for kind, path in fangraphs.items()},
+                       {kind: path or TRPIngest.sourcePaths["savant"][kind] for kind, path in savant.items()},
+                       chunk_size=args.chunk_size)
+    with trace_util.span("ingest"):
+        cards = ingest.run()
+    with trace_util.span("write"):
+        written = ingest.write(cards)
+    print(ingest.summary(cards))
+    for path in written:
+        print(f"wrote {path}")
+
+
+def TRPArgumentParser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="TRP Positional Analyzer")
+    parser.add_argument("--low-memory", action="store_true",
+                        help="stream the Cards and keep them with compact dtypes")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="parse the Cards JSON instead of loading the columnar cache")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="time every stage and write a Chrome trace (chrome://tracing, ui.perfetto.dev) to FILE")
+    parser.add_argument("--profile", metavar="STAGE",
+                        help="run the STAGE span (e.g. 'filter', 'write table') under cProfile")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="add tracemalloc byte counts to the trace and summary, tracing even without --trace "
+                             "(slower)")
+    parser.set_defaults(handler=TRPRunAll, batch=False, workers=None, report_pos="1B", table_data="html")
+    commands = parser.add_subparsers(title="subcommands")
+
+    slotsHelp = "roster slot(s) to process (default: every slot in lm.bats and lm.arms)"
+    batchHelp = "render every chart headless over a process pool instead of showing them one at a time"
+    workersHelp = "number of worker processes for --batch (default: number of cores)"
+
+    filterCommand = commands.add_parser("filter", help="export the POS group text files")
+    filterCommand.add_argument("--pos", nargs="+", help=slotsHelp)
+    filterCommand.set_defaults(handler=TRPFilterCommand)
+
+    renderCommand = commands.add_parser("render", help="render the POS group scatter plots")
+    renderCommand.add_argument("--pos", nargs="+", help=slotsHelp)
+    renderCommand.add_argument("--batch", action="store_true", help=batchHelp)
+    renderCommand.add_argument("--workers", type=int, default=None, help=workersHelp)
+    renderCommand.set_defaults(handler=TRPRenderCommand)
+
+    reportCommand = commands.add_parser("report", help="build the HTML report")
+    reportCommand.add_argument("--report-pos", default="1B", help="POS group the report is built from (default: 1B)")
+    reportCommand.add_argument("--table-data", choices=["html", "json"], default="html",
+                               help="write table rows into the page or into JSON data files DataTables loads lazily")
+    reportCommand.set_defaults(handler=TRPReportCommand)
+
+    leagueReportCommand = commands.add_parser("league-report", help="build the HTML report of every POS group")
+    leagueReportCommand.add_argument("--pos", nargs="+", help=slotsHelp)
+    leagueReportCommand.add_argument("--table-data", choices=["html", "json"], default="html",
+                                     help="write table rows into the page or into JSON data files DataTables loads "
+                                          "lazily")
+    leagueReportCommand.add_argument("--workers", type=int, default=None,
+                                     help="number of processes writing sections (default: number of cores)")
+    leagueReportCommand.set_defaults(handler=TRPLeagueReportCommand)
+
+    serveCommand = commands.add_parser("serve", help="serve the report on localhost, rendered on request")
+    serveCommand.add_argument("--host", default="127.0.0.1", help="interface to listen on (default: 127.0.0.1)")
+    serveCommand.add_argument("--port", type=int, default=8000, help="port to listen on (default: 8000)")
+    serveCommand.set_defaults(handler=TRPServeCommand)
+
+    statsCommand = commands.add_parser("stats", help="print Cards and POS group sizes")
+    statsCommand.add_argument("--pos", nargs="+", help=slotsHelp)
+    statsCommand.set_defaults(handler=TRPStatsCommand)
+
+    allCommand = commands.add_parser("all", help="filter, render and report every POS group (the default)")
+    allCommand.add_argument("--batch", action="store_true", help=batchHelp)
+    allCommand.add_argument("--workers", type=int, default=None, help=workersHelp)
+    allCommand.add_argument("--report-pos", default="1B", help="POS group the report is built from (default: 1B)")
+    allCommand.set_defaults(handler=TRPRunAll)
+
+    watchCommand = commands.add_parser("watch", help="rebuild only the changed POS groups whenever the Cards change")
+    watchCommand.add_argument("--report-pos", default="1B", help="POS group the report is built from (default: 1B)")
+    watchCommand.add_argument("--table-data", choices=["html", "json"], default="html",
+                              help="write table rows into the page or into JSON data files DataTables loads lazily")
+    watchCommand.add_argument("--interval", type=float, default=0.5, help="seconds between polls of resources/")
+    watchCommand.add_argument("--settle", type=float, default=0.1,
+                              help="seconds a changed Cards file must stay unchanged before it is read")
+    watchCommand.set_defaults(handler=TRPWatchCommand)
+
+    snapshotCommand = commands.add_parser("snapshot", help="append the current Cards to the snapshot history")
+    snapshotCommand.add_argument("--date", help="ISO date of the snapshot (default: today)")
+    snapshotCommand.set_defaults(handler=TRPSnapshotCommand)
+
+    risersCommand = commands.add_parser("risers", help="biggest risers of a field over the snapshot history")
+    risersCommand.add_argument("field", help="numeric Card field, e.g. xwOBA or wRAA")
+    risersCommand.add_argument("--pos", help="roster slot the players must be eligible for (default: any hitter)")
+    risersCommand.add_argument("--days", type=int, default=7, help="length of the window in days (default: 7)")
+    risersCommand.add_argument("--fantasy-team", default="FA", help="fantasyTeam to keep, 'any' for all (default: FA)")
+    risersCommand.add_argument("--top", type=int, default=10)
+    risersCommand.set_defaults(handler=TRPRisersCommand)
+
+    comparablesCommand = commands.add_parser("comparables", help="free agents with the closest stat profile")
+    comparablesCommand.add_argument("player", help="_name of the player, e.g. 'Juan Soto'")
+    comparablesCommand.add_argument("--pos", help="roster slot the comparables must fit (default: any of the player's)")
+    comparablesCommand.add_argument("-k", type=int, default=5, help="number of comparables (default: 5)")
+    comparablesCommand.set_defaults(handler=TRPComparablesCommand)
+
+    simulateCommand = commands.add_parser("simulate", help="Monte Carlo rest-of-season percentiles of every player")
+    simulateCommand.add_argument("--trials", type=int, default=100_000, help="simulated seasons (default: 100000)")
+    simulateCommand.add_argument("--seed", type=int, default=0, help="random seed (default: 0)")
+    simulateCommand.add_argument("--workers", type=int, default=1, help="worker processes (default: 1)")
+    simulateCommand.set_defaults(handler=TRPSimulateCommand)
+
+    standingsCommand = commands.add_parser("standings", help="projected fantasy team standings and matchups")
+    standingsCommand.add_argument("--team", help="fantasyTeam to score every free agent for")
+    standingsCommand.add_argument("--top", type=int, default=10)
+    standingsCommand.set_defaults(handler=TRPStandingsCommand)
+
+    ingestCommand = commands.add_parser("ingest", help="build the Cards from the ESPN, Fangraphs and Savant exports")
+    ingestCommand.add_argument("--universe", help="ESPN player universe export (.html or .csv)")
+    ingestCommand.add_argument("--fangraphs-hitters", help="Fangraphs hitter projections CSV")
+    ingestCommand.add_argument("--fangraphs-pitchers", help="Fangraphs pitcher projections CSV")
+    ingestCommand.add_argument("--savant-hitters", help="Savant batter expected stats CSV")
+    ingestCommand.add_argument("--savant-pitchers", help="Savant pitcher expected stats CSV")
+    ingestCommand.add_argument("--chunk-size", type=int, default=50_000, help="source rows parsed at a time")
+    ingestCommand.set_defaults(handler=TRPIngestCommand)
+    return parser
+
+
+def TRPTracing(args: argparse.Namespace) -> typing.Optional[trace_util.Tracer]:
+    """
+    Switches tracing on for --trace/--profile/--trace-memory, falling back to the TRP_TRACE/TRP_PROFILE/
+    TRP_TRACE_MEMORY environment variables
+
+    :return: the active Tracer, None when tracing stays off
+    """
+    if args.trace or args.profile or args.trace_memory:
+        return trace_util.enable(args.trace, args.profile, args.trace_memory)
+    return trace_util.enable_from_environment()
+
+
+if __name__ == '__main__':
+    arguments = TRPArgumentParser().parse_args()
+    leagueOptions.update(use_cache=not arguments.no_cache, low_memory=arguments.low_memory)
+    tracer = TRPTracing(arguments)
+    arguments.handler(arguments)
+    if tracer is not None:
+        print(tracer.summary(), file=sys.stderr)
+        print(tracer.profile_summary(), end="", file=sys.stderr)
+        for path in tracer.finish():
+            print(f"wrote {path}", file=sys.stderr)
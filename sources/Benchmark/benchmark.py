@@ -0,0 +1,236 @@
+# benchmark times every stage of the TRP pipeline on synthetic Cards of growing size and keeps the results as JSON so
+# two runs can be compared for regressions.
+#   python -m sources.Benchmark.benchmark run --sizes 100 1000 10000 --output bench.json
+#   python -m sources.Benchmark.benchmark compare baseline.json bench.json --threshold 0.25
+# Every size runs in its own process inside a scratch folder laid out like the repository (resources/ and
+# sources/Export/...), so the pipeline's relative paths resolve there and peak memory is not inherited between sizes.
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+repositoryPath = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+defaultSizes = [10 ** 2, 10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6]
+
+
+def _peak_rss() -> int:
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _timed(results: dict, stage: str, repeat: int, run, reset=None):
+    """
+    Runs a stage repeat times and records its best wall time and the process peak RSS once it finished.  reset (not
+    timed) puts back whatever the previous run left behind, e.g. a cache or rendered figures.
+    """
+    best = float("inf")
+    value = None
+    before = _peak_rss()
+    for _ in range(repeat):
+        if reset is not None:
+            reset()
+        start = time.perf_counter()
+        value = run()
+        best = min(best, time.perf_counter() - start)
+    peak = _peak_rss()
+    results[stage] = {"seconds": best, "peak_rss_bytes": peak, "peak_rss_growth_bytes": peak - before}
+    return value
+
+
+def run_size(size: int, work_path: str, repeat: int = 1, seed: int = 0) -> dict:
+    """
+    Generates size synthetic players into work_path and times every pipeline stage on them.  Changes the working
+    directory to work_path, so it is meant to run in a process of its own (see run_benchmarks).
+
+    :param size: number of players over the Hitter and Pitcher Cards
+    :param work_path: scratch folder, created when missing
+    :param repeat: runs per stage, the fastest one is kept
+    :param seed: seed of the card generator
+    :return: dict with the Cards sizes and per stage the seconds and peak RSS
+    """
+    from sources.Benchmark.card_generator import generate_league
+
+    for folder in ("resources", "sources/Export/txt", "sources/Export/TRPReport"):
+        os.makedirs(os.path.join(work_path, folder), exist_ok=True)
+    start = time.perf_counter()
+    cards = generate_league(os.path.join(work_path, "resources"), size, seed=seed,
+                            template_path=os.path.join(repositoryPath, "resources"))
+    generateSeconds = time.perf_counter() - start
+    shutil.copy(os.path.join(repositoryPath, "sources/Export/logo.png"), os.path.join(work_path, "sources/Export"))
+    os.chdir(work_path)
+
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    import main
+    import sources.Export.report_util as report_util
+    from sources.Export.report_generator_example import generate_report
+    from sources.Model.TRPCardCache import TRPCardCache
+    from sources.Model.TRPLeagueManager import TRPLeagueManager
+    from sources.Model.TRPValuationEngine import TRPValuationEngine
+
+    def clear_caches():
+        for name in cards:
+            TRPCardCache("resources/{}.json".format(name)).clear()
+
+    results = {}
+    # the JSON parse goes first so its peak is not hidden behind the other loaders
+    lm = _timed(results, "load_json", repeat, lambda: TRPLeagueManager(use_cache=False))
+    _timed(results, "load_cache_build", repeat, lambda: TRPLeagueManager(use_cache=True), reset=clear_caches)
+    lm = _timed(results, "load_cached", repeat, lambda: TRPLeagueManager(use_cache=True))
+    _timed(results, "load_low_memory", repeat, lambda: TRPLeagueManager(use_cache=False, low_memory=True))
+
+    main._lm = lm
+    slots = lm.bats + lm.arms
+    groups = _timed(results, "filter", repeat, lambda: [main.TRPFilterPosGroup(pos=slot) for slot in slots])
+    _timed(results, "value", repeat, lambda: TRPValuationEngine(lm))
+
+    def scatter():
+        for pos, data in groups:
+            main.TRPScatterPlotBuilder(pos=pos, data=data)
+            plt.close("all")
+    _timed(results, "scatter", repeat, scatter)
+
+    reportPos, reportData = groups[slots.index("1B")]
+    _timed(results, "report_build", repeat, lambda: generate_report(pos=reportPos, dataset=reportData))
+
+    pending = {}
+
+    def fresh_report():
+        # an empty report folder so every figure is drawn, and a new report since the writer renders its figures
+        shutil.rmtree("sources/Export/TRPReport", ignore_errors=True)
+        os.makedirs("sources/Export/TRPReport")
+        pending["report"] = generate_report(pos=reportPos, dataset=reportData)
+
+    def report_write():
+        html_generator = report_util.HTMLReportContext("sources/Export/TRPReport/")
+        html_generator.generate(pending["report"], "TRP_Positional_Report")
+        plt.close("all")
+    _timed(results, "report_write", repeat, report_write, reset=fresh_report)
+    return {"size": size, "cards": cards, "generate_seconds": generateSeconds, "stages": results}
+
+
+def environment() -> dict:
+    """
+    :return: dict describing the machine and library versions a result file was produced with
+    """
+    import matplotlib
+    import numpy
+    import pandas
+
+    commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=repositoryPath, capture_output=True, text=True)
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count(),
+            "numpy": numpy.__version__, "pandas": pandas.__version__, "matplotlib": matplotlib.__version__,
+            "commit": commit.stdout.strip() or None, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def run_benchmarks(sizes: list, repeat: int = 1, seed: int = 0, keep_path: str = None) -> dict:
+    """
+    Runs run_size for every size in a fresh Python process
+
+    :param sizes: list of player counts
+    :param repeat: runs per stage, the fastest one is kept
+    :param seed: seed of the card generator
+    :param keep_path: keep the scratch folders (one per size) under this folder instead of deleting them
+    :return: dict with the environment and a result per size
+    """
+    results = []
+    for size in sizes:
+        scratch = tempfile.mkdtemp(prefix="trp-bench-{}-".format(size), dir=keep_path)
+        try:
+            completed = subprocess.run([sys.executable, "-m", "sources.Benchmark.benchmark", "_size", str(size),
+                                        scratch, "--repeat", str(repeat), "--seed", str(seed)],
+                                       cwd=repositoryPath, env=dict(os.environ, PYTHONPATH=repositoryPath),
+                                       capture_output=True, text=True)
+            if completed.returncode:
+                raise RuntimeError("benchmark of {} players failed:\n{}".format(size, completed.stderr))
+            results.append(json.loads(completed.stdout.splitlines()[-1]))
+        finally:
+            if keep_path is None:
+                shutil.rmtree(scratch, ignore_errors=True)
+        print(format_result(results[-1]), file=sys.stderr)
+    return {"environment": environment(), "repeat": repeat, "seed": seed, "results": results}
+
+
+def format_result(result: dict) -> str:
+    lines = ["{:,} players (generated in {:.1f}s)".format(result["size"], result["generate_seconds"])]
+    for stage, measured in result["stages"].items():
+        lines.append("  {:<17} {:>10.4f}s {:>10.1f} MiB peak".format(stage, measured["seconds"],
+                                                                      measured["peak_rss_bytes"] / 2 ** 20))
+    return "\n".join(lines)
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.25, min_seconds: float = 0.01) -> list:
+    """
+    Compares the stage times of two result files size by size
+
+    :param baseline: result dict of the reference run
+    :param current: result dict of the run under test
+    :param threshold: relative slowdown (0.25 = 25%) reported as a regression
+    :param min_seconds: stages faster than this in both runs are too noisy to flag
+    :return: list of dicts, one per size and stage measured in both runs, with "regression" set where it got slower
+    """
+    reference = {result["size"]: result["stages"] for result in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        for stage, measured in result["stages"].items():
+            before = reference.get(result["size"], {}).get(stage)
+            if before is None:
+                continue
+            ratio = measured["seconds"] / before["seconds"] if before["seconds"] else float("inf")
+            noticeable = max(measured["seconds"], before["seconds"]) >= min_seconds
+            rows.append({"size": result["size"], "stage": stage, "baseline": before["seconds"],
+                         "current": measured["seconds"], "ratio": ratio,
+                         "memory_ratio": measured["peak_rss_bytes"] / max(before["peak_rss_bytes"], 1),
+                         "regression": noticeable and ratio > 1 + threshold})
+    return rows
+
+
+def main_cli(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="TRP pipeline benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+    runParser = commands.add_parser("run", help="time every stage at every size and write the results JSON")
+    runParser.add_argument("--sizes", type=int, nargs="+", default=defaultSizes)
+    runParser.add_argument("--repeat", type=int, default=1, help="runs per stage, the fastest one is kept")
+    runParser.add_argument("--seed", type=int, default=0)
+    runParser.add_argument("--output", default="bench_results.json")
+    runParser.add_argument("--keep", metavar="FOLDER", help="keep the generated Cards and exports under FOLDER")
+    compareParser = commands.add_parser("compare", help="compare two results JSON files, exit 1 on a regression")
+    compareParser.add_argument("baseline")
+    compareParser.add_argument("current")
+    compareParser.add_argument("--threshold", type=float, default=0.25)
+    sizeParser = commands.add_parser("_size")  # internal: one size in this process, result JSON on stdout
+    sizeParser.add_argument("size", type=int)
+    sizeParser.add_argument("work_path")
+    sizeParser.add_argument("--repeat", type=int, default=1)
+    sizeParser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.command == "_size":
+        print(json.dumps(run_size(args.size, args.work_path, args.repeat, args.seed)))
+    elif args.command == "run":
+        results = run_benchmarks(args.sizes, args.repeat, args.seed, args.keep)
+        with open(args.output, "w", encoding="utf-8") as results_file:
+            json.dump(results, results_file, indent=2)
+    else:
+        with open(args.baseline, encoding="utf-8") as baseline_file, \
+                open(args.current, encoding="utf-8") as current_file:
+            rows = compare(json.load(baseline_file), json.load(current_file), args.threshold)
+        for row in rows:
+            print("{:>9,} {:<17} {:>9.4f}s -> {:>9.4f}s  x{:<6.2f} mem x{:<6.2f}{}".format(
+                row["size"], row["stage"], row["baseline"], row["current"], row["ratio"], row["memory_ratio"],
+                "  REGRESSION" if row["regression"] else ""))
+        return int(any(row["regression"] for row in rows))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
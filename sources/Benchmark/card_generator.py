@@ -0,0 +1,137 @@
+# card_generator writes synthetic Hitter and Pitcher Cards of any size that look like the Cards in resources/: the same
+# fields, slash-delimited pos strings drawn from the real eligibility mix, team and fantasyTeam distributions, stats
+# with the spread of the real projections and the files sorted on wRAA / xERA like the pre-processed dataset.
+import json
+import os
+
+import numpy as np
+
+idColumns = ["idESPN", "idFangraphs", "idSavant"]
+rankColumns = {"TRPHitterCards": ("wRAA", False), "TRPPitcherCards": ("xERA", True)}  # (column, ascending)
+
+
+def card_profile(cards: list) -> dict:
+    """
+    Summarises a list of real Cards into what generate_cards samples from
+
+    :param cards: list of Card dicts, e.g. json.load of resources/TRPHitterCards.json
+    :return: dict with the field order, the frequencies of every string field and the spread of every numeric field
+    """
+    profile = {"fields": list(cards[0].keys()), "strings": {}, "numbers": {}}
+    for field in profile["fields"]:
+        values = [card[field] for card in cards]
+        if field in idColumns or field == "_name":
+            continue
+        if isinstance(values[0], str):
+            labels, counts = np.unique(np.array(values, dtype=str), return_counts=True)
+            profile["strings"][field] = (labels, counts / counts.sum())
+        else:
+            numbers = np.array(values, dtype=np.float64)
+            decimals = max(len(repr(float(value)).partition(".")[2]) for value in values)
+            profile["numbers"][field] = {"mean": numbers.mean(), "std": numbers.std(), "min": numbers.min(),
+                                         "max": numbers.max(), "integer": all(isinstance(v, int) for v in values),
+                                         "decimals": decimals if decimals < 6 else None}
+    profile["rostered"] = sum(card["fantasyTeam"] != "FA" for card in cards)
+    profile["rosteredShare"] = profile["rostered"] / len(cards)
+    profile["teams"] = sorted({card["fantasyTeam"] for card in cards} - {"FA"})
+    profile["names"] = [card["_name"].split(" ", 1) for card in cards if " " in card["_name"]]
+    return profile
+
+
+def generate_cards(profile: dict, size: int, rank: tuple, seed: int = 0, first_id: int = 30000):
+    """
+    Yields size synthetic Cards ordered on the rank column.  Columns are drawn as whole arrays, so 10^6 Cards take a
+    few seconds; the dicts themselves are built one at a time.
+
+    :param profile: card_profile of the real Cards
+    :param size: number of Cards
+    :param rank: (column, ascending) the Cards are sorted on
+    :param seed: seed of the random generator, the same seed gives the same Cards
+    :param first_id: first of the sequential ID keys
+    """
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for field, (labels, weights) in profile["strings"].items():
+        columns[field] = labels[rng.choice(len(labels), size=size, p=weights)]
+    for field, spread in profile["numbers"].items():
+        values = np.clip(rng.normal(spread["mean"], spread["std"], size), spread["min"], spread["max"])
+        if spread["integer"]:
+            values = np.rint(values).astype(np.int64)
+        elif spread["decimals"] is not None:
+            values = np.round(values, spread["decimals"])
+        columns[field] = values
+    rankColumn, ascending = rank
+    order = np.argsort(columns[rankColumn] if ascending else -columns[rankColumn], kind="stable")
+    columns = {field: values[order] for field, values in columns.items()}
+
+    # the fantasy league rosters the same share of a small player pool as the real one, but never more players than it
+    # does in total, taken from the best ranked players
+    fantasyTeams = np.full(size, "FA", dtype=object)
+    rostered = min(int(round(profile["rosteredShare"] * size)), profile["rostered"])
+    if rostered and profile["teams"]:
+        picks = rng.choice(min(size, 2 * rostered), size=rostered, replace=False)
+        teams = np.array(profile["teams"], dtype=object)
+        fantasyTeams[picks] = teams[rng.integers(len(teams), size=rostered)]
+    columns["fantasyTeam"] = fantasyTeams
+    names = profile["names"]
+    firsts = rng.integers(len(names), size=size)
+    lasts = rng.integers(len(names), size=size)
+
+    for i in range(size):
+        card = {}
+        for field in profile["fields"]:
+            if field == "_name":
+                card[field] = "{} {}".format(names[firsts[i]][0], names[lasts[i]][1])
+            elif field in idColumns:
+                card[field] = str(first_id + idColumns.index(field) * 1_000_000_000 + i)
+            else:
+                value = columns[field][i]
+                card[field] = value.item() if isinstance(value, np.generic) else value
+        yield card
+
+
+def write_cards(path: str, cards, chunk_size: int = 10_000):
+    """
+    Writes Cards as a JSON array, chunk_size records at a time so 10^6 Cards never exist as one string
+    """
+    with open(path, "w", encoding="utf-8") as cards_file:
+        cards_file.write("[")
+        chunk = []
+        first = True
+        for card in cards:
+            chunk.append(json.dumps(card))
+            if len(chunk) == chunk_size:
+                cards_file.write(("" if first else ",\n") + ",\n".join(chunk))
+                first = False
+                chunk = []
+        if chunk:
+            cards_file.write(("" if first else ",\n") + ",\n".join(chunk))
+        cards_file.write("]\n")
+
+
+def generate_league(folder_path: str, size: int, seed: int = 0, template_path: str = "resources") -> dict:
+    """
+    Writes TRPHitterCards.json and TRPPitcherCards.json with size players in total, split between hitters and
+    pitchers like the template Cards
+
+    :param folder_path: folder the Cards are written to (a resources folder)
+    :param size: number of players over both files
+    :param seed: seed of the random generator
+    :param template_path: folder with the real Cards the distributions are taken from
+    :return: dict of Cards file name to the number of Cards written
+    """
+    templates = {}
+    for name in rankColumns:
+        with open(os.path.join(template_path, name + ".json"), encoding="utf-8") as template_file:
+            templates[name] = json.load(template_file)
+    hitterShare = len(templates["TRPHitterCards"]) / sum(len(cards) for cards in templates.values())
+    sizes = {"TRPHitterCards": max(1, int(round(size * hitterShare)))}
+    sizes["TRPPitcherCards"] = max(1, size - sizes["TRPHitterCards"])
+
+    os.makedirs(folder_path, exist_ok=True)
+    for offset, (name, cards) in enumerate(templates.items()):
+        profile = card_profile(cards)
+        write_cards(os.path.join(folder_path, name + ".json"),
+                    generate_cards(profile, sizes[name], rankColumns[name], seed=seed + offset,
+                                   first_id=30000 + offset * 100_000_000))
+    return sizes
@@ -1,6 +1,10 @@
+import functools
+
 import pandas as pd
 
 import sources.Export.report_util as report_util
+from sources.Export.plot_util import draw_position_scatter, scatter_categories, scatter_columns
+from sources.Model.TRPLeagueManager import TRPLeagueManager
 import numpy as np
 import matplotlib.pyplot as plt
 
@@ -9,29 +13,72 @@ def generate_report(pos: str, dataset: pd.DataFrame) -> report_util.Report:
     report = report_util.Report("TRP Positional Analyzer")
 
     section = report.add_section(f"Position Group: {pos}")
+    add_position_group(section, pos, dataset)
+
+    ##########################################################################
+    # The following code demonstrates creating another section to the report
+    ##########################################################################
+    section_2 = report.add_section("Positional Heat Map")
+    add_heat_map(section_2, pos, dataset)
+
+    return report
+
+
+def generate_league_report(groups: list) -> report_util.Report:
+    """
+    One section per POS group, pitcher groups described and plotted by ERA/WHIP/xERA.  Meant to be written with
+    HTMLReportContext.generate(..., workers=n), which builds the sections concurrently.
+
+    :param groups: list of (pos, pd.DataFrame) tuples from TRPFilterPosGroup, in the order of the report
+    """
+    report = report_util.Report("TRP Positional Analyzer: All Positions")
+    for pos, dataset in groups:
+        section = report.add_section(f"Position Group: {pos}")
+        add_position_group(section, pos, dataset)
+        add_heat_map(section.add_section(f"{pos} Heat Map"), pos, dataset)
+    return report
+
 
+def add_position_group(section: report_util.Section, pos: str, dataset: pd.DataFrame):
+    """
+    Adds the description, scatter plot and dataset listing of a POS group to section
+    """
+    xCat, yCat, sCat = scatter_categories(pos)
     paragraph = section.add_paragraph()
 
     paragraph.append(f"The {pos} player group has {len(dataset)} players. ")
-    paragraph.append(f"The dataset holds valuable player data to include wRAA and xwOBA. ")
-    paragraph.append(f"Weighted Runs Above Average (wRAA) measures the number of offensive runs a player contributes "
-                     f"to their team compared to the average player. ")
-    paragraph.append(f"Expected Weighted On-base Average (xwOBA) is formulated using exit velocity, launch angle and, "
-                     f"on certain types of batted balls, Sprint Speed. The formation of said player's xwOBA isolates "
-                     f"the quality of contact, instead of focusing on the real outcomes which carry too much noise. ")
+    if pos in TRPLeagueManager.arms:
+        paragraph.append(f"The dataset holds valuable pitcher data to include ERA, WHIP and xERA. ")
+        paragraph.append(f"Expected ERA (xERA) is formulated from the quality of contact a pitcher allows along with "
+                         f"their strikeouts and walks, so it isolates the pitcher's skill from the defense and luck "
+                         f"behind the runs that actually scored. ")
+    else:
+        paragraph.append(f"The dataset holds valuable player data to include wRAA and xwOBA. ")
+        paragraph.append(f"Weighted Runs Above Average (wRAA) measures the number of offensive runs a player "
+                         f"contributes to their team compared to the average player. ")
+        paragraph.append(f"Expected Weighted On-base Average (xwOBA) is formulated using exit velocity, launch angle "
+                         f"and, on certain types of batted balls, Sprint Speed. The formation of said player's xwOBA "
+                         f"isolates the quality of contact, instead of focusing on the real outcomes which carry too "
+                         f"much noise. ")
     paragraph_2 = section.add_paragraph()
     ##########################################################################
     # The following code demonstrates creating a figure directly with the matplotlib API
     ##########################################################################
     figure1 = section.add_figure()
 
-    plot_builder(pos=pos, data=dataset, ruFig=figure1)
-    figure1.matplotlib_figure.tight_layout()
+    # only drawn when the report folder has no image for this exact data yet
+    columns = scatter_columns(pos, dataset)
+    figure1.set_draw(functools.partial(draw_scatter, pos, columns), "scatter", pos, *columns.values())
 
     paragraph_2.append_cross_reference(figure1)
-    paragraph_2.append("Figure shows a scatter plot with On-Base Percentage on the x-axis and Slugging Percentage on "
-                       "the y-axis. The volume of the shape is directly correlated to the player's wRAA. The names "
-                       "only appear next to the plot point for those players that are "
+    if pos in TRPLeagueManager.arms:
+        paragraph_2.append(f"Figure shows a scatter plot with {xCat} on the x-axis and {yCat} on the y-axis. The "
+                           f"volume of the shape is directly correlated to the pitcher's {sCat}. ")
+    else:
+        paragraph_2.append("Figure shows a scatter plot with On-Base Percentage on the x-axis and Slugging "
+                           "Percentage on the y-axis. The volume of the shape is directly correlated to the player's "
+                           "wRAA. ")
+    paragraph_2.append("The names only appear next to the plot point for those players that are "
                        "Free Agents in my Fantasy League. ")
     ##########################################################################
 
@@ -42,91 +89,55 @@ def generate_report(pos: str, dataset: pd.DataFrame) -> report_util.Report:
     tbl_1.caption = "Dataset Listing"
 
     tbl_1.set_header(list(dataset.columns.values))
-    tbl_1.set_data(dataset.values)
+    tbl_1.set_column_data(dataset[column].to_numpy() for column in dataset.columns)
 
     paragraph_2.append(f"\n TRP - Truncated Runs Produced projection dataset. ")
 
-    ##########################################################################
-    # The following code demonstrates creating another section to the report
-    ##########################################################################
-    section_2 = report.add_section("Positional Heat Map")
-    paragraph_3 = section_2.add_paragraph()
+
+def add_heat_map(section: report_util.Section, pos: str, dataset: pd.DataFrame):
+    """
+    Adds the heatmap of actual vs expected performance (wOBA/xwOBA, or ERA/xERA for pitchers) to section
+    """
+    paragraph_3 = section.add_paragraph()
 
     ##########################################################################
     # The following code demonstrates creating a figure directly with the matplotlib API
     ##########################################################################
-    figure_2 = section_2.add_figure()
+    figure_2 = section.add_figure()
 
-    stats = ["wOBA", "xwOBA", "Performance"]  # x-axis labels
-    trimmedData = dataset.loc[:, ("wOBA", "xwOBA")]  # get the 2 columns I want
-    trimmedData["Performance"] = dataset.xwOBA - dataset.wOBA  # add computed column
+    if pos in TRPLeagueManager.arms:
+        stats = ["ERA", "xERA", "Performance"]  # x-axis labels
+        trimmedData = dataset.loc[:, ("ERA", "xERA")]  # get the 2 columns I want
+        trimmedData["Performance"] = dataset.ERA - dataset.xERA  # add computed column
+    else:
+        stats = ["wOBA", "xwOBA", "Performance"]  # x-axis labels
+        trimmedData = dataset.loc[:, ("wOBA", "xwOBA")]  # get the 2 columns I want
+        trimmedData["Performance"] = dataset.xwOBA - dataset.wOBA  # add computed column
     npData = trimmedData.to_numpy()  # convert to numpy
 
-    # The following starts the plot creation using data generated above
-    # notice in the next line we access matplotlib's figure object directly
-    ax = figure_2.matplotlib_figure.add_subplot()
-    ax.imshow(npData)  # heatmap
-    # Show all ticks and label them with the respective list entries
-    ax.set_xticks(np.arange(len(stats)), labels=stats)
-    ax.set_yticks(np.arange(len(dataset["_name"])), labels=dataset["_name"].to_numpy())
-
-    plt.setp(ax.get_xticklabels(), rotation=45, ha="right",
-             rotation_mode="anchor")
-    # Loop over data dimensions and create text annotations.
-    for i in range(len(dataset["_name"].to_numpy())):
-        for j in range(len(stats)):
-            text = ax.text(j, i, npData[i, j],
-                           ha="center", va="center", color="w")
-
-    ax.set_title("Player Performance Deltas")
-    figure_2.matplotlib_figure.tight_layout()
+    # The heatmap is drawn by report_util when the writer reaches it, with one batched annotation collection
+    figure_2.set_heatmap(npData, row_labels=dataset["_name"].to_numpy(), column_labels=stats,
+                         title="Player Performance Deltas", style='fivethirtyeight')
 
     ##########################################################################
 
     paragraph_3.append_cross_reference(figure_2)
     paragraph_3.append(" shows a heatmap of player performance.")
 
-    return report
-
 
-def plot_builder(pos: str, data: pd.DataFrame, ruFig: report_util.Figure):
-    xCat: str
-    yCat: str
-    sCat: str  # size category
-    if pos.__contains__("P"):
-        xCat = "WHIP"
-        yCat = "ERA"
-        sCat = "xERA"
-    else:
-        xCat = "OBP"
-        yCat = "SLG"
-        sCat = "wRAA"
+def draw_scatter(pos: str, columns: dict, figure: report_util.Figure):
+    # module level so the figure spec pickles for the concurrent report writer
+    plot_builder(pos=pos, data=pd.DataFrame(columns), ruFig=figure)
+    figure.matplotlib_figure.tight_layout()
 
-    # extract the data
-    x = data[xCat].to_numpy()
-    y = data[yCat].to_numpy()
-    # size and color based on wRAA:
-    sizes = data[sCat].apply(lambda r: r * 10)
-    colors = data[sCat].apply(lambda r: r * 10)
 
+def plot_builder(pos: str, data: pd.DataFrame, ruFig: report_util.Figure):
     # plot
     plt.style.use('fivethirtyeight')
     ax = ruFig.matplotlib_figure.add_subplot()
 
-    ax.scatter(x, y, s=sizes, c=colors, vmin=0, vmax=100, alpha=0.5)
-
-    # We only want to place the scatter plot labels only for those players that are Free Agents
-    for name in data["_name"]:
-        if data.fantasyTeam[data["_name"] == name].values[0] == "FA":  # 1st index value holds the string rep
-            plt.text(x=data[xCat][data["_name"] == name], y=data[yCat][data["_name"] == name], s=name)
-    ax.set_xlabel(xCat)
-    ax.set_ylabel(yCat)
-    ax.set_title(f'POS: {pos}')
-    vline = data[xCat].mean()
-    plt.axvline(vline, c='black', ls='-')
-    plt.axhline(data[yCat].mean(), c='black', ls='-')
-    plt.grid()
-    plt.show()
+    draw_position_scatter(ax, pos, data)
+    ax.grid()
 
 
 if __name__ == "__main__":
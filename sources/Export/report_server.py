@@ -0,0 +1,385 @@
+# report_server serves the positional report on localhost straight from the in-memory TRPLeagueManager instead of
+# regenerating the static files.  Pages, table data and charts are rendered on the first request for them:
+#   /                              index of the roster slots
+#   /pos/<slot>/                   the report page of a POS group (generate_report), streamed while it is written
+#   /pos/<slot>/<fingerprint>.png  a chart of the page, drawn when the browser asks for it
+#   /pos/<slot>/table<n>.js        the DataTables rows of a table of the page
+#   .../html_support_files/*, .../logo.png  the static files next to the generated report
+# Everything rendered is cached for the current Cards version and answered with an ETag and Last-Modified, so a repeat
+# load is a 304 or a copy of cached bytes.  Rendering (pandas, matplotlib) runs on one executor thread, pyplot is not
+# thread safe, while the event loop keeps serving cached responses.
+import asyncio
+import concurrent.futures
+import email.utils
+import hashlib
+import html
+import io
+import mimetypes
+import os
+import typing
+import urllib.parse
+
+import matplotlib
+
+import sources.Export.report_util as report_util
+import sources.Export.trace_util as trace_util
+from sources.Model.TRPLeagueConfig import TRPLeagueConfig
+from sources.Model.TRPLeagueManager import TRPLeagueManager
+
+
+class _Response:
+    __slots__ = ("status", "body", "content_type", "etag", "last_modified", "cache_control")
+
+    def __init__(self, status: int, body: bytes, content_type: str = "text/html; charset=utf-8", etag: str = None,
+                 last_modified: str = None, cache_control: str = "no-cache"):
+        self.status = status
+        self.body = body
+        self.content_type = content_type
+        self.etag = etag
+        self.last_modified = last_modified
+        self.cache_control = cache_control
+
+
+class _Page:
+    """
+    A rendered report page: its html and the figures and tables it references, rendered when they are requested
+    """
+
+    def __init__(self):
+        self.body = b""
+        self.figures = {}  # file name -> report_util.Figure
+        self.tables = {}  # file name -> report_util.Table
+
+
+class _LazyContext(report_util.HTMLReportContext):
+    """
+    Writes a page without drawing its figures or writing its table data files, they are only registered on the page
+    """
+
+    def __init__(self, page: _Page):
+        super().__init__("", table_data="json")
+        self.page = page
+
+    def _init_part_write_strategies(self):
+        super()._init_part_write_strategies()
+        self.part_write_strategies[report_util.ReportPartType.Figure] = self._decorate_span(
+            self._decorate_anchor_name(self._write_lazy_figure), "write figure")
+
+    @staticmethod
+    def _write_lazy_figure(context: "_LazyContext", html_file, report_part, level: int = 2):
+        figure = typing.cast(report_util.Figure, report_part)
+        file_name = "{}.png".format(figure.fingerprint or "figure{}".format(figure.part_type_number))
+        context.page.figures[file_name] = figure
+        html_file.write("<figure>")
+        html_file.write("<img src='{}'/>".format(file_name))
+        html_file.write("<figcaption>Figure {}. {}</figcaption>".format(figure.part_type_number,
+                                                                        html.escape(figure.caption)))
+        html_file.write("</figure>")
+        context.figure_count += 1
+
+    def _write_table_data_file(self, table) -> str:
+        file_name = "table{}.js".format(table.part_type_number)
+        self.page.tables[file_name] = table
+        return file_name
+
+
+class _SocketStream:
+    """
+    Text stream for generate_to_stream running on the render thread: every write is encoded, kept for the cache and
+    handed to the event loop, which sends it to the client as one HTTP chunk
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue):
+        self.loop = loop
+        self.queue = queue
+        self.parts = []
+
+    def write(self, text: str):
+        if not text:
+            return  # an empty chunk would end the chunked response
+        data = text.encode("utf-8")
+        self.parts.append(data)
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, data)
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, None)
+
+
+class ReportServer:
+    support_folder = "sources/Export/TRPReport"
+    statusText = {200: "OK", 301: "Moved Permanently", 304: "Not Modified", 404: "Not Found",
+                  405: "Method Not Allowed", 500: "Internal Server Error"}
+
+    def __init__(self, lm: TRPLeagueManager, config: TRPLeagueConfig = None, host: str = "127.0.0.1",
+                 port: int = 8000):
+        """
+        :param lm: the TRPLeagueManager to serve, reloaded when the Cards files change
+        :param config: league shape deciding the size of the POS groups, defaults to the 12 team TRPLeagueConfig
+        :param host: interface to listen on, localhost by default
+        """
+        self.lm = lm
+        self.config = config or TRPLeagueConfig()
+        self.host = host
+        self.port = port
+        self.slots = TRPLeagueManager.bats + TRPLeagueManager.arms
+        # pyplot keeps global state, so all rendering is serialized on this one thread
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="render")
+        self.stamp = self._cards_stamp()
+        self.version = 0
+        self._responses = {}  # path -> _Response of the current version
+        self._pages = {}  # slot -> asyncio.Task building its _Page
+        self._pending = {}  # path -> asyncio.Task rendering an artifact
+        self._reload = None
+
+    @staticmethod
+    def _cards_stamp() -> tuple:
+        stamps = []
+        for path in TRPLeagueManager.cardsPaths.values():
+            try:
+                stat = os.stat(path)
+                stamps.append((stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                stamps.append(None)
+        return tuple(stamps)
+
+    async def serve_forever(self):
+        matplotlib.use("Agg")
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        print("serving the TRP report on http://{}:{}/".format(self.host, server.sockets[0].getsockname()[1]))
+        async with server:
+            await server.serve_forever()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self._respond(method, urllib.parse.unquote(urllib.parse.urlsplit(target).path), headers,
+                                    writer, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError):
+            pass  # client went away or sent something that is not HTTP
+        finally:
+            writer.close()
+
+    async def _respond(self, method: str, path: str, headers: dict, writer: asyncio.StreamWriter,
+                       keep_alive: bool):
+        if method not in ("GET", "HEAD"):
+            return await self._send(writer, _Response(405, b"GET and HEAD only", "text/plain"), method, keep_alive)
+        await self._check_cards()
+        response = self._responses.get(path)
+        if response is None:
+            parts = path.strip("/").split("/")
+            if len(parts) == 2 and parts[0] == "pos" and parts[1] in self.slots and path.endswith("/") \
+                    and parts[1] not in self._pages:
+                # first request of a page: stream it to this client while it is written
+                return await self._stream_page(parts[1], path, method, writer, keep_alive)
+            try:
+                response = await self._render(path)
+            except Exception as error:
+                response = _Response(500, "{}: {}".format(type(error).__name__, error).encode(), "text/plain")
+        if response.etag is not None and (headers.get("if-none-match") == response.etag or (
+                "if-none-match" not in headers and headers.get("if-modified-since") == response.last_modified)):
+            response = _Response(304, b"", response.content_type, response.etag, response.last_modified,
+                                 response.cache_control)
+        await self._send(writer, response, method, keep_alive)
+
+    def _head(self, response: _Response, keep_alive: bool, length: int = None) -> bytes:
+        lines = ["HTTP/1.1 {} {}".format(response.status, self.statusText[response.status]),
+                 "Content-Type: {}".format(response.content_type),
+                 "Cache-Control: {}".format(response.cache_control),
+                 "Connection: {}".format("keep-alive" if keep_alive else "close")]
+        if response.status != 304:  # a 304 has no body and keeps the headers of the cached one
+            lines.append("Content-Length: {}".format(length) if length is not None else "Transfer-Encoding: chunked")
+        if response.etag is not None:
+            lines += ["ETag: {}".format(response.etag), "Last-Modified: {}".format(response.last_modified)]
+        if response.status == 301:
+            lines.append("Location: {}".format(response.body.decode()))
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def _send(self, writer: asyncio.StreamWriter, response: _Response, method: str, keep_alive: bool):
+        body = response.body if response.status not in (301, 304) else b""  # a 301 carries its Location as body
+        writer.write(self._head(response, keep_alive, len(body)))
+        if method != "HEAD":
+            writer.write(body)
+        await writer.drain()
+
+    async def _check_cards(self):
+        """
+        Reloads the Cards when their files changed, which starts a new version and drops everything rendered
+        """
+        if self._reload is None:
+            stamp = self._cards_stamp()
+            if stamp == self.stamp:
+                return
+            self._reload = asyncio.ensure_future(self._reload_cards(stamp))
+        await asyncio.shield(self._reload)
+
+    async def _reload_cards(self, stamp: tuple):
+        try:
+            # on the render thread, so no page is half way through the old Cards
+            await asyncio.get_running_loop().run_in_executor(self.executor, self.lm.reload)
+            self.stamp = stamp
+            self.version += 1
+            self._responses = {}
+            self._pages = {}
+            self._pending = {}
+        finally:
+            self._reload = None
+
+    def _validators(self, path: str) -> (str, str):
+        # the ETag changes with the Cards version, Last-Modified is the newest Cards file
+        digest = hashlib.blake2b("{}|{}|{}".format(self.version, self.stamp, path).encode(), digest_size=12)
+        mtime = max([stamp[1] for stamp in self.stamp if stamp is not None] or [0]) / 1e9
+        return '"{}"'.format(digest.hexdigest()), email.utils.formatdate(mtime, usegmt=True)
+
+    def _cached(self, path: str, body: bytes, content_type: str, version: int) -> _Response:
+        etag, last_modified = self._validators(path)
+        response = _Response(200, body, content_type, etag, last_modified)
+        if version == self.version:  # a render that outlived its Cards version is answered but not kept
+            self._responses[path] = response
+        return response
+
+    async def _render(self, path: str) -> _Response:
+        """
+        Renders the artifact at path once; concurrent requests for it wait for the same render
+        """
+        if path not in self._pending:
+            self._pending[path] = asyncio.ensure_future(self._render_path(path))
+        render = self._pending[path]
+        try:
+            return await asyncio.shield(render)
+        finally:
+            if self._pending.get(path) is render and render.done():
+                del self._pending[path]  # the response is cached now, or the render failed and is retried
+
+    async def _render_path(self, path: str) -> _Response:
+        loop = asyncio.get_running_loop()
+        version = self.version
+        parts = path.strip("/").split("/")
+        if path == "/":
+            return self._cached(path, self._index().encode("utf-8"), "text/html; charset=utf-8", version)
+        if parts[-1] == "logo.png" or "html_support_files" in parts:
+            return self._static(path, parts)
+        if len(parts) < 2 or parts[0] != "pos" or parts[1] not in self.slots:
+            return _Response(404, b"not found", "text/plain")
+        if len(parts) == 2:
+            if path.endswith("/"):
+                page = await self._page(parts[1])
+                return self._cached(path, page.body, "text/html; charset=utf-8", version)
+            return _Response(301, (path + "/").encode(), "text/plain")
+        page = await self._page(parts[1])
+        name = "/".join(parts[2:])
+        if name in page.figures:
+            figure = page.figures[name]
+            image = await loop.run_in_executor(self.executor, self._draw, figure)
+            return self._cached(path, image, "image/png", version)
+        if name in page.tables:
+            return self._cached(path, report_util.HTMLReportContext.table_data_script(page.tables[name]).encode(),
+                                "text/javascript; charset=utf-8", version)
+        return _Response(404, b"not found", "text/plain")
+
+    @staticmethod
+    def _draw(figure: report_util.Figure) -> bytes:
+        image = io.BytesIO()
+        with trace_util.span("serve figure", part=figure.part_number):
+            figure.save_to_file(image)
+        return image.getvalue()
+
+    def _static(self, path: str, parts: list) -> _Response:
+        # every page finds the support files of the report folder next to it
+        start = parts.index("html_support_files") if "html_support_files" in parts else len(parts) - 1
+        file_path = os.path.normpath(os.path.join(self.support_folder, *parts[start:]))
+        if not file_path.startswith(os.path.normpath(self.support_folder) + os.sep) or not os.path.isfile(file_path):
+            return _Response(404, b"not found", "text/plain")
+        with open(file_path, "rb") as static_file:
+            body = static_file.read()
+        stat = os.stat(file_path)
+        response = _Response(200, body, mimetypes.guess_type(file_path)[0] or "application/octet-stream",
+                             '"{:x}-{:x}"'.format(stat.st_size, stat.st_mtime_ns),
+                             email.utils.formatdate(stat.st_mtime, usegmt=True), "max-age=3600")
+        self._responses[path] = response
+        return response
+
+    def _index(self) -> str:
+        links = "".join("<li><a href='pos/{0}/'>{0}</a> ({1} players)</li>".format(
+            slot, self.config.pool_size(slot)) for slot in self.slots)
+        return ("<html><head><meta charset='utf-8'/><title>TRP Positional Analyzer</title>"
+                "<link rel='stylesheet' type='text/css' href='html_support_files/style.css'/></head>"
+                "<body><h1>TRP Positional Analyzer</h1><ul>{}</ul></body></html>").format(links)
+
+    async def _page(self, slot: str) -> _Page:
+        if slot not in self._pages:
+            self._pages[slot] = asyncio.ensure_future(self._build_page(slot, None))
+        build = self._pages[slot]
+        try:
+            return await asyncio.shield(build)
+        except Exception:
+            if self._pages.get(slot) is build:
+                del self._pages[slot]
+            raise
+
+    async def _build_page(self, slot: str, stream: typing.Optional[_SocketStream]) -> _Page:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._write_page, slot, stream)
+
+    def _write_page(self, slot: str, stream: typing.Optional[_SocketStream]) -> _Page:
+        from sources.Export.report_generator_example import generate_report
+
+        page = _Page()
+        try:
+            with trace_util.span("serve page", pos=slot):
+                report = generate_report(pos=slot, dataset=self.lm.top(slot, k=self.config.pool_size(slot)))
+                html_file = stream if stream is not None else io.StringIO()
+                _LazyContext(page).generate_to_stream(report, html_file)
+            page.body = b"".join(stream.parts) if stream is not None else html_file.getvalue().encode("utf-8")
+        finally:
+            if stream is not None:
+                stream.close()
+        return page
+
+    async def _stream_page(self, slot: str, path: str, method: str, writer: asyncio.StreamWriter,
+                           keep_alive: bool):
+        """
+        Builds a page with generate_to_stream writing into this client's socket as HTTP chunks, then caches it
+        """
+        loop = asyncio.get_running_loop()
+        version = self.version
+        queue = asyncio.Queue()
+        stream = _SocketStream(loop, queue)
+        build = asyncio.ensure_future(self._build_page(slot, stream))
+        self._pages[slot] = build
+        etag, last_modified = self._validators(path)
+        writer.write(self._head(_Response(200, b"", etag=etag, last_modified=last_modified), keep_alive))
+        finished = False
+        while not finished:
+            # everything written since the last chunk goes out as one chunk
+            parts = [await queue.get()]
+            while not queue.empty():
+                parts.append(queue.get_nowait())
+            finished = parts[-1] is None
+            data = b"".join(parts[:-1] if finished else parts)
+            if data and method != "HEAD":
+                writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+                await writer.drain()
+        if method != "HEAD":
+            writer.write(b"0\r\n\r\n")
+        await writer.drain()
+        try:
+            page = await build
+        except Exception:
+            if self._pages.get(slot) is build:
+                del self._pages[slot]
+            raise ConnectionError("rendering {} failed after its response started".format(path))
+        self._cached(path, page.body, "text/html; charset=utf-8", version)
@@ -1,9 +1,22 @@
 import typing
+import math
+import matplotlib
 import matplotlib.pyplot as plt
+from matplotlib.collections import PathCollection
+from matplotlib.textpath import TextPath
+from matplotlib.transforms import Affine2D
 import os
+import re
 import numpy as np
+import concurrent.futures
 import enum
+import functools
+import hashlib
 import html
+import io
+import itertools
+import json
+import sources.Export.trace_util as trace_util
 
 class ReportPartType(enum.Enum):
     Paragraph = 0
@@ -65,38 +78,212 @@ class Paragraph(ReportPart):
         return ReportPartType.Paragraph
 
 
+# bump whenever a change to the drawing code changes the image of a figure drawn from the same data, so every figure
+# image named by an older fingerprint is drawn again
+FIGURE_DRAW_VERSION = 1
+
+
+def figure_fingerprint(*parts) -> str:
+    """
+    Hashes everything a figure is drawn from (data arrays, labels, plot parameters) into the hex name of its image.
+    Anything with to_numpy() (pandas objects) is hashed through its array.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(matplotlib.__version__.encode())
+    digest.update(str(FIGURE_DRAW_VERSION).encode())
+    for part in parts:
+        if hasattr(part, "to_numpy"):
+            part = part.to_numpy()
+        if isinstance(part, np.ndarray):
+            if part.dtype == object:
+                part = part.astype(str)
+            digest.update("{}{}".format(part.dtype, part.shape).encode())
+            digest.update(np.ascontiguousarray(part).tobytes())
+        else:
+            digest.update(repr(part).encode())
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
 class Figure(ReportPart):
     def __init__(self):
         super().__init__()
-        self.matplotlib_figure = plt.figure()
+        self._matplotlib_figure = None
         self.caption = ""
-    
+        # when fingerprint is set the figure is content addressed and draw(figure) is only called if its image is missing
+        self.fingerprint : typing.Optional[str] = None
+        self.draw : typing.Optional[typing.Callable[["Figure"],typing.Any]] = None
+        self._drawn = False
+        self._image : typing.Optional[bytes] = None # saved image of a figure drawn by its caller, see save_to_file
+
+    @property
+    def matplotlib_figure(self):
+        # created on first use so a figure whose image is already on disk never touches matplotlib
+        if self._matplotlib_figure is None:
+            self._matplotlib_figure = plt.figure()
+        return self._matplotlib_figure
+
+    def set_draw(self, draw, *fingerprint_parts):
+        """
+        Defers drawing to draw(figure) and content addresses the figure by everything it is drawn from, including the
+        qualified name of the draw function and its draw_version attribute (bumped when that function alone changes)
+        """
+        self.draw = draw
+        function = draw.func if isinstance(draw, functools.partial) else draw
+        self.fingerprint = figure_fingerprint("{}.{}".format(function.__module__, function.__qualname__),
+                                              getattr(function, "draw_version", 0), *fingerprint_parts)
+
+    def render(self):
+        if self.draw is not None and not self._drawn:
+            self._drawn = True
+            with trace_util.span("figure draw", part=self.part_number):
+                self.draw(self)
+
     def save_to_file(self, file_path:str):
-        self.matplotlib_figure.savefig(file_path)
+        """
+        Draws, saves and closes the figure, so only the figure being written is held by pyplot.  A figure drawn by its
+        caller (no draw function) cannot be drawn again, so its image is kept to write any later saves.
+        """
+        if self.draw is None and self._image is not None:
+            with open(file_path, "wb") as image_file:
+                image_file.write(self._image)
+            return
+        self.render()
+        with trace_util.span("figure savefig", part=self.part_number):
+            self.matplotlib_figure.savefig(file_path)
+        if self.draw is None:
+            with open(file_path, "rb") as image_file:
+                self._image = image_file.read()
+        self.close()
+
+    def close(self):
+        """
+        Releases the matplotlib figure; a figure with a draw function is drawn again the next time it is needed
+        """
+        if self._matplotlib_figure is not None:
+            plt.close(self._matplotlib_figure)
+            self._matplotlib_figure = None
+        self._drawn = False
 
     def get_type(self) -> ReportPartType:
         return ReportPartType.Figure
 
     def set_bar_graph_data(self, component_labels,component_values,title):
-        ax = self.matplotlib_figure.add_subplot(1,1,1)
-        y_pos = np.arange(len(component_labels))
-
-        ax.bar(y_pos, component_values, align='center', alpha=0.5)
-        ax.set_xticks(y_pos)
-        ax.set_xticklabels(component_labels)
-        #ax.ylabel('Usage')
-        #ax.set_title(title)
         self.caption = title
-        self.matplotlib_figure.tight_layout()
+        component_labels = np.asarray(component_labels)
+        component_values = np.asarray(component_values)
+        self.set_draw(functools.partial(_draw_bar_graph, component_labels, component_values),
+                      "bar", component_labels, component_values)
 
     def set_line_plot(self,x,y,title,x_axis_title,y_axis_title):
-        ax = self.matplotlib_figure.add_subplot(1,1,1)
-        ax.plot(x,y)
-        #ax.set_title(title)
         self.caption = title
-        self.matplotlib_figure.tight_layout()
-        #ax.set_xaxis(x_axis_title)
-        #ax.set_yaxis(y_axis_title)
+        x = np.asarray(x)
+        y = np.asarray(y)
+        self.set_draw(functools.partial(_draw_line_plot, x, y), "line", x, y)
+
+    def set_heatmap(self, data, row_labels, column_labels, title, precision:int = 3, fontsize:float = 8,
+                    color:str = "w", style:typing.Optional[str] = None, max_annotations:int = 5000):
+        """
+        Heatmap of a 2-D array with one value annotation per cell.  The annotations are a single PathCollection of
+        glyph outlines (one TextPath per distinct formatted value, reused by every cell showing it) rather than one Text
+        artist per cell, so drawing cost stays flat per cell.  When rows get shorter than the font, only every n-th row
+        is annotated and labelled; past max_annotations cells the values are left off entirely.
+
+        :param data: 2-D array, rows are players and columns are stats
+        :param precision: number of decimals in the annotations
+        :param style: matplotlib style the figure is drawn with, e.g. 'fivethirtyeight'
+        """
+        data = np.asarray(data, dtype=float)
+        row_labels = np.asarray(row_labels).astype(str)
+        column_labels = np.asarray(column_labels).astype(str)
+
+        self.caption = title
+        self.set_draw(functools.partial(_draw_heatmap, data, row_labels, column_labels, title, precision, fontsize,
+                                        color, style, max_annotations),
+                      "heatmap", data, row_labels, column_labels, title, precision, fontsize, color, style,
+                      max_annotations)
+
+
+# The draw functions of the built in figure kinds are module level so a figure spec (function, data arrays and labels)
+# pickles and can be drawn in a worker process.
+def _draw_bar_graph(component_labels, component_values, figure:Figure):
+    ax = figure.matplotlib_figure.add_subplot(1,1,1)
+    y_pos = np.arange(len(component_labels))
+
+    ax.bar(y_pos, component_values, align='center', alpha=0.5)
+    ax.set_xticks(y_pos)
+    ax.set_xticklabels(component_labels)
+    #ax.ylabel('Usage')
+    #ax.set_title(title)
+    figure.matplotlib_figure.tight_layout()
+
+
+def _draw_line_plot(x, y, figure:Figure):
+    ax = figure.matplotlib_figure.add_subplot(1,1,1)
+    ax.plot(x,y)
+    #ax.set_title(title)
+    figure.matplotlib_figure.tight_layout()
+    #ax.set_xaxis(x_axis_title)
+    #ax.set_yaxis(y_axis_title)
+
+
+def _draw_heatmap(data, row_labels, column_labels, title:str, precision:int, fontsize:float, color:str,
+                  style:typing.Optional[str], max_annotations:int, figure:Figure):
+    with plt.style.context(style or {}):
+        fig = figure.matplotlib_figure
+        ax = fig.add_subplot(1,1,1)
+        rows, columns = data.shape
+        ax.imshow(data, aspect="auto" if rows > 4 * columns else "equal", interpolation="nearest")
+
+        # how many rows share one line of text at this figure size
+        row_height = ax.get_position().height * fig.get_figheight() * 72 / max(rows, 1)
+        stride = max(1, math.ceil(fontsize * 1.2 / row_height))
+        shown = np.arange(0, rows, stride)
+
+        ax.set_xticks(np.arange(columns), labels=column_labels)
+        ax.set_yticks(shown, labels=row_labels[shown])
+        plt.setp(ax.get_xticklabels(), rotation=45, ha="right", rotation_mode="anchor")
+
+        if len(shown) * columns <= max_annotations:
+            ax.add_collection(_annotation_collection(fig, ax, data[shown], shown, precision, fontsize, color))
+        ax.set_title(title)
+        fig.tight_layout()
+
+
+def _annotation_collection(fig, ax, values, rows, precision:int, fontsize:float, color:str) -> PathCollection:
+    """
+    One PathCollection holding every cell annotation.  Labels are assembled from one glyph outline per distinct
+    (character, position in its label) pair, so only a few dozen TextPaths are built however many cells there are.
+    Cells are offsets in data coordinates while the glyphs are sized in points, so the text keeps its size however the
+    axes are scaled.
+    """
+    text = np.char.mod("%.{}f".format(precision), values).ravel()
+    width = max(int(np.char.str_len(text).max()), 1) if text.size else 1
+    codes = text.astype("U{}".format(width)).view(np.uint32).reshape(len(text), width) # 0 pads short labels
+
+    characters = np.unique(codes[codes != 0])
+    glyphs = {code: TextPath((0, 0), chr(code), size=fontsize) for code in characters.tolist()}
+    zero_width = TextPath((0, 0), "00", size=fontsize).get_extents().width
+    advance = np.zeros(int(characters.max()) + 1 if characters.size else 1)
+    for code in characters.tolist():
+        # advance of a character is how much it widens the ink of two zeros placed around it
+        advance[code] = TextPath((0, 0), "0{}0".format(chr(code)), size=fontsize).get_extents().width - zero_width
+    digit = TextPath((0, 0), "0", size=fontsize).get_extents()
+
+    advances = advance[codes]
+    x = np.cumsum(advances, axis=1) - advances - advances.sum(axis=1, keepdims=True) / 2 # centered on the cell
+    cell, position = np.nonzero(codes)
+    keys = np.column_stack([codes[cell, position], np.round(x[cell, position] * 100).astype(np.int64)])
+    unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+    placed = [glyphs[code].transformed(Affine2D().translate(shift / 100, -(digit.y0 + digit.y1) / 2))
+              for code, shift in unique_keys.tolist()]
+
+    columns = values.shape[1]
+    centers = np.column_stack([cell % columns, np.asarray(rows)[cell // columns]])
+    collection = PathCollection([placed[i] for i in inverse.ravel().tolist()], offsets=centers,
+                                offset_transform=ax.transData, facecolors=color, edgecolors="none")
+    collection.set_transform(Affine2D().scale(1 / 72) + fig.dpi_scale_trans) # glyph units are points
+    return collection
 
 
 class Table(ReportPart):
@@ -105,6 +292,7 @@ class Table(ReportPart):
         super().__init__()
         self.header = []
         self.data = []
+        self.columns : typing.Optional[typing.List] = None
         self.caption = ""
 
     def set_header(self,header_names):
@@ -113,6 +301,25 @@ class Table(ReportPart):
 
     def set_data(self, data):
         self.data = data
+        self.columns = None
+
+    def set_column_data(self, columns):
+        """
+        Sets the data as one 1-D array per column (e.g. [df[c].to_numpy() for c in df]) so the writers can format
+        whole columns at once instead of boxing every cell of a row-major copy
+        """
+        self.columns = list(columns)
+        self.data = []
+
+    def column_arrays(self) -> typing.List:
+        if self.columns is not None:
+            return self.columns
+        return [np.asarray(column) for column in zip(*self.data)]
+
+    def row_count(self) -> int:
+        if self.columns is not None:
+            return len(self.columns[0]) if self.columns else 0
+        return len(self.data)
 
 
     def get_type(self) -> ReportPartType:
@@ -190,10 +397,41 @@ class SubParts(enum.Enum):
     SectionTitle = 0
 
 
+def _format_column(column, escape:bool = True) -> typing.List:
+    """
+    Formats (and html escapes) a whole column with one call instead of one per cell.  Numeric columns never need
+    escaping; text columns are escaped as a single joined string and split back apart.
+    """
+    values = np.asarray(column)
+    if values.dtype.kind in "biuf":
+        return values.astype(str).tolist()
+    text = [str(value) for value in values]
+    if not escape:
+        return text
+    return html.escape("\x00".join(text)).split("\x00")
+
+
 class HTMLReportContext(ReportContext):
-    def __init__(self, folder_path:str):
+    # images of content addressed figures are named by their fingerprint
+    figure_file_pattern = re.compile(r"^[0-9a-f]{32}\.png$")
+    table_rows_per_write = 2000 # rows buffered into each html_file.write of a table body
+
+    def __init__(self, folder_path:str, table_data:str = "html"):
+        """
+        :param folder_path: folder the html file, figures and table data files are written to
+        :param table_data: "html" writes table rows into the page, "json" writes each table's rows to a compact
+            table<n>.js data file (prefixed with the report's file name by generate) that DataTables renders on demand
+            (deferRender), keeping the page small
+        """
+        if table_data not in ("html", "json"):
+            raise ValueError("table_data must be 'html' or 'json', not {!r}".format(table_data))
         self.folder_path = folder_path
+        self.table_data = table_data
         self.figure_count = 0 # this tracks how many figures have been written to folder
+        self.figure_hits = 0 # content addressed figures whose image was already in the folder
+        self.figure_misses = 0 # figures that had to be drawn and encoded
+        self.figure_files = set() # content addressed images referenced by the last generated report
+        self.report_name = None # file name of the report being generated, prefixes its table data files
         self._init_part_write_strategies()
         self._init_text_write_strategies()
         self._init_subpart_write_strategies()
@@ -201,10 +439,10 @@ class HTMLReportContext(ReportContext):
 
     def _init_part_write_strategies(self):
         self.part_write_strategies = {}
-        self.part_write_strategies[ReportPartType.Paragraph] = self._decorate_anchor_name(self._write_paragraph)
-        self.part_write_strategies[ReportPartType.Table] = self._decorate_anchor_name(self._write_table)
-        self.part_write_strategies[ReportPartType.Figure] = self._decorate_anchor_name(self._write_figure)
-        self.part_write_strategies[ReportPartType.Section] = self._decorate_anchor_name(self._write_section)
+        self.part_write_strategies[ReportPartType.Paragraph] = self._decorate_span(self._decorate_anchor_name(self._write_paragraph), "write paragraph")
+        self.part_write_strategies[ReportPartType.Table] = self._decorate_span(self._decorate_anchor_name(self._write_table), "write table")
+        self.part_write_strategies[ReportPartType.Figure] = self._decorate_span(self._decorate_anchor_name(self._write_figure), "write figure")
+        self.part_write_strategies[ReportPartType.Section] = self._decorate_span(self._decorate_anchor_name(self._write_section), "write section")
 
     def _init_text_write_strategies(self):
         self.text_write_strategies = {}
@@ -233,6 +471,18 @@ class HTMLReportContext(ReportContext):
 
         return anchor_strategy
 
+    @staticmethod
+    def _decorate_span(write_strategy, span_name:str):
+        # only wrapped while tracing is on, a context created with tracing off calls its strategies directly
+        if trace_util.active() is None:
+            return write_strategy
+
+        def span_strategy(context:"HTMLReportContext",html_file: TextOutputStream, report_part:ReportPart, level:int = 2):
+            with trace_util.span(span_name, part=report_part.part_number):
+                write_strategy(context,html_file,report_part,level)
+
+        return span_strategy
+
     @staticmethod
     def _write_paragraph(context:"HTMLReportContext",html_file: TextOutputStream, report_part:ReportPart, level:int = 2):
         html_file.write("<p>")
@@ -247,31 +497,70 @@ class HTMLReportContext(ReportContext):
     @staticmethod
     def _write_table(context:"HTMLReportContext",html_file: TextOutputStream, report_part:ReportPart, level:int = 2):
         table: Table = typing.cast(Table,report_part)
-        html_file.write("<table>")
+        if context.table_data == "json":
+            data_file = context._write_table_data_file(table)
+            html_file.write("<script type='text/javascript' src='{}'></script>".format(data_file))
+            html_file.write("<table data-table-source='{}'>".format(table.part_type_number))
+        else:
+            html_file.write("<table>")
         html_file.write("<caption>Table {}. {}</caption>".format(table.part_type_number, html.escape(table.caption)))
         html_file.write("<thead>")
         html_file.write("<tr>")
-        for header_name in table.header:
-            html_file.write("<th>{}</th>".format(html.escape(header_name)))
+        html_file.write("".join("<th>{}</th>".format(html.escape(header_name)) for header_name in table.header))
         html_file.write("</tr>")
         html_file.write("</thead>")
 
         html_file.write("<tbody>")
-        for element in table.data:
-            html_file.write("<tr>")
-            for data_element in element:
-                html_file.write("<td>{}</td>".format(html.escape(str(data_element))))
-            html_file.write("</tr>")
-
+        if context.table_data == "html":
+            cells = [_format_column(column) for column in table.column_arrays()]
+            rows = ["<tr><td>" + "</td><td>".join(row) + "</td></tr>" for row in zip(*cells)]
+            for start in range(0, len(rows), context.table_rows_per_write):
+                html_file.write("".join(rows[start:start + context.table_rows_per_write]))
         html_file.write("</tbody>")
 
         html_file.write("</table>")
 
+    def _write_table_data_file(self, table:Table) -> str:
+        """
+        Writes the table rows as compact JSON wrapped in a script so the report still opens straight from disk
+
+        :return: the file name relative to the folder
+        """
+        relative_path = "table{}.js".format(table.part_type_number)
+        if self.report_name:
+            relative_path = "{}_{}".format(self.report_name, relative_path)
+        with open(os.path.join(self.folder_path,relative_path),'w', encoding='utf-8') as data_file:
+            data_file.write(self.table_data_script(table))
+        return relative_path
+
+    @staticmethod
+    def table_data_script(table:Table) -> str:
+        """
+        :return: the script of a table<n>.js data file, registering the table rows for DataTables
+        """
+        columns = []
+        for column in table.column_arrays():
+            values = np.asarray(column)
+            # numbers stay JSON numbers, text is escaped because DataTables inserts cells as html
+            columns.append(values.tolist() if values.dtype.kind in "biuf" else _format_column(values))
+        return "window.trpTableData = window.trpTableData || {{}};trpTableData[{}] = {};".format(
+            table.part_type_number, json.dumps(list(zip(*columns)), separators=(",", ":")))
+
     @staticmethod
     def _write_figure(context:"HTMLReportContext",html_file: TextOutputStream, report_part:ReportPart, level:int = 2):
         figure : Figure = typing.cast(Figure,report_part)
-        relative_image_path = "{}.png".format(context.figure_count)
-        figure.save_to_file(os.path.join(context.folder_path,relative_image_path))
+        if figure.fingerprint is None:
+            relative_image_path = "{}.png".format(context.figure_count)
+            figure.save_to_file(os.path.join(context.folder_path,relative_image_path))
+            context.figure_misses += 1
+        else:
+            relative_image_path = "{}.png".format(figure.fingerprint)
+            if os.path.exists(os.path.join(context.folder_path,relative_image_path)):
+                context.figure_hits += 1
+            else:
+                figure.save_to_file(os.path.join(context.folder_path,relative_image_path))
+                context.figure_misses += 1
+            context.figure_files.add(relative_image_path)
         html_file.write("<figure>")
         html_file.write("<img src='{}'/>".format(relative_image_path))
         html_file.write("<figcaption>Figure {}. {}</figcaption>".format(figure.part_type_number,html.escape(figure.caption)))
@@ -291,9 +580,14 @@ class HTMLReportContext(ReportContext):
             
         html_file.write("</div>")
 
-    def generate_to_stream(self, report:Report, html_file:TextOutputStream):
+    def generate_to_stream(self, report:Report, html_file:TextOutputStream, workers:typing.Optional[int] = None):
+        """
+        :param workers: with more than one, the sections are written concurrently by that many worker processes, see
+            _write_sections_concurrently
+        """
         # Make sure every report part has an up-to-date part number
         self.assign_part_numbers(report)
+        self.figure_files = set()
 
         html_file.write("<html>")
         html_file.write("<head>")
@@ -304,7 +598,10 @@ class HTMLReportContext(ReportContext):
         html_file.write('<link rel="stylesheet" type="text/css" href="html_support_files/datatables.min.css"/>')
         html_file.write('<script type="text/javascript" src="html_support_files/datatables.min.js"></script>')
         html_file.write('<script type="text/javascript">')
-        html_file.write('$(document).ready(function() {$("table").DataTable();} )')
+        html_file.write('$(document).ready(function() {$("table").each(function() {'
+                        'var source = $(this).data("tableSource");'
+                        '$(this).DataTable(source === undefined ? {} : {data: trpTableData[source], deferRender: true});'
+                        '});} )')
         html_file.write('</script>')
 
         html_file.write("<title>{}</title>".format(html.escape(report.title)))
@@ -316,8 +613,11 @@ class HTMLReportContext(ReportContext):
         html_file.write("<img src='logo.png' class='logo'/><h1>{}</h1>".format(html.escape(report.title)))
         html_file.write("</div>")
         html_file.write("<div class='content'>")
-        for section in report.sections:
-            self.part_write_strategies[section.get_type()](self,html_file,section)
+        if workers is not None and workers > 1 and len(report.sections) > 1:
+            self._write_sections_concurrently(report.sections, html_file, workers)
+        else:
+            for section in report.sections:
+                self.part_write_strategies[section.get_type()](self,html_file,section)
         html_file.write("</div>")
         html_file.write("<div class='footer'>")
         html_file.write("{}".format(html.escape(report.footer)))
@@ -326,9 +626,103 @@ class HTMLReportContext(ReportContext):
         html_file.write("</body>")
         html_file.write("</html>")
 
-    def generate(self, report:Report, file_name:str):
-        with open(os.path.join(self.folder_path,"{}.html".format(file_name)),'w', encoding='utf-8') as html_file:
-            self.generate_to_stream(report, html_file)
+    def _write_sections_concurrently(self, sections:typing.List[Section], html_file:TextOutputStream, workers:int):
+        """
+        Every section is written to html (its figures drawn and saved, its table data files written) by a process
+        pool, and the finished sections are streamed to html_file in report order while later ones are still being
+        built.  Part numbers were assigned before, so they and the cross references match the serial output.
+        """
+        figure_counts = [] # figures written before each section, they name the images without a fingerprint
+        figure_count = self.figure_count
+        for section in sections:
+            figure_counts.append(figure_count)
+            figure_count += _count_parts(section, ReportPartType.Figure)
+        settings = (type(self), self.folder_path, self.table_data, self.report_name)
+        # the workers are not traced, the span covers the whole batch
+        with trace_util.span("write sections", sections=len(sections), workers=workers), \
+                concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_use_headless_backend) as pool:
+            for section_html, hits, misses, figure_files in pool.map(_write_section, itertools.repeat(settings),
+                                                                     figure_counts, sections):
+                html_file.write(section_html)
+                self.figure_hits += hits
+                self.figure_misses += misses
+                self.figure_files.update(figure_files)
+        self.figure_count = figure_count
+
+    def generate(self, report:Report, file_name:str, workers:typing.Optional[int] = None):
+        with trace_util.span("report generate", file=file_name):
+            self.report_name = file_name
+            try:
+                with open(os.path.join(self.folder_path,"{}.html".format(file_name)),'w', encoding='utf-8') as html_file:
+                    self.generate_to_stream(report, html_file, workers)
+            finally:
+                self.report_name = None
+            self.remove_stale_figures(file_name)
+
+    def _figure_manifest_path(self, file_name:str) -> str:
+        # lists the content addressed images a report in the folder references, one per line
+        return os.path.join(self.folder_path,"{}.figures".format(file_name))
+
+    def _read_figure_manifest(self, path:str) -> typing.Set[str]:
+        try:
+            with open(path, encoding='utf-8') as manifest:
+                return {line.strip() for line in manifest if self.figure_file_pattern.match(line.strip())}
+        except FileNotFoundError:
+            return set()
+
+    def remove_stale_figures(self, file_name:str) -> int:
+        """
+        Deletes the content addressed images the previous run of the file_name report referenced and the last one no
+        longer does, unless another report in the folder still references them, then records the current ones.
+        Reports sharing the folder never delete each other's images.
+
+        :return: number of deleted images
+        """
+        manifest_path = self._figure_manifest_path(file_name)
+        stale = self._read_figure_manifest(manifest_path) - self.figure_files
+        for other_manifest in os.listdir(self.folder_path or "."):
+            if other_manifest.endswith(".figures") and other_manifest != os.path.basename(manifest_path):
+                stale -= self._read_figure_manifest(os.path.join(self.folder_path,other_manifest))
+        removed = 0
+        for image_name in stale:
+            image_path = os.path.join(self.folder_path,image_name)
+            if os.path.exists(image_path):
+                os.remove(image_path)
+                removed += 1
+        with open(manifest_path,'w', encoding='utf-8') as manifest:
+            manifest.write("".join("{}\n".format(image_name) for image_name in sorted(self.figure_files)))
+        return removed
+
+    def figure_cache_summary(self) -> str:
+        total = self.figure_hits + self.figure_misses
+        return "figures: {} of {} reused from {}, {} drawn and encoded".format(
+            self.figure_hits, total, self.folder_path or ".", self.figure_misses)
         
     
 
+
+def _count_parts(report_part:ReportPart, part_type:ReportPartType) -> int:
+    count = int(report_part.get_type() == part_type)
+    if report_part.get_type() == ReportPartType.Section:
+        count += sum(_count_parts(child, part_type) for child in typing.cast(Section,report_part).children)
+    return count
+
+
+def _use_headless_backend():
+    # process pool initializer, the workers only draw into files
+    matplotlib.use("Agg")
+
+
+def _write_section(settings:tuple, figure_count:int, section:Section) -> tuple:
+    """
+    Runs in a worker process of HTMLReportContext._write_sections_concurrently
+
+    :return: tuple of the section's html and the figure hits, misses and content addressed files of the writing context
+    """
+    context_type, folder_path, table_data, report_name = settings
+    context = context_type(folder_path, table_data)
+    context.report_name = report_name
+    context.figure_count = figure_count
+    section_html = io.StringIO()
+    context.part_write_strategies[section.get_type()](context, section_html, section)
+    return section_html.getvalue(), context.figure_hits, context.figure_misses, context.figure_files
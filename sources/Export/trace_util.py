@@ -0,0 +1,211 @@
+# trace_util times named spans of the pipeline (loading, filtering, plotting, report writing) and writes them as a
+# Chrome trace that chrome://tracing and ui.perfetto.dev open, plus a summary table.  Tracing is off unless enable() is
+# called (main.py does so for --trace/--profile/--trace-memory or the matching TRP_* environment variables); while it
+# is off span() hands back one shared no-op context manager.
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+_tracer = None
+_disabled = contextlib.nullcontext()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "args", "start", "cpuStart", "blocksStart", "bytesStart", "childSeconds",
+                 "profiling")
+
+    def __init__(self, tracer: "Tracer", name: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        stack = self.tracer._stack()
+        stack.append(self)
+        self.childSeconds = 0.0
+        self.profiling = self.tracer._start_profile(self.name)
+        self.blocksStart = sys.getallocatedblocks()
+        self.bytesStart = tracemalloc.get_traced_memory()[0] if self.tracer.memory else 0
+        self.cpuStart = time.thread_time_ns()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        cpu = time.thread_time_ns() - self.cpuStart
+        blocks = sys.getallocatedblocks() - self.blocksStart
+        allocated = tracemalloc.get_traced_memory()[0] - self.bytesStart if self.tracer.memory else None
+        if self.profiling:
+            self.tracer._stop_profile()
+        stack = self.tracer._stack()
+        stack.pop()
+        seconds = (end - self.start) / 1e9
+        if stack:
+            stack[-1].childSeconds += seconds
+        self.tracer._record(self, end, seconds, cpu / 1e9, blocks, allocated)
+        return False
+
+
+class Tracer:
+    def __init__(self, trace_path: str = None, profile_stage: str = None, memory: bool = False):
+        """
+        :param trace_path: Chrome trace JSON written by finish(), None to only keep the summary
+        :param profile_stage: span name to run under cProfile, its stats go next to the trace (or trace.prof)
+        :param memory: also record the allocated bytes of every span with tracemalloc (slows Python code down)
+        """
+        self.trace_path = trace_path
+        self.profile_stage = profile_stage
+        self.memory = memory
+        self.events = []
+        self.totals = {}  # span name -> [calls, wall, self, cpu, blocks, bytes]
+        self.origin = time.perf_counter_ns()
+        self.pid = os.getpid()
+        self._local = threading.local()
+        self._profiler = None
+        self._profileDepth = 0
+        self._lock = threading.Lock()
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def span(self, name: str, args: dict = None) -> _Span:
+        return _Span(self, name, args)
+
+    def _stack(self) -> list:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _start_profile(self, name: str) -> bool:
+        if name != self.profile_stage:
+            return False
+        self._profileDepth += 1
+        if self._profileDepth == 1:  # a span nested in itself is already being profiled
+            if self._profiler is None:
+                self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        return True
+
+    def _stop_profile(self):
+        self._profileDepth -= 1
+        if self._profileDepth == 0:
+            self._profiler.disable()
+
+    def _record(self, span: _Span, end: int, seconds: float, cpu: float, blocks: int, allocated):
+        args = dict(span.args or {})
+        args.update(cpu_ms=round(cpu * 1e3, 3), allocated_blocks=blocks)
+        if allocated is not None:
+            args["allocated_bytes"] = allocated
+        event = {"name": span.name, "ph": "X", "pid": self.pid, "tid": threading.get_native_id(),
+                 "ts": (span.start - self.origin) / 1e3, "dur": (end - span.start) / 1e3, "args": args}
+        with self._lock:
+            self.events.append(event)
+            totals = self.totals.setdefault(span.name, [0, 0.0, 0.0, 0.0, 0, 0])
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] += seconds - span.childSeconds
+            totals[3] += cpu
+            totals[4] += blocks
+            totals[5] += allocated or 0
+
+    def write_chrome_trace(self, trace_path: str):
+        with open(trace_path, "w", encoding="utf-8") as trace_file:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, trace_file)
+
+    def profile_path(self) -> str:
+        stem = os.path.splitext(self.trace_path)[0] if self.trace_path else "trace"
+        return "{}.{}.prof".format(stem, "".join(c if c.isalnum() else "_" for c in self.profile_stage))
+
+    def summary(self, limit: int = None) -> str:
+        """
+        :param limit: number of spans to list, all by default
+        :return: table of every span name by total wall time: calls, wall, self (wall minus nested spans), CPU time and
+            allocations
+        """
+        rows = sorted(self.totals.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        width = max([len(name) for name, _ in rows] + [4])
+        lines = ["{:<{w}} {:>6} {:>11} {:>11} {:>11} {:>12}{}".format(
+            "span", "calls", "wall ms", "self ms", "cpu ms", "alloc blocks", " alloc KiB" if self.memory else "",
+            w=width)]
+        for name, (calls, wall, own, cpu, blocks, allocated) in rows:
+            lines.append("{:<{w}} {:>6} {:>11.1f} {:>11.1f} {:>11.1f} {:>12}{}".format(
+                name, calls, wall * 1e3, own * 1e3, cpu * 1e3, blocks,
+                " {:>9.1f}".format(allocated / 1024) if self.memory else "", w=width))
+        return "\n".join(lines)
+
+    def profile_summary(self, limit: int = 25) -> str:
+        if self._profiler is None:
+            return ""
+        stream = io.StringIO()
+        pstats.Stats(self._profiler, stream=stream).sort_stats("cumulative").print_stats(limit)
+        return stream.getvalue()
+
+    def finish(self) -> list:
+        """
+        Writes the Chrome trace and the cProfile stats of the profiled stage
+
+        :return: list of the written file paths
+        """
+        written = []
+        if self.trace_path:
+            self.write_chrome_trace(self.trace_path)
+            written.append(self.trace_path)
+        if self._profiler is not None:
+            self._profiler.dump_stats(self.profile_path())
+            written.append(self.profile_path())
+        return written
+
+
+def enable(trace_path: str = None, profile_stage: str = None, memory: bool = False) -> Tracer:
+    """
+    Switches tracing on for the whole process, see Tracer
+    """
+    global _tracer
+    _tracer = Tracer(trace_path, profile_stage, memory)
+    return _tracer
+
+
+def disable() -> Tracer:
+    """
+    Switches tracing off
+
+    :return: the Tracer that was active (or None), still holding its spans
+    """
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def enable_from_environment() -> Tracer:
+    """
+    TRP_TRACE=trace.json writes a Chrome trace, TRP_PROFILE=<span name> runs that stage under cProfile and
+    TRP_TRACE_MEMORY=1 adds tracemalloc byte counts (on its own, to the printed summary)
+
+    :return: the enabled Tracer, None when none of the variables are set
+    """
+    trace_path = os.environ.get("TRP_TRACE") or None
+    profile_stage = os.environ.get("TRP_PROFILE") or None
+    memory = os.environ.get("TRP_TRACE_MEMORY", "") not in ("", "0")
+    if trace_path is None and profile_stage is None and not memory:
+        return None
+    return enable(trace_path, profile_stage, memory)
+
+
+def active() -> Tracer:
+    return _tracer
+
+
+def span(name: str, **args):
+    """
+    with span("savefig", pos=pos): ... times the block when tracing is on and does nothing otherwise
+    """
+    if _tracer is None:
+        return _disabled
+    return _Span(_tracer, name, args)
@@ -0,0 +1,111 @@
+# TRPCardCache keeps a columnar binary copy of a Cards JSON file so the JSON only has to be parsed when it changes
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+
+class TRPCardCache:
+    version = 1  # bump whenever the on-disk layout changes so stale caches get rebuilt
+
+    def __init__(self, cards_path: str, reader=pd.read_json):
+        """
+        :param cards_path: path to the Cards JSON file, the cache lives beside it in a hidden .cache folder
+        :param reader: function that parses the Cards file into a pd.DataFrame when the cache is rebuilt
+        """
+        self.cards_path = cards_path
+        self.reader = reader
+        folder, file_name = os.path.split(cards_path)
+        self.cache_dir = os.path.join(folder, ".{}.cache".format(os.path.splitext(file_name)[0]))
+
+    def fingerprint(self) -> dict:
+        """
+        :return: dict with the size, mtime and content hash of the Cards file that keys the cache
+        """
+        stat = os.stat(self.cards_path)
+        digest = hashlib.blake2b(digest_size=16)
+        with open(self.cards_path, "rb") as cards_file:
+            for chunk in iter(lambda: cards_file.read(1 << 20), b""):
+                digest.update(chunk)
+        return {"version": self.version, "reader": self.reader.__name__, "size": stat.st_size,
+                "mtime": stat.st_mtime_ns, "hash": digest.hexdigest()}
+
+    def load(self) -> pd.DataFrame:
+        """
+        Returns the Cards as parsed by the reader, from the cache when its key still matches the file and otherwise by
+        parsing the JSON and rebuilding the cache.
+
+        :return: pd.DataFrame of the Cards
+        """
+        meta = self._read_meta()
+        fingerprint = self.fingerprint()
+        if meta is not None and meta["fingerprint"] == fingerprint:
+            return self._read_columns(meta)
+        frame = self.reader(self.cards_path)
+        self._write_columns(frame, fingerprint)
+        return frame
+
+    def store(self, frame: pd.DataFrame):
+        """
+        Writes frame as the cache of the Cards file it was just written to, without parsing the file back, e.g. for
+        Cards built by TRPIngest.  frame must hold what the reader parses the file into.
+        """
+        self._write_columns(frame, self.fingerprint())
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def _read_meta(self):
+        try:
+            with open(os.path.join(self.cache_dir, "meta.json"), encoding="utf-8") as meta_file:
+                return json.load(meta_file)
+        except (OSError, ValueError):
+            return None
+
+    def _read_columns(self, meta: dict) -> pd.DataFrame:
+        columns = {}
+        for i, column in enumerate(meta["columns"]):
+            # memory mapped copy-on-write, pages are only read when touched and edits never reach the cache.  Numeric
+            # columns and category codes stay mapped, str columns become pandas strings (a copy) like pd.read_json's
+            values = np.asarray(np.load(os.path.join(self.cache_dir, "{}.npy".format(i)), mmap_mode="c"))
+            if column["kind"] == "category":
+                categories = np.load(os.path.join(self.cache_dir, "{}.categories.npy".format(i)))
+                values = pd.Categorical.from_codes(values, categories=categories)
+            elif column["kind"] == "str":
+                values = pd.Series(values)  # lets pandas pick the same string dtype pd.read_json would
+                if column["nulls"]:
+                    values = values.mask(np.load(os.path.join(self.cache_dir, "{}.nulls.npy".format(i))))
+            columns[column["name"]] = values
+        # without copy pandas keeps one block per column instead of consolidating them into 2D blocks, which would
+        # copy every column out of its map
+        return pd.DataFrame(columns, copy=False)
+
+    def _write_columns(self, frame: pd.DataFrame, fingerprint: dict):
+        self.clear()
+        os.makedirs(self.cache_dir)
+        columns = []
+        for i, name in enumerate(frame.columns):
+            series = frame[name]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                np.save(os.path.join(self.cache_dir, "{}.npy".format(i)), series.cat.codes.to_numpy())
+                np.save(os.path.join(self.cache_dir, "{}.categories.npy".format(i)),
+                        series.cat.categories.to_numpy(dtype=str))
+                columns.append({"name": name, "kind": "category", "nulls": False})  # nulls are code -1
+            elif pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+                np.save(os.path.join(self.cache_dir, "{}.npy".format(i)), series.to_numpy())
+                columns.append({"name": name, "kind": "numeric", "nulls": False})
+            else:
+                nulls = series.isna().to_numpy()
+                np.save(os.path.join(self.cache_dir, "{}.npy".format(i)),
+                        series.fillna("").to_numpy(dtype=str))  # fixed width unicode so it can be memory mapped
+                if nulls.any():
+                    np.save(os.path.join(self.cache_dir, "{}.nulls.npy".format(i)), nulls)
+                columns.append({"name": name, "kind": "str", "nulls": bool(nulls.any())})
+        # meta.json is written last so an interrupted build never looks like a valid cache
+        meta_path = os.path.join(self.cache_dir, "meta.json")
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as meta_file:
+            json.dump({"fingerprint": fingerprint, "columns": columns}, meta_file)
+        os.replace(meta_path + ".tmp", meta_path)
@@ -0,0 +1,95 @@
+# TRPCardDiff compares two loads of the Cards player by player (ESPN ID) and works out which roster slots the changes
+# touch, so only those position groups have to be rebuilt
+import numpy as np
+import pandas as pd
+
+from sources.Model.TRPLeagueManager import TRPLeagueManager
+
+
+class TRPCardDiff:
+    kinds = ("hitters", "pitchers")
+
+    def __init__(self, old: TRPLeagueManager, new: TRPLeagueManager):
+        """
+        A player counts as changed when any field of their Card differs or when their rank among the players present in
+        both loads moved (the Cards are ordered best first, so a new rank can move them in or out of a group).  An ID
+        repeated in either load cannot be lined up by ID: it is listed in duplicates and its players count as changed.
+
+        :param old: the league before the Cards changed
+        :param new: the league loaded from the changed Cards
+        """
+        self.added = {}
+        self.removed = {}
+        self.changed = {}
+        self.duplicates = {}
+        self.slots = set()
+        for kind in self.kinds:
+            oldIds = old.ids[kind]
+            newIds = new.ids[kind]
+            self.added[kind] = np.setdiff1d(newIds, oldIds)
+            self.removed[kind] = np.setdiff1d(oldIds, newIds)
+            self.duplicates[kind] = np.union1d(_repeated(oldIds), _repeated(newIds))
+            # rows of the players present once in both loads, each in the order of its own file
+            oldCommon = np.flatnonzero(np.isin(oldIds, newIds) & ~np.isin(oldIds, self.duplicates[kind]))
+            newCommon = np.flatnonzero(np.isin(newIds, oldIds) & ~np.isin(newIds, self.duplicates[kind]))
+            moved = oldIds[oldCommon] != newIds[newCommon]
+
+            oldFrame = getattr(old, kind)
+            newFrame = getattr(new, kind)
+            # line the new rows up with the old ones by ID
+            aligned = newCommon[pd.Index(newIds[newCommon]).get_indexer(oldIds[oldCommon])]
+            different = moved.copy()
+            for column in oldFrame.columns.intersection(newFrame.columns):
+                different |= _differs(oldFrame[column].to_numpy()[oldCommon], newFrame[column].to_numpy()[aligned])
+            if len(oldFrame.columns.symmetric_difference(newFrame.columns)):
+                different[:] = True  # a field was added or dropped, every Card changed
+            self.changed[kind] = np.union1d(np.union1d(oldIds[oldCommon][different], newIds[newCommon][moved]),
+                                            np.intersect1d(self.duplicates[kind], np.intersect1d(oldIds, newIds)))
+
+            # a change reaches every slot the player was or is eligible for
+            oldMask = old.hitterMask if kind == "hitters" else old.pitcherMask
+            newMask = new.hitterMask if kind == "hitters" else new.pitcherMask
+            touched = np.union1d(self.changed[kind], np.union1d(self.added[kind], self.removed[kind]))
+            bits = np.bitwise_or.reduce(oldMask[np.isin(oldIds, touched)], initial=0) | \
+                np.bitwise_or.reduce(newMask[np.isin(newIds, touched)], initial=0)
+            slots = TRPLeagueManager.bats if kind == "hitters" else TRPLeagueManager.arms
+            self.slots.update(slot for slot in slots if bits & TRPLeagueManager.slotBits[slot])
+
+    @property
+    def affected_slots(self) -> list:
+        """
+        :return: the roster slots whose POS group may have changed, in lm.bats + lm.arms order
+        """
+        return [slot for slot in TRPLeagueManager.bats + TRPLeagueManager.arms if slot in self.slots]
+
+    @staticmethod
+    def same_cards(old: pd.DataFrame, new: pd.DataFrame) -> bool:
+        """
+        :return: True when both frames hold the same players in the same order with the same fields, floats compared to
+            within rounding (pd.read_json does not parse every float to the nearest double)
+        """
+        if len(old) != len(new) or not old.columns.equals(new.columns) or not old.index.equals(new.index):
+            return False
+        return not any(_differs(old[column].to_numpy(), new[column].to_numpy()).any() for column in old.columns)
+
+    def __repr__(self) -> str:
+        counts = []
+        for kind in self.kinds:
+            counts.append("{} +{} -{} ~{}".format(kind, len(self.added[kind]), len(self.removed[kind]),
+                                                  len(self.changed[kind])))
+            if len(self.duplicates[kind]):
+                counts[-1] += " ({} repeated IDs)".format(len(self.duplicates[kind]))
+        counts = ", ".join(counts)
+        return "TRPCardDiff({}; slots {})".format(counts, "/".join(self.affected_slots) or "none")
+
+
+def _repeated(ids: np.ndarray) -> np.ndarray:
+    unique, counts = np.unique(ids, return_counts=True)
+    return unique[counts > 1]
+
+
+def _differs(before: np.ndarray, after: np.ndarray) -> np.ndarray:
+    # elementwise "changed", missing on both sides is no change and floats only differ beyond rounding noise
+    if before.dtype.kind == "f" and after.dtype.kind == "f":
+        return ~np.isclose(before, after, rtol=1e-12, atol=0, equal_nan=True)
+    return (before != after) & ~(pd.isna(before) & pd.isna(after))
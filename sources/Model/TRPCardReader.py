@@ -0,0 +1,137 @@
+# TRPCardReader streams the Cards JSON one record at a time and stores the result with compact dtypes
+import json
+import re
+
+import numpy as np
+import pandas as pd
+
+_separators = re.compile(r"[\s,]*")
+
+
+def iter_cards(cards_path: str, buffer_size: int = 1 << 16):
+    """
+    Yields the Cards of a JSON array one dict at a time while only ever holding a buffer_size window of the file (plus
+    the record being decoded) in memory.
+
+    :param cards_path: path to the Cards JSON file
+    :param buffer_size: number of characters read from the file at a time
+    """
+    decoder = json.JSONDecoder()
+    with open(cards_path, encoding="utf-8") as cards_file:
+        buffer = cards_file.read(buffer_size).lstrip()
+        if not buffer.startswith("["):
+            raise ValueError("{} is not a JSON array of Cards".format(cards_path))
+        index = 1
+        eof = False
+        while True:
+            index = _separators.match(buffer, index).end()
+            if index < len(buffer) and buffer[index] == "]":
+                return
+            try:
+                if index == len(buffer):
+                    raise json.JSONDecodeError("buffer exhausted", buffer, index)
+                record, index = decoder.raw_decode(buffer, index)
+            except json.JSONDecodeError:
+                # the record runs past the end of the buffer, slide the window forward and retry it
+                if eof:
+                    raise ValueError("{} ends inside the Cards array".format(cards_path))
+                chunk = cards_file.read(buffer_size)
+                eof = not chunk
+                buffer = buffer[index:] + chunk
+                index = 0
+                continue
+            yield record
+
+
+def compact_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Downcasts every column to the smallest dtype that holds it exactly: integers to the narrowest signed width, floats
+    to float32 only when that round-trips without loss, and strings that repeat (at most one distinct value per two
+    rows, e.g. tm, pos, fantasyTeam) to categoricals.  Unique strings such as _name are left as plain strings.
+
+    :param frame: Hitter or Pitcher Cards
+    :return: new pd.DataFrame with the compact dtypes
+    """
+    columns = {}
+    for name in frame.columns:
+        series = frame[name]
+        if isinstance(series.dtype, pd.CategoricalDtype) and len(series.cat.categories) > len(series) // 2:
+            series = _numeric_strings(series.astype(series.cat.categories.dtype))
+        elif not pd.api.types.is_numeric_dtype(series.dtype) and not isinstance(series.dtype, pd.CategoricalDtype):
+            series = _numeric_strings(series)
+
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            pass
+        elif pd.api.types.is_bool_dtype(series.dtype):
+            pass
+        elif pd.api.types.is_integer_dtype(series.dtype):
+            series = pd.to_numeric(series, downcast="integer")
+        elif pd.api.types.is_float_dtype(series.dtype):
+            narrow = series.astype(np.float32)
+            if np.array_equal(narrow.to_numpy(dtype=np.float64), series.to_numpy(), equal_nan=True):
+                series = narrow
+        elif series.nunique() <= len(series) // 2:
+            series = series.astype("category")
+        columns[name] = series
+    return pd.DataFrame(columns, index=frame.index)
+
+
+def _numeric_strings(series: pd.Series) -> pd.Series:
+    # ID keys arrive as digit strings ("36969"), pd.read_json turns them into integers and so do we
+    try:
+        return pd.to_numeric(series)
+    except (ValueError, TypeError):
+        return series
+
+
+def _concat_chunks(chunks: list) -> pd.DataFrame:
+    # categoricals only survive pd.concat when every chunk shares the same categories
+    for name in chunks[0].columns:
+        categoricals = [chunk[name] for chunk in chunks if isinstance(chunk[name].dtype, pd.CategoricalDtype)]
+        if not categoricals:
+            continue
+        categories = categoricals[0].cat.categories
+        for categorical in categoricals[1:]:
+            categories = categories.union(categorical.cat.categories)
+        for chunk in chunks:
+            chunk[name] = chunk[name].astype(pd.CategoricalDtype(categories))
+    return pd.concat(chunks, ignore_index=True)
+
+
+def read_cards_compact(cards_path: str, chunk_size: int = 10_000) -> pd.DataFrame:
+    """
+    Low-memory replacement for pd.read_json on a Cards file.  Records are parsed incrementally and every chunk_size of
+    them are compacted before the next chunk is read, so the full JSON document and its Python objects never exist at
+    once.
+
+    :param cards_path: path to the Cards JSON file
+    :param chunk_size: number of records held as Python objects at a time
+    :return: pd.DataFrame of the Cards with compact dtypes
+    """
+    chunks = []
+    records = []
+    for record in iter_cards(cards_path):
+        records.append(record)
+        if len(records) == chunk_size:
+            chunks.append(_compact_chunk(records))
+            records = []
+    if records or not chunks:
+        chunks.append(_compact_chunk(records))
+    return compact_frame(_concat_chunks(chunks))
+
+
+def _compact_chunk(records: list) -> pd.DataFrame:
+    chunk = compact_frame(pd.DataFrame.from_records(records))
+    for name in chunk.columns:
+        if not pd.api.types.is_numeric_dtype(chunk[name].dtype):
+            # strings stay categorical in every chunk, compact_frame decides on the concatenated column
+            chunk[name] = chunk[name].astype("category")
+    return chunk
+
+
+def memory_report(frames: dict) -> dict:
+    """
+    :param frames: dict of name to pd.DataFrame
+    :return: dict of name to the deep memory use of the frame in bytes
+    """
+    return {name: int(frame.memory_usage(deep=True).sum()) for name, frame in frames.items()}
@@ -0,0 +1,206 @@
+# TRPComparables finds the players whose stat profile is closest to a given player's, e.g. the free agents that could
+# replace an injured starter.  Profiles are standardized stat vectors searched with a KD-tree.
+import heapq
+
+import numpy as np
+import pandas as pd
+
+from sources.Model.TRPLeagueManager import TRPLeagueManager
+
+
+class _KDTree:
+    """
+    KD-tree over the rows of points, built with median splits on the widest dimension.  Nodes are stored in flat arrays
+    and every node owns the contiguous range start:end of perm, so a leaf is scanned with one vectorized distance.
+    """
+
+    def __init__(self, points: np.ndarray, leaf_size: int = 32):
+        self.points = points
+        self.perm = np.arange(len(points))
+        starts, ends, lefts, rights, lows, highs = [], [], [], [], [], []
+        stack = [(0, len(points), -1, False)]  # (start, end, parent node, is right child)
+        while stack:
+            start, end, parent, right = stack.pop()
+            node = len(starts)
+            if parent >= 0:
+                (rights if right else lefts)[parent] = node
+            block = points[self.perm[start:end]]
+            starts.append(start)
+            ends.append(end)
+            lefts.append(-1)
+            rights.append(-1)
+            lows.append(block.min(axis=0) if len(block) else np.zeros(points.shape[1]))
+            highs.append(block.max(axis=0) if len(block) else np.zeros(points.shape[1]))
+            if end - start <= leaf_size:
+                continue
+            dimension = np.argmax(highs[-1] - lows[-1])
+            middle = (start + end) // 2
+            split = np.argpartition(block[:, dimension], middle - start)
+            self.perm[start:end] = self.perm[start:end][split]
+            stack.append((middle, end, node, True))
+            stack.append((start, middle, node, False))
+        self.starts = np.array(starts)
+        self.ends = np.array(ends)
+        self.lefts = np.array(lefts)
+        self.rights = np.array(rights)
+        self.lows = np.array(lows)
+        self.highs = np.array(highs)
+
+    def _box_distance(self, nodes, query: np.ndarray) -> np.ndarray:
+        gap = np.maximum(np.maximum(self.lows[nodes] - query, query - self.highs[nodes]), 0)
+        return (gap * gap).sum(axis=-1)
+
+    def query(self, query: np.ndarray, k: int, accept=None) -> (np.ndarray, np.ndarray):
+        """
+        :param query: point to search around
+        :param k: number of neighbours
+        :param accept: function of an array of point indices returning which of them may be returned, None for all
+        :return: tuple of the k nearest accepted point indices and their squared distances, nearest first
+        """
+        found = np.empty(0, dtype=np.int64)
+        distances = np.empty(0)
+        bound = np.inf  # squared distance of the k-th neighbour found so far
+        heap = [(float(self._box_distance(0, query)), 0)]
+        while heap:
+            boxDistance, node = heapq.heappop(heap)
+            if boxDistance > bound:
+                break
+            if self.lefts[node] < 0:
+                candidates = self.perm[self.starts[node]:self.ends[node]]
+                if accept is not None:
+                    candidates = candidates[accept(candidates)]
+                if not len(candidates):
+                    continue
+                offset = self.points[candidates] - query
+                found = np.concatenate([found, candidates])
+                distances = np.concatenate([distances, (offset * offset).sum(axis=1)])
+                if len(found) > k:
+                    keep = np.argpartition(distances, k - 1)[:k]
+                    found = found[keep]
+                    distances = distances[keep]
+                if len(found) == k:
+                    bound = distances.max()
+                continue
+            children = np.array([self.lefts[node], self.rights[node]])
+            for child, childDistance in zip(children, self._box_distance(children, query)):
+                if childDistance <= bound:
+                    heapq.heappush(heap, (float(childDistance), int(child)))
+        order = np.lexsort((found, distances))
+        return found[order], distances[order]
+
+    def query_many(self, queries: np.ndarray, k: int, accept=None) -> (np.ndarray, np.ndarray):
+        """
+        query() for many points at once: every leaf is scanned in one vectorized pass for all the queries whose k-th
+        neighbour so far is farther away than the leaf's box
+
+        :param queries: queries x dimensions points to search around
+        :param k: number of neighbours
+        :param accept: function of (query numbers, point indices) returning the queries x points array of which points
+            each query may return, None for all
+        :return: tuple of queries x k arrays of the nearest accepted point indices and their squared distances, nearest
+            first; -1 and inf fill the rows of queries with fewer than k accepted points
+        """
+        found = np.full((len(queries), k), -1, dtype=np.int64)
+        distances = np.full((len(queries), k), np.inf)
+        leaves = np.flatnonzero(self.lefts < 0)
+        gaps = self._box_distance(leaves[None, :], queries[:, None, :])  # queries x leaves
+        # leaves close to many queries first, so the bounds tighten early
+        for column in np.argsort(gaps.sum(axis=0), kind="stable"):
+            active = np.flatnonzero(gaps[:, column] <= distances[:, -1])
+            candidates = self.perm[self.starts[leaves[column]]:self.ends[leaves[column]]]
+            if not len(active) or not len(candidates):
+                continue
+            offset = self.points[candidates][None, :, :] - queries[active][:, None, :]
+            leafDistances = (offset * offset).sum(axis=2)
+            if accept is not None:
+                leafDistances[~accept(active, candidates)] = np.inf
+            merged = np.concatenate([distances[active], leafDistances], axis=1)
+            mergedPoints = np.concatenate([found[active], np.broadcast_to(candidates, leafDistances.shape)], axis=1)
+            keep = np.lexsort((mergedPoints, merged), axis=1)[:, :k]
+            distances[active] = np.take_along_axis(merged, keep, axis=1)
+            found[active] = np.take_along_axis(mergedPoints, keep, axis=1)
+        found[np.isinf(distances)] = -1
+        return found, distances
+
+
+class TRPComparables:
+    profiles = {"hitters": ["OBP", "SLG", "xSLG", "xwOBA", "SBN"], "pitchers": ["K/9", "WHIP", "xERA", "SVHD"]}
+
+    def __init__(self, lm: TRPLeagueManager, leaf_size: int = 32):
+        """
+        Standardizes every player's profile stats (z-scores over all hitters or all pitchers, a missing stat counts as
+        average).  The KD-tree of a candidate pool is built on its first query.
+
+        :param lm: the TRPLeagueManager holding the Cards
+        :param leaf_size: players per KD-tree leaf
+        """
+        self.lm = lm
+        self.leaf_size = leaf_size
+        self.vectors = {}
+        for kind, stats in self.profiles.items():
+            values = getattr(lm, kind)[stats].to_numpy(dtype=np.float64)
+            mean = np.nanmean(values, axis=0) if len(values) else np.zeros(len(stats))
+            std = np.nanstd(values, axis=0) if len(values) else np.ones(len(stats))
+            std[~(std > 0)] = 1
+            self.vectors[kind] = np.nan_to_num((values - mean) / std)
+        self._trees = {}  # (kind, fantasy_team) -> (rows of the pool, _KDTree)
+
+    def _pool(self, kind: str, fantasy_team: str) -> (np.ndarray, _KDTree):
+        key = (kind, fantasy_team)
+        if key not in self._trees:
+            frame = getattr(self.lm, kind)
+            if fantasy_team is None:
+                rows = np.arange(len(frame))
+            else:
+                rows = np.flatnonzero(frame["fantasyTeam"].to_numpy() == fantasy_team)
+            self._trees[key] = (rows, _KDTree(self.vectors[kind][rows], self.leaf_size))
+        return self._trees[key]
+
+    def _nearest(self, kind: str, row: int, k: int, pos: str, fantasy_team: str) -> (np.ndarray, np.ndarray):
+        rows, tree = self._pool(kind, fantasy_team)
+        mask = self.lm.hitterMask if kind == "hitters" else self.lm.pitcherMask
+        # comparables must fit the slot asked for, or any slot the player is eligible for
+        required = TRPLeagueManager.slotBits[pos] if pos is not None else int(mask[row])
+        accept = lambda points: ((mask[rows[points]] & required) != 0) & (rows[points] != row)
+        points, distances = tree.query(self.vectors[kind][row], k, accept)
+        return rows[points], np.sqrt(distances)
+
+    def comparables(self, kind: str, row: int, k: int = 5, pos: str = None, fantasy_team: str = "FA") -> pd.DataFrame:
+        """
+        :param kind: "hitters" or "pitchers"
+        :param row: row position of the player in the frame
+        :param k: number of comparable players
+        :param pos: roster slot the comparables must be eligible for, defaults to any slot the player is eligible for
+        :param fantasy_team: fantasyTeam the comparables are taken from, None for every player
+        :return: pd.DataFrame of the comparable players (indexed like the Cards) closest first, with their "distance"
+        """
+        found, distances = self._nearest(kind, row, k, pos, fantasy_team)
+        frame = getattr(self.lm, kind)
+        result = frame.iloc[found][["_name", "pos", "fantasyTeam"] + self.profiles[kind]]
+        return result.assign(distance=distances)
+
+    def for_roster(self, kind: str = "hitters", k: int = 3, team: str = None, fantasy_team: str = "FA") -> pd.DataFrame:
+        """
+        Batch query: the k closest comparables of every rostered player (every player not on fantasy_team)
+
+        :param team: only the players of this fantasyTeam, every fantasy team by default
+        :return: pd.DataFrame with one row per (player, comparable): the player's and comparable's names and rows, the
+            comparable's rank and distance
+        """
+        frame = getattr(self.lm, kind)
+        teams = frame["fantasyTeam"].to_numpy()
+        players = np.flatnonzero(teams == team) if team is not None else np.flatnonzero(teams != fantasy_team)
+        rows, tree = self._pool(kind, fantasy_team)
+        mask = self.lm.hitterMask if kind == "hitters" else self.lm.pitcherMask
+        # as in _nearest, comparables fit a slot the player is eligible for and are never the player
+        accept = lambda queries, points: \
+            ((mask[rows[points]][None, :] & mask[players[queries]][:, None]) != 0) & \
+            (rows[points][None, :] != players[queries][:, None])
+        points, distances = tree.query_many(self.vectors[kind][players], k, accept)
+        query, rank = np.nonzero(points >= 0)  # found neighbours are packed at the start of each query's row
+        playerRows = players[query]
+        comparableRows = rows[points[query, rank]]
+        names = frame["_name"].to_numpy()
+        return pd.DataFrame({"player": names[playerRows], "playerRow": playerRows, "rank": rank + 1,
+                             "comparable": names[comparableRows], "comparableRow": comparableRows,
+                             "distance": np.sqrt(distances[query, rank])})
@@ -0,0 +1,241 @@
+# TRPIngest builds the Hitter and Pitcher Cards from the three local source exports:
+#   ESPN player universe (HTML table or CSV)  _name/Name, pos, tm/Team, fantasyTeam (FA when missing), idESPN,
+#                                             idFangraphs, idSavant
+#   Fangraphs RoS projections (CSV)           playerid/PlayerId plus PA, AB, R, HR, RBI, SB, CS, OBP, SLG, wOBA for
+#                                             hitters and IP, QS, SV, HLD, K/9, ERA, WHIP, FIP for pitchers
+#   Baseball Savant expected stats (CSV)      player_id plus est_woba, est_slg for batters and xera for pitchers
+# The universe is the hub: its rows are indexed by idFangraphs and idSavant and the (much longer) source exports are
+# streamed in chunks and hash-joined against it, so only matched rows are ever kept.  A player becomes a hitter and/or
+# a pitcher Card by the roster slots in their pos and needs a match in both exports of that kind.
+import html.parser
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from sources.Model.TRPCardCache import TRPCardCache
+from sources.Model.TRPLeagueManager import TRPLeagueManager
+
+
+class _TableParser(html.parser.HTMLParser):
+    """
+    Collects the rows of the html tables fed to it; cells are joined text, the first row with th cells is the header
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.header = None
+        self.rows = []
+        self._row = None
+        self._cell = None
+        self._headerRow = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "tr":
+            self._row = []
+            self._headerRow = False
+        elif tag in ("td", "th") and self._row is not None:
+            self._cell = []
+            self._headerRow |= tag == "th"
+
+    def handle_endtag(self, tag):
+        if tag in ("td", "th") and self._cell is not None:
+            self._row.append("".join(self._cell).strip())
+            self._cell = None
+        elif tag == "tr" and self._row is not None:
+            if self._headerRow and self.header is None:
+                self.header = self._row
+            elif not self._headerRow and self._row:
+                self.rows.append(self._row)
+            self._row = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+
+class TRPIngest:
+    kinds = ("hitters", "pitchers")
+    sourcePaths = {"universe": "resources/sources/ESPNUniverse.html",
+                   "fangraphs": {"hitters": "resources/sources/FangraphsHitters.csv",
+                                 "pitchers": "resources/sources/FangraphsPitchers.csv"},
+                   "savant": {"hitters": "resources/sources/SavantHitters.csv",
+                              "pitchers": "resources/sources/SavantPitchers.csv"}}
+    # source column name -> Card field
+    aliases = {"Name": "_name", "name": "_name", "Team": "tm", "team": "tm", "Pos": "pos",
+               "playerid": "idFangraphs", "PlayerId": "idFangraphs", "player_id": "idSavant"}
+    universeColumns = ["_name", "pos", "tm", "fantasyTeam", "idESPN", "idFangraphs", "idSavant"]
+    fangraphsColumns = {"hitters": ["PA", "AB", "R", "HR", "RBI", "SB", "CS", "OBP", "SLG", "wOBA"],
+                        "pitchers": ["IP", "QS", "SV", "HLD", "K/9", "ERA", "WHIP", "FIP"]}
+    savantColumns = {"hitters": {"est_woba": "xwOBA", "est_slg": "xSLG"}, "pitchers": {"xera": "xERA"}}
+    integerColumns = {"AB", "HR", "PA", "R", "RBI", "SBN", "IP", "QS", "SVHD"}
+    # league wOBA and wOBA scale the wRAA of the Cards is derived with
+    lgwOBA = 0.31725
+    wOBAScale = 1.19425
+    # Card fields in the order of the Cards files
+    cardColumns = {"hitters": ["_name", "AB", "fantasyTeam", "HR", "idESPN", "idFangraphs", "idSavant", "OBP", "PA",
+                               "pos", "R", "RBI", "SBN", "SLG", "tm", "wOBA", "wRAA", "xSLG", "xwOBA"],
+                   "pitchers": ["_name", "ERA", "fantasyTeam", "FIP", "idESPN", "idFangraphs", "idSavant", "IP",
+                                "K/9", "pos", "QS", "SVHD", "tm", "wFIP", "WHIP", "xERA"]}
+
+    def __init__(self, universe: str = None, fangraphs: dict = None, savant: dict = None, chunk_size: int = 50_000,
+                 free_agents: str = "FA"):
+        """
+        :param universe: ESPN universe export (.html or .csv), defaults to sourcePaths
+        :param fangraphs: dict of kind to the Fangraphs projections CSV, defaults to sourcePaths
+        :param savant: dict of kind to the Savant expected stats CSV, defaults to sourcePaths
+        :param chunk_size: source rows parsed at a time
+        :param free_agents: fantasyTeam of universe players without one
+        """
+        self.universe_path = universe or self.sourcePaths["universe"]
+        self.fangraphs_paths = fangraphs or self.sourcePaths["fangraphs"]
+        self.savant_paths = savant or self.sourcePaths["savant"]
+        self.chunk_size = chunk_size
+        self.free_agents = free_agents
+        self.unmatched = {}  # kind -> pd.DataFrame of the universe players left out and why
+        self.ignored = {}  # source name -> number of its rows whose ID is not in the universe
+
+    def run(self) -> dict:
+        """
+        :return: dict of kind to the pd.DataFrame of its Cards, best first (wRAA for hitters, xERA for pitchers)
+        """
+        universe = self.read_universe()
+        slots = universe["pos"].fillna("").str.split("/")
+        cards = {}
+        for kind in self.kinds:
+            positions = set(TRPLeagueManager.bats if kind == "hitters" else TRPLeagueManager.arms)
+            candidates = universe[slots.map(lambda pos: not positions.isdisjoint(pos)).to_numpy(dtype=bool)]
+            projections = self._join(candidates, "idFangraphs", self.fangraphs_paths[kind],
+                                     self.fangraphsColumns[kind], "Fangraphs " + kind)
+            expected = self._join(candidates, "idSavant", self.savant_paths[kind], list(self.savantColumns[kind]),
+                                  "Savant " + kind)
+            matched = projections.notna().all(axis=1).to_numpy() & expected.notna().all(axis=1).to_numpy()
+            reasons = np.where(projections.notna().all(axis=1), "", "no Fangraphs projection; ")
+            reasons = np.char.add(reasons, np.where(expected.notna().all(axis=1), "", "no Savant expected stats"))
+            self.unmatched[kind] = candidates.loc[~matched, ["_name", "pos", "idESPN", "idFangraphs", "idSavant"]] \
+                .assign(reason=np.char.rstrip(reasons[~matched], "; "))
+            frame = pd.concat([candidates, projections, expected.rename(columns=self.savantColumns[kind])], axis=1)
+            cards[kind] = self._cards(kind, frame[matched])
+        return cards
+
+    def read_universe(self) -> pd.DataFrame:
+        """
+        :return: the ESPN universe with the universeColumns, one row per idESPN (the first of repeated IDs)
+        """
+        if self.universe_path.lower().endswith((".html", ".htm")):
+            parser = _TableParser()
+            with open(self.universe_path, encoding="utf-8") as universe_file:
+                for chunk in iter(lambda: universe_file.read(1 << 20), ""):
+                    parser.feed(chunk)
+            parser.close()
+            if parser.header is None:
+                raise ValueError("{} has no table header row".format(self.universe_path))
+            width = len(parser.header)
+            universe = pd.DataFrame([row[:width] + [None] * (width - len(row)) for row in parser.rows],
+                                    columns=parser.header)
+        else:
+            universe = pd.concat(self._chunks(self.universe_path, None), ignore_index=True)
+        universe = universe.rename(columns=self.aliases)
+        if "fantasyTeam" not in universe.columns:
+            universe["fantasyTeam"] = self.free_agents
+        missing = [column for column in self.universeColumns if column not in universe.columns]
+        if missing:
+            raise ValueError("{} lacks the column(s) {}".format(self.universe_path, ", ".join(missing)))
+        universe = universe[self.universeColumns]
+        universe["fantasyTeam"] = universe["fantasyTeam"].fillna(self.free_agents).replace("", self.free_agents)
+        for column in TRPLeagueManager.idColumns:
+            universe[column] = pd.to_numeric(universe[column], errors="coerce").astype("Int64")
+        return universe.dropna(subset=["idESPN"]).drop_duplicates("idESPN").reset_index(drop=True)
+
+    def _chunks(self, path: str, columns):
+        # only the wanted columns (under any alias) are parsed, chunk by chunk
+        wanted = None if columns is None else \
+            lambda name: name in columns or self.aliases.get(name) in columns
+        return pd.read_csv(path, usecols=wanted, chunksize=self.chunk_size, encoding="utf-8-sig")
+
+    def _join(self, universe: pd.DataFrame, key: str, path: str, columns: list, source: str) -> pd.DataFrame:
+        """
+        Hash join of a source export onto the universe rows by key, streamed chunk by chunk
+
+        :return: pd.DataFrame of columns aligned with universe, NaN where a player has no row in the source
+        """
+        index = pd.Index(universe[key].dropna().unique())
+        matched = []
+        ignored = 0
+        for chunk in self._chunks(path, set(columns) | {key}):
+            chunk = chunk.rename(columns=self.aliases)
+            missing = [column for column in [key] + columns if column not in chunk.columns]
+            if missing:
+                raise ValueError("{} lacks the column(s) {}".format(path, ", ".join(missing)))
+            ids = pd.to_numeric(chunk[key], errors="coerce")
+            found = index.get_indexer(ids) >= 0
+            ignored += int((~found).sum())
+            matched.append(chunk.loc[found, [key] + columns].assign(**{key: ids[found].astype(np.int64)}))
+        self.ignored[source] = ignored
+        rows = pd.concat(matched, ignore_index=True).drop_duplicates(key) if matched else \
+            pd.DataFrame(columns=[key] + columns)
+        aligned = rows.set_index(key).reindex(universe[key].to_numpy())
+        aligned.index = universe.index
+        return aligned[columns].apply(pd.to_numeric, errors="coerce")
+
+    def _cards(self, kind: str, frame: pd.DataFrame) -> pd.DataFrame:
+        frame = frame.copy()
+        if kind == "hitters":
+            frame["SBN"] = frame["SB"] - frame["CS"]
+        else:
+            frame["SVHD"] = frame["SV"] + frame["HLD"]
+        for column in self.integerColumns.intersection(frame.columns):
+            frame[column] = np.rint(frame[column].to_numpy(dtype=np.float64)).astype(np.int64)
+        if kind == "hitters":
+            frame["wRAA"] = (frame["wOBA"] - self.lgwOBA) / self.wOBAScale * frame["PA"]
+        else:
+            frame["wFIP"] = frame["FIP"] * frame["IP"]
+        for column in TRPLeagueManager.idColumns:
+            frame[column] = frame[column].astype(np.int64)
+        rank = TRPLeagueManager.rankColumns[kind]
+        frame = frame.sort_values(rank, ascending=rank in TRPLeagueManager.lowerIsBetter, kind="stable")
+        return frame[self.cardColumns[kind]].reset_index(drop=True)
+
+    def write(self, cards: dict, paths: dict = None) -> list:
+        """
+        Writes the Cards JSON and, straight from the frames, the columnar TRPCardCache keyed by it, so TRPLeagueManager
+        loads the new Cards without parsing the JSON while every other reader of the Cards files sees them too
+
+        :param cards: dict of kind to Cards from run()
+        :param paths: dict of kind to the Cards JSON path, defaults to TRPLeagueManager.cardsPaths (the cache lives
+            beside it)
+        :return: list of the written paths
+        """
+        paths = paths or TRPLeagueManager.cardsPaths
+        written = []
+        for kind, frame in cards.items():
+            records = frame.astype({column: str for column in TRPLeagueManager.idColumns}).to_dict("records")
+            with open(paths[kind] + ".tmp", "w", encoding="utf-8") as cards_file:
+                json.dump(records, cards_file, indent=2)
+            os.replace(paths[kind] + ".tmp", paths[kind])
+            written.append(paths[kind])
+            # cached with the dtypes pd.read_json parses the JSON just written back with, it downcasts whole floats
+            whole = [column for column in frame.select_dtypes(np.floating).columns
+                     if frame[column].notna().all() and (frame[column] % 1 == 0).all()]
+            cache = TRPCardCache(paths[kind])
+            cache.store(frame.astype({column: np.int64 for column in whole}))
+            written.append(cache.cache_dir)
+        return written
+
+    def summary(self, cards: dict) -> str:
+        """
+        :return: the Card counts, the unmatched universe players with their reason and the ignored source rows
+        """
+        lines = []
+        for kind in self.kinds:
+            lines.append("{}: {} Cards, {} universe players unmatched".format(
+                kind, len(cards.get(kind, ())), len(self.unmatched.get(kind, ()))))
+            unmatched = self.unmatched.get(kind)
+            if unmatched is not None:
+                for name, pos, idESPN, reason in zip(unmatched["_name"], unmatched["pos"], unmatched["idESPN"],
+                                                     unmatched["reason"]):
+                    lines.append("  {} ({}, idESPN {}): {}".format(name, pos, idESPN, reason))
+        for source, count in self.ignored.items():
+            lines.append("{}: {} rows not in the universe".format(source, count))
+        return "\n".join(lines)
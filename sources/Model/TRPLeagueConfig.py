@@ -0,0 +1,47 @@
+# TRPLeagueConfig describes the shape of one fantasy league: team count, starting roster slots and how deep each position
+# group is analysed
+from sources.Model.TRPLeagueManager import TRPLeagueManager
+
+
+class TRPLeagueConfig:
+    # starting roster slots per fantasy team
+    rosterSlots = {"OF": 3, "1B": 1, "3B": 1, "2B": 1, "SS": 1, "DH": 1, "C": 1, "SP": 5, "RP": 4}
+    hitterCutoffs = {"OF": 60}  # 3x more OF than any other position so get 3x results
+
+    def __init__(self, name: str = "default", teams: int = 12, roster_slots: dict = None, pitcher_buffer: int = 26,
+                 hitter_cutoff: int = 20, hitter_cutoffs: dict = None):
+        """
+        The defaults describe the league main.py has always analysed.
+
+        :param name: label the batch results are keyed by
+        :param teams: number of fantasy teams
+        :param roster_slots: starting slots per team, defaults to rosterSlots
+        :param pitcher_buffer: pitchers kept past teams * slots at SP and RP (an arbitrary overage buffer)
+        :param hitter_cutoff: hitters kept at every batting slot without an entry in hitter_cutoffs
+        :param hitter_cutoffs: hitters kept per batting slot, defaults to hitterCutoffs
+        """
+        self.name = name
+        self.teams = teams
+        self.roster_slots = dict(self.rosterSlots if roster_slots is None else roster_slots)
+        self.pitcher_buffer = pitcher_buffer
+        self.hitter_cutoff = hitter_cutoff
+        self.hitter_cutoffs = dict(self.hitterCutoffs if hitter_cutoffs is None else hitter_cutoffs)
+
+    def pool_size(self, pos: str) -> int:
+        """
+        :param pos: a string representation of the roster slot
+        :return: number of players of the POS group kept for analysis
+        """
+        if pos in TRPLeagueManager.arms:
+            return self.teams * self.roster_slots.get(pos, 0) + self.pitcher_buffer
+        return self.hitter_cutoffs.get(pos, self.hitter_cutoff)
+
+    def starters(self, pos: str) -> int:
+        """
+        :param pos: a string representation of the roster slot
+        :return: number of players started at the slot across the league
+        """
+        return self.teams * self.roster_slots.get(pos, 0)
+
+    def __repr__(self) -> str:
+        return "TRPLeagueConfig({!r}, teams={}, roster_slots={})".format(self.name, self.teams, self.roster_slots)
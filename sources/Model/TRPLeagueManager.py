@@ -1,25 +1,163 @@
 # TRPLeagueManager handles the instantiation of pd.DataFrames
 import math
 
+import numpy as np
 import pandas as pd
 
+from sources.Model.TRPCardCache import TRPCardCache
+from sources.Model.TRPCardReader import memory_report, read_cards_compact
+
 
 class TRPLeagueManager:
     bats = ["OF", "1B", "3B", "2B", "SS", "DH", "C"]  # these strings represent the offensive positions
     arms = ["SP", "RP"]  # these strings represent the pitching positions
+    # every roster slot owns one bit so a player's full eligibility fits in a single integer
+    slotBits = {slot: 1 << i for i, slot in enumerate(bats + arms)}
+    cardsPaths = {"hitters": "resources/TRPHitterCards.json", "pitchers": "resources/TRPPitcherCards.json"}
+    idColumns = ["idESPN", "idFangraphs", "idSavant"]  # referential ID keys, idESPN identifies a player
+    rankColumns = {"hitters": "wRAA", "pitchers": "xERA"}  # what "best" means when a query names no stat
+    lowerIsBetter = {"ERA", "WHIP", "xERA", "FIP", "wFIP"}
+
+    def __init__(self, use_cache: bool = True, low_memory: bool = False):
+        """
+        :param use_cache: load the Cards through their columnar TRPCardCache instead of re-parsing the JSON every time
+        :param low_memory: stream the Cards record by record and keep them with categorical strings and downcast numerics
+        """
+        self.use_cache = use_cache
+        self.low_memory = low_memory
+        self.reload()
 
-    def __init__(self):
+    def reload(self):
+        """
+        Reads the Cards files again, rebuilds the eligibility index and drops every cached top() query
+        """
+        reader = read_cards_compact if self.low_memory else pd.read_json
+        read_cards = (lambda path: TRPCardCache(path, reader).load()) if self.use_cache else reader
 
-        self.hitters: pd.DataFrame = pd.read_json("resources/TRPHitterCards.json"). \
-            drop(["idESPN", "idFangraphs", "idSavant"], axis=1)  # drop referential ID keys
+        hitters = read_cards(self.cardsPaths["hitters"])
+        pitchers = read_cards(self.cardsPaths["pitchers"])
+        # the ESPN ID of every row is kept aside (e.g. for diffing two loads), the referential ID keys are dropped
+        self.ids = {"hitters": hitters["idESPN"].to_numpy(), "pitchers": pitchers["idESPN"].to_numpy()}
+        self.hitters: pd.DataFrame = hitters.drop(self.idColumns, axis=1)
         # reorder columns for readability
         self.hitters.reindex(columns=["_name", "tm", "pos", "fantasyTeam",
                                       "wRAA", "wOBA", "xwOBA",
                                       "AB", "PA", "R", "HR", "RBI", "SBN", "OBP", "SLG", "xSLG"])
 
-        self.pitchers: pd.DataFrame = pd.read_json("resources/TRPPitcherCards.json"). \
-            drop(["idESPN", "idFangraphs", "idSavant"], axis=1)
+        self.pitchers: pd.DataFrame = pitchers.drop(self.idColumns, axis=1)
         self.pitchers.reindex(columns=["_name", "tm", "pos", "fantasyTeam",
                                        "xERA", "FIP", "wFIP", \
                                        "IP", "QS", "SVHD", "K/9", "ERA", "WHIP"])
 
+        self._index_positions()
+
+    def update_player(self, kind: str, row: int, changes: dict):
+        """
+        Writes new values into one player's Card and keeps the eligibility index current when "pos" changes
+
+        :param kind: "hitters" or "pitchers"
+        :param row: row position of the player in the frame
+        :param changes: dict of column name to new value
+        """
+        frame: pd.DataFrame = getattr(self, kind)
+        for column, value in changes.items():
+            if isinstance(frame[column].dtype, pd.CategoricalDtype) and value not in frame[column].cat.categories:
+                frame[column] = frame[column].cat.add_categories([value])
+            frame.iloc[row, frame.columns.get_loc(column)] = value
+        self._queries = {}
+        if "pos" in changes:
+            self._index_positions()
+
+    def memory_usage(self) -> dict:
+        """
+        :return: dict with the deep memory use in bytes of the hitters and pitchers frames
+        """
+        return memory_report({"hitters": self.hitters, "pitchers": self.pitchers})
+
+    def _index_positions(self):
+        """
+        Splits the slash-delimited "pos" strings once and builds the eligibility index.  hitterMask/pitcherMask hold
+        one slotBits integer per row and eligibility maps each slot to the row positions of its frame, in frame order.
+        """
+        self._queries = {}  # top() arguments -> row positions of the answer
+        self.hitterMask = self.eligibility_mask(self.hitters)
+        self.pitcherMask = self.eligibility_mask(self.pitchers)
+        self.eligibility = {}
+        for slot in self.bats:
+            self.eligibility[slot] = np.flatnonzero(self.hitterMask & self.slotBits[slot])
+        for slot in self.arms:
+            self.eligibility[slot] = np.flatnonzero(self.pitcherMask & self.slotBits[slot])
+
+    @classmethod
+    def eligibility_mask(cls, frame: pd.DataFrame) -> np.ndarray:
+        """
+        :param frame: Hitter or Pitcher Cards, or any other frame of players with their "pos"
+        :return: np.ndarray with the OR of slotBits for every position a row is eligible for
+        """
+        tokens = frame["pos"].reset_index(drop=True).str.split("/").explode()  # index is the row position
+        bits = tokens.map(cls.slotBits).fillna(0).to_numpy(dtype=np.int64)
+        mask = np.zeros(len(frame), dtype=np.int64)
+        np.bitwise_or.at(mask, tokens.index.to_numpy(), bits)
+        return mask
+
+    def frame_for(self, pos: str) -> pd.DataFrame:
+        """
+        :param pos: a string representation of the roster slot
+        :return: the Pitcher Cards for the slots in arms, otherwise the Hitter Cards
+        """
+        return self.pitchers if pos in self.arms else self.hitters
+
+    def pos_group(self, pos: str) -> pd.DataFrame:
+        """
+        Gathers every player eligible at the roster slot, keeping the order (and index) of the Cards
+
+        :param pos: a string representation of the roster slot
+        :return: pd.DataFrame of the eligible players
+        """
+        return self.frame_for(pos).iloc[self.eligibility[pos]]
+
+    def top(self, pos: str = None, by: str = None, k: int = None, ascending: bool = None, fantasy_team: str = None,
+            team: str = None, kind: str = None) -> pd.DataFrame:
+        """
+        Filters the players and returns the best k by any stat, independent of the order of the Cards file.  Only the
+        k best are sorted (partial selection), and the answer is cached until the Cards are reloaded or updated.
+
+        :param pos: roster slot the players must be eligible for, which also picks hitters or pitchers
+        :param by: stat column to rank by, defaults to wRAA for hitters and xERA for pitchers
+        :param k: number of players to return, every matching player when None
+        :param ascending: defaults to lowest first for lowerIsBetter stats and highest first otherwise
+        :param fantasy_team: keep only the players of this fantasyTeam, e.g. "FA"
+        :param team: keep only the players of this MLB team (tm)
+        :param kind: "hitters" or "pitchers" when no pos is given, defaults to hitters
+        :return: pd.DataFrame of the players best first (missing stats last, ties in Cards order), indexed like the Cards
+        """
+        if pos is not None:
+            kind = "pitchers" if pos in self.arms else "hitters"
+        kind = kind or "hitters"
+        by = by or self.rankColumns[kind]
+        if ascending is None:
+            ascending = by in self.lowerIsBetter
+        key = (kind, pos, by, k, ascending, fantasy_team, team)
+        rows = self._queries.get(key)
+        if rows is None:
+            rows = self._queries[key] = self._select(kind, pos, by, k, ascending, fantasy_team, team)
+        return getattr(self, kind).iloc[rows]
+
+    def _select(self, kind: str, pos: str, by: str, k: int, ascending: bool, fantasy_team: str,
+                team: str) -> np.ndarray:
+        frame: pd.DataFrame = getattr(self, kind)
+        rows = self.eligibility[pos] if pos is not None else np.arange(len(frame))
+        for column, value in (("fantasyTeam", fantasy_team), ("tm", team)):
+            if value is not None:
+                rows = rows[frame[column].to_numpy()[rows] == value]
+        values = frame[by].to_numpy(dtype=np.float64)[rows]
+        if not ascending:
+            values = -values
+        values[np.isnan(values)] = np.inf  # missing stats go last
+        if k is not None and k < len(rows):
+            # keep everything up to the k-th best value (ties at the boundary included), then sort just those
+            kth = np.partition(values, k - 1)[k - 1]
+            keep = values <= kth
+            rows = rows[keep]
+            values = values[keep]
+        return rows[np.lexsort((rows, values))][:k]
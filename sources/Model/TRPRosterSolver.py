@@ -0,0 +1,290 @@
+# TRPRosterSolver assigns a fantasy team's players to its starting roster slots so the lineup is worth the most, using
+# the slot values of a TRPValuationEngine
+import numpy as np
+import pandas as pd
+
+from sources.Model.TRPValuationEngine import TRPValuationEngine
+
+_emptySlot = 1e6  # cost of leaving a slot empty, larger than any player so a slot is only empty when nobody fits it
+
+
+def _augment(cost: np.ndarray, u: np.ndarray, v: np.ndarray, col4row: np.ndarray, row4col: np.ndarray, start: int):
+    """
+    One shortest augmenting path step of the Hungarian method (Jonker-Volgenant form) for a rows <= columns cost matrix:
+    matches row start and re-matches the rows along the path, keeping the duals u, v feasible.  Arrays change in place.
+    """
+    shortest = np.full(cost.shape[1], np.inf)
+    path = np.full(cost.shape[1], -1)
+    rowsSeen = np.zeros(cost.shape[0], dtype=bool)
+    columnsSeen = np.zeros(cost.shape[1], dtype=bool)
+    minVal = 0.0
+    row = start
+    sink = -1
+    while sink < 0:
+        rowsSeen[row] = True
+        reduced = minVal + cost[row] - u[row] - v
+        better = ~columnsSeen & (reduced < shortest)
+        path[better] = row
+        shortest[better] = reduced[better]
+        candidates = np.where(columnsSeen, np.inf, shortest)
+        minVal = candidates.min()
+        if minVal == np.inf:
+            raise ValueError("no feasible assignment for row {}".format(start))
+        ties = np.flatnonzero(candidates == minVal)
+        free = ties[row4col[ties] < 0]  # prefer ending the path over extending it
+        column = free[0] if len(free) else ties[0]
+        columnsSeen[column] = True
+        if row4col[column] < 0:
+            sink = column
+        else:
+            row = row4col[column]
+
+    u[start] += minVal
+    others = rowsSeen.copy()
+    others[start] = False
+    u[others] += minVal - shortest[col4row[others]]
+    v[columnsSeen] -= minVal - shortest[columnsSeen]
+    column = sink
+    while True:
+        row = path[column]
+        row4col[column] = row
+        col4row[row], column = column, col4row[row]
+        if row == start:
+            break
+
+
+def _add_column(cost: np.ndarray, u: np.ndarray, v: np.ndarray, col4row: np.ndarray, row4col: np.ndarray, new: int):
+    """
+    The counterpart of _augment for a new, unmatched column with feasible duals.  Unmatched columns count as held by
+    implicit zero cost dummy rows (their v is the largest), so this is one augmenting path step of the square problem
+    from a new dummy row to the new column: the rows along the path move one column over and the column at its start is
+    left unmatched.  Arrays change in place.
+    """
+    top = v.max()
+    shortest = top - v  # reduced costs from the new dummy row, whose dual is -top
+    path = np.full(cost.shape[1], -1)  # -1: reached straight from the new dummy row
+    rowsSeen = np.zeros(cost.shape[0], dtype=bool)
+    columnsSeen = np.zeros(cost.shape[1], dtype=bool)
+    while True:
+        candidates = np.where(columnsSeen, np.inf, shortest)
+        minVal = candidates.min()
+        ties = np.flatnonzero(candidates == minVal)
+        column = new if candidates[new] == minVal else ties[0]  # prefer ending the path
+        columnsSeen[column] = True
+        if column == new:
+            break
+        row = row4col[column]
+        if row < 0:
+            continue  # the dummy row holding an unmatched column offers nothing shorter than the new one
+        rowsSeen[row] = True
+        reduced = minVal + cost[row] - u[row] - v
+        better = ~columnsSeen & (reduced < shortest)
+        path[better] = row
+        shortest[better] = reduced[better]
+
+    u[rowsSeen] += minVal - shortest[col4row[rowsSeen]]
+    v[columnsSeen] -= minVal - shortest[columnsSeen]
+    # shift the duals so the unmatched columns are back at v = 0, every u + v stays the same
+    top = v.max()
+    v -= top
+    u += top
+    column = new
+    while path[column] >= 0:
+        row = path[column]
+        row4col[column] = row
+        col4row[row], column = column, col4row[row]
+    row4col[column] = -1
+
+
+class _Lineup:
+    """
+    The optimal assignment of one side (hitters or pitchers) of one fantasy team.  Columns are the team's players
+    followed by one empty-slot column per slot; the duals are kept so a drop only has to re-match the vacated slot.
+    """
+
+    def __init__(self, slotValues: np.ndarray, players: np.ndarray):
+        """
+        :param slotValues: slots x players values of the whole side, -inf where the player is not eligible
+        :param players: row positions of the team's players in the Cards
+        """
+        self.slotValues = slotValues
+        self.players = np.asarray(players, dtype=np.int64)
+        self.cost = self._cost(self.players)
+        rows = self.cost.shape[0]
+        self.u = np.zeros(rows)
+        self.v = np.zeros(self.cost.shape[1])
+        self.col4row = np.full(rows, -1)
+        self.row4col = np.full(self.cost.shape[1], -1)
+        for row in range(rows):
+            _augment(self.cost, self.u, self.v, self.col4row, self.row4col, row)
+
+    def _cost(self, players: np.ndarray) -> np.ndarray:
+        cost = -self.slotValues[:, players]  # -inf values become +inf costs, never chosen
+        return np.hstack([cost, np.full((len(self.slotValues), len(self.slotValues)), _emptySlot)])
+
+    @property
+    def assigned(self) -> np.ndarray:
+        """
+        :return: per slot the row position of the player started there, -1 when the slot is empty
+        """
+        assigned = np.full(len(self.col4row), -1)
+        filled = self.col4row < len(self.players)
+        assigned[filled] = self.players[self.col4row[filled]]
+        return assigned
+
+    @property
+    def total(self) -> float:
+        filled = self.col4row < len(self.players)
+        return float(-self.cost[np.flatnonzero(filled), self.col4row[filled]].sum())
+
+    def copy_without(self, player: int) -> "_Lineup":
+        """
+        Drops player and re-matches only the slot they started at, starting from the current duals
+        """
+        lineup = _Lineup.__new__(_Lineup)
+        lineup.slotValues = self.slotValues
+        keep = np.flatnonzero(np.append(self.players != player, np.ones(len(self.slotValues), dtype=bool)))
+        lineup.players = self.players[self.players != player]
+        lineup.cost = self.cost[:, keep]
+        lineup.u = self.u.copy()
+        lineup.v = self.v[keep]
+        columnOf = np.full(self.cost.shape[1], -1)
+        columnOf[keep] = np.arange(keep.size)
+        lineup.row4col = self.row4col[keep].copy()
+        lineup.col4row = columnOf[self.col4row]
+        for row in np.flatnonzero(lineup.col4row < 0):
+            _augment(lineup.cost, lineup.u, lineup.v, lineup.col4row, lineup.row4col, row)
+        return lineup
+
+    def with_player(self, player: int) -> "_Lineup":
+        """
+        Adds player.  The new optimum only differs from the current one along a single alternating path that starts at
+        the new player, so their column is added with feasible duals and only that path is found, starting from the
+        current duals
+        """
+        lineup = _Lineup.__new__(_Lineup)
+        lineup.slotValues = self.slotValues
+        new = len(self.players)  # the player columns come before the empty-slot columns
+        lineup.players = np.append(self.players, player)
+        column = -self.slotValues[:, player]
+        lineup.cost = np.insert(self.cost, new, column, axis=1)
+        lineup.u = self.u.copy()
+        top = self.v.max() if len(self.v) else 0.0
+        lineup.v = np.insert(self.v, new, min(top, (column - self.u).min()) if len(column) else top)
+        lineup.col4row = np.where(self.col4row >= new, self.col4row + 1, self.col4row)
+        lineup.row4col = np.insert(self.row4col, new, -1)
+        _add_column(lineup.cost, lineup.u, lineup.v, lineup.col4row, lineup.row4col, new)
+        return lineup
+
+
+class TRPRosterSolver:
+    def __init__(self, engine: TRPValuationEngine, free_agents: str = "FA"):
+        """
+        Slots are the engine's league config roster slots, repeated for every slot a team starts there (e.g. 3 OF).  A
+        slot is only left empty when no player on the team is eligible for it.
+
+        :param engine: TRPValuationEngine supplying the value of every player at every slot
+        :param free_agents: fantasyTeam value of the players not on a fantasy team
+        """
+        self.engine = engine
+        self.free_agents = free_agents
+        self.refresh()
+
+    def refresh(self):
+        """
+        Drops the cached lineups, needed after the engine revalues players
+        """
+        self.slots = {}
+        self.slotValues = {}
+        for kind, pool in self.engine.pools.items():
+            counts = [self.engine.config.roster_slots.get(slot, 0) for slot in pool.slots]
+            self.slots[kind] = np.repeat(np.array(pool.slots, dtype=object), counts)
+            self.slotValues[kind] = np.repeat(pool.slot_totals(), counts, axis=0)
+        self.lineups = {}
+
+    def _team_rows(self, kind: str, team: str) -> np.ndarray:
+        teams = getattr(self.engine.lm, kind)["fantasyTeam"]
+        return np.flatnonzero((teams == team).to_numpy())
+
+    def _lineup(self, kind: str, team: str) -> _Lineup:
+        key = (kind, team)
+        if key not in self.lineups:
+            self.lineups[key] = _Lineup(self.slotValues[kind], self._team_rows(kind, team))
+        return self.lineups[key]
+
+    def lineup(self, team: str, kind: str = "hitters") -> pd.DataFrame:
+        """
+        :param team: fantasyTeam name
+        :param kind: "hitters" or "pitchers"
+        :return: pd.DataFrame with one row per roster slot: the player started there and their value at the slot
+        """
+        lineup = self._lineup(kind, team)
+        frame = getattr(self.engine.lm, kind)
+        assigned = lineup.assigned
+        filled = assigned >= 0
+        names = np.full(len(assigned), None, dtype=object)
+        names[filled] = frame["_name"].to_numpy()[assigned[filled]]
+        values = np.zeros(len(assigned))
+        values[filled] = self.slotValues[kind][np.flatnonzero(filled), assigned[filled]]
+        return pd.DataFrame({"slot": self.slots[kind], "_name": names, "value": values,
+                             "row": assigned})
+
+    def total(self, team: str, kind: str = "hitters") -> float:
+        """
+        :return: summed value of the team's optimal lineup
+        """
+        return self._lineup(kind, team).total
+
+    def add_value(self, team: str, kind: str, player: int, drop: int = None) -> float:
+        """
+        What the team's optimal lineup gains by adding player (and dropping drop, when given).  The cached lineup is
+        not changed.
+
+        :param player: row position of the player to add in the Cards
+        :param drop: row position of a team player to drop first
+        :return: change of the lineup total
+        """
+        lineup = self._lineup(kind, team)
+        before = lineup.total
+        if drop is not None:
+            lineup = lineup.copy_without(drop)
+        return lineup.with_player(player).total - before
+
+    def drop_value(self, team: str, kind: str, player: int) -> float:
+        """
+        :return: change of the team's lineup total when player is dropped (zero or negative)
+        """
+        lineup = self._lineup(kind, team)
+        return lineup.copy_without(player).total - lineup.total
+
+    def waiver_values(self, team: str, kind: str = "hitters", drop: int = None) -> pd.DataFrame:
+        """
+        Scores every free agent as an addition to the team
+
+        :param drop: row position of a team player to drop for each of them
+        :return: pd.DataFrame of the free agents indexed like the Cards with their "gain", best first
+        """
+        lineup = self._lineup(kind, team)
+        before = lineup.total
+        if drop is not None:
+            lineup = lineup.copy_without(drop)
+        agents = self._team_rows(kind, self.free_agents)
+        eligible = np.isfinite(self.slotValues[kind][:, agents]).any(axis=0)
+        gains = np.full(len(agents), lineup.total - before)
+        for i in np.flatnonzero(eligible):
+            gains[i] = lineup.with_player(agents[i]).total - before
+        frame = getattr(self.engine.lm, kind)
+        scored = pd.DataFrame({"_name": frame["_name"].to_numpy()[agents], "gain": gains}, index=frame.index[agents])
+        return scored.sort_values("gain", ascending=False, kind="stable")
+
+    def move(self, team: str, kind: str, add: int = None, drop: int = None):
+        """
+        Applies an add and/or drop to the cached lineup of the team, e.g. after a waiver claim.  The Cards' fantasyTeam
+        is left to the caller (TRPLeagueManager.update_player).
+        """
+        lineup = self._lineup(kind, team)
+        if drop is not None:
+            lineup = lineup.copy_without(drop)
+        if add is not None:
+            lineup = lineup.with_player(add)
+        self.lineups[(kind, team)] = lineup
@@ -0,0 +1,152 @@
+# TRPScenarioBatch evaluates many league configurations against one loaded copy of the Cards.  The arrays every
+# configuration reads are placed in shared memory once and worker processes map them instead of receiving copies.
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from sources.Model.TRPLeagueConfig import TRPLeagueConfig
+from sources.Model.TRPLeagueManager import TRPLeagueManager
+from sources.Model.TRPValuationEngine import TRPValuationEngine
+
+_attached = {}  # worker side: "block" -> (SharedMemory, array views), filled by _attach
+
+
+class TRPScenarioBatch:
+    kinds = ("hitters", "pitchers")
+
+    def __init__(self, lm: TRPLeagueManager, replacement_window: int = 5):
+        """
+        Packs the category matrices, eligibility masks, rank keys and rank orders of both pools into one shared memory
+        block.  Use as a context manager (or call close()) so the block is released.
+
+        :param lm: the TRPLeagueManager holding the Cards
+        :param replacement_window: number of players past the starters averaged into the replacement level
+        """
+        self.lm = lm
+        self.replacement_window = replacement_window
+        arrays = {}
+        for kind in self.kinds:
+            X, mask, rankKey = TRPValuationEngine.pool_arrays(lm, kind)
+            arrays[kind + ".X"] = X
+            arrays[kind + ".mask"] = mask
+            arrays[kind + ".rankKey"] = rankKey
+            arrays[kind + ".order"] = np.argsort(rankKey, kind="stable")
+        self.layout = {}  # array name -> (offset, shape, dtype str)
+        offset = 0
+        for name, array in arrays.items():
+            self.layout[name] = (offset, array.shape, array.dtype.str)
+            offset += -(-array.nbytes // 64) * 64  # keep every array 64 byte aligned
+        self.memory = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        self.arrays = _views(self.memory, self.layout)
+        for name, array in arrays.items():
+            self.arrays[name][...] = array
+        # the ranked eligible rows of every slot do not depend on the league shape, so pools are slices of these
+        self.ranked = {}
+        for kind in self.kinds:
+            order = self.arrays[kind + ".order"]
+            mask = self.arrays[kind + ".mask"][order]
+            for slot in (lm.bats if kind == "hitters" else lm.arms):
+                self.ranked[slot] = order[(mask & TRPLeagueManager.slotBits[slot]) != 0]
+
+    def __enter__(self) -> "TRPScenarioBatch":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.memory is not None:
+            self.arrays = {}
+            self.memory.close()
+            self.memory.unlink()
+            self.memory = None
+
+    def run(self, configs: list, workers: int = None) -> dict:
+        """
+        Evaluates every configuration: the analysed pool and its cutoff at every slot plus the player values and best
+        slots from the replacement-level z-scores.  Configurations are spread over a process pool that maps the shared
+        block; with one worker (or one configuration) they run in this process.
+
+        :param configs: list of TRPLeagueConfig with distinct names
+        :param workers: number of worker processes, defaults to the number of cores
+        :return: dict of config name to its result dict with "pools", "cutoffs", "values" and "slots"
+        """
+        results = {config.name: self._pools(config) for config in configs}
+        workers = min(workers or os.cpu_count() or 1, len(configs))
+        if workers <= 1:
+            valuations = [_evaluate(config, self.arrays, self.replacement_window) for config in configs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_attach,
+                                     initargs=(self.memory.name, self.layout)) as pool:
+                valuations = list(pool.map(_evaluate_shared, configs, [self.replacement_window] * len(configs)))
+        for config, valuation in zip(configs, valuations):
+            results[config.name].update(valuation)
+        return results
+
+    def _pools(self, config: TRPLeagueConfig) -> dict:
+        pools = {}
+        cutoffs = {}
+        for slot, ranked in self.ranked.items():
+            pools[slot] = ranked[:config.pool_size(slot)]
+            kind = "pitchers" if slot in self.lm.arms else "hitters"
+            rankKey = self.arrays[kind + ".rankKey"]
+            # the rank stat of the last player kept (wRAA for hitters, xERA for pitchers); the hitter key is -wRAA
+            sign = 1.0 if TRPLeagueManager.rankColumns[kind] in TRPLeagueManager.lowerIsBetter else -1.0
+            cutoffs[slot] = sign * float(rankKey[pools[slot][-1]]) if len(pools[slot]) else float("nan")
+        return {"config": config, "pools": pools, "cutoffs": cutoffs}
+
+    def pool_frame(self, result: dict, pos: str) -> pd.DataFrame:
+        """
+        :return: the analysed POS group of one configuration's result, best first
+        """
+        return self.lm.frame_for(pos).iloc[result["pools"][pos]]
+
+    def rankings(self, result: dict, kind: str = "hitters") -> pd.DataFrame:
+        """
+        :return: the players of one configuration's result ordered by value, with their best slot
+        """
+        frame = getattr(self.lm, kind)
+        ranked = pd.DataFrame({"_name": frame["_name"].to_numpy(), "fantasyTeam": frame["fantasyTeam"].to_numpy(),
+                               "value": result["values"][kind], "slot": result["slots"][kind]}, index=frame.index)
+        return ranked.sort_values("value", ascending=False, kind="stable")
+
+
+def _views(memory: shared_memory.SharedMemory, layout: dict) -> dict:
+    return {name: np.ndarray(shape, dtype=np.dtype(dtype), buffer=memory.buf, offset=offset)
+            for name, (offset, shape, dtype) in layout.items()}
+
+
+def _attach(name: str, layout: dict):
+    # process pool initializer: map the block once per worker.  Workers share the creator's resource tracker, which
+    # keeps a set of names, so attaching does not need its own unregister; the creator unlinks the block in close()
+    memory = shared_memory.SharedMemory(name=name)
+    arrays = _views(memory, layout)
+    for array in arrays.values():
+        array.flags.writeable = False
+    _attached["block"] = (memory, arrays)
+
+
+def _evaluate_shared(config: TRPLeagueConfig, replacement_window: int) -> dict:
+    return _evaluate(config, _attached["block"][1], replacement_window)
+
+
+def _evaluate(config: TRPLeagueConfig, arrays: dict, replacement_window: int) -> dict:
+    """
+    Values both pools for one configuration straight from the (shared) arrays; nothing is written to them
+    """
+    values = {}
+    slots = {}
+    for kind in TRPScenarioBatch.kinds:
+        pool = TRPValuationEngine.pool(config, kind, arrays[kind + ".X"], arrays[kind + ".mask"],
+                                       arrays[kind + ".rankKey"], order=arrays[kind + ".order"],
+                                       replacement_window=replacement_window)
+        totals = pool.slot_totals()
+        best = np.argmax(totals, axis=0)
+        values[kind] = totals[best, np.arange(totals.shape[1])]
+        slotNames = np.array(pool.slots, dtype=object)[best]
+        slotNames[np.isneginf(values[kind])] = None
+        slots[kind] = slotNames
+    return {"values": values, "slots": slots}
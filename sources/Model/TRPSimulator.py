@@ -0,0 +1,128 @@
+# TRPSimulator turns the point projections of the Cards into rest-of-season distributions.  Every trial draws a playing
+# time factor and a performance factor per player plus noise per category, so categories move together the way they do
+# in a real season (a hot streak lifts HR, RBI, R and SLG at once).  The performance spread grows with the gap between
+# a player's results and their expected stats (wOBA vs xwOBA, ERA vs xERA).
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from sources.Model.TRPLeagueManager import TRPLeagueManager
+
+
+class TRPSimulator:
+    categories = {"hitters": ["R", "HR", "RBI", "SBN", "OBP", "SLG"],
+                  "pitchers": ["IP", "QS", "SVHD", "K/9", "ERA", "WHIP"]}
+    # (actual, expected) stats whose relative gap widens the performance spread
+    gapColumns = {"hitters": ("wOBA", "xwOBA"), "pitchers": ("ERA", "xERA")}
+    maxGap = 0.5
+    # category: (playing time, performance, own noise) loadings of the log outcome; performance is "better", so ERA and
+    # WHIP load negatively
+    loadings = {"R": (1.0, 0.8, 0.10), "HR": (1.0, 1.0, 0.15), "RBI": (1.0, 0.8, 0.10), "SBN": (1.0, 0.3, 0.25),
+                "OBP": (0.0, 0.5, 0.03), "SLG": (0.0, 1.0, 0.04),
+                "IP": (1.0, 0.3, 0.05), "QS": (1.0, 0.8, 0.20), "SVHD": (1.0, 0.4, 0.25),
+                "K/9": (0.0, 0.5, 0.05), "ERA": (0.0, -1.0, 0.10), "WHIP": (0.0, -0.7, 0.05)}
+
+    def __init__(self, lm: TRPLeagueManager, trials: int = 10_000, seed: int = 0, percentiles=(10, 50, 90),
+                 playing_time_sd: float = 0.12, performance_sd: float = 0.06, memory_budget: int = 64 << 20):
+        """
+        :param lm: the TRPLeagueManager holding the Cards
+        :param trials: simulated seasons per player
+        :param seed: every player draws from its own generator seeded by (seed, kind, row), so results do not depend
+            on chunking or the number of workers
+        :param percentiles: percentiles reported per category
+        :param playing_time_sd: spread of the log playing time factor
+        :param performance_sd: spread of the log performance factor before the actual vs expected gap is added
+        :param memory_budget: bytes of draws held at once per process, decides how many players are simulated together
+        """
+        self.lm = lm
+        self.trials = trials
+        self.seed = seed
+        self.percentiles = list(percentiles)
+        self.playing_time_sd = playing_time_sd
+        self.performance_sd = performance_sd
+        self.memory_budget = memory_budget
+
+    def parameters(self, kind: str) -> (np.ndarray, np.ndarray, np.ndarray):
+        """
+        :return: tuple of the players x categories projections, the players' performance spread and the categories x 3
+            loadings
+        """
+        frame = getattr(self.lm, kind)
+        projections = frame[self.categories[kind]].to_numpy(dtype=np.float64)
+        actual, expected = (frame[column].to_numpy(dtype=np.float64) for column in self.gapColumns[kind])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            gap = np.abs(actual - expected) / np.abs(expected)
+        gap[~np.isfinite(gap)] = 0
+        # small samples can put ERA far from xERA, cap the extra spread
+        gap = np.minimum(gap, self.maxGap)
+        loadings = np.array([self.loadings[category] for category in self.categories[kind]])
+        return projections, self.performance_sd + gap, loadings
+
+    def simulate(self, kind: str = "hitters", workers: int = None) -> pd.DataFrame:
+        """
+        Simulates every player of kind.  Players are split into blocks that fit memory_budget; with workers > 1 the
+        blocks are spread over a process pool.
+
+        :param kind: "hitters" or "pitchers"
+        :param workers: number of worker processes, None or 1 simulates in this process
+        :return: pd.DataFrame indexed like the Cards with "<category> p<percentile>" and "<category> mean" columns
+        """
+        projections, performance, loadings = self.parameters(kind)
+        players = len(projections)
+        perPlayer = self.trials * (2 + 2 * len(loadings)) * 4  # float32 draws plus the outcomes
+        blockSize = max(1, min(players, self.memory_budget // perPlayer))
+        blocks = [np.arange(start, min(start + blockSize, players)) for start in range(0, players, blockSize)]
+        kindIndex = list(self.categories).index(kind)
+        tasks = [(rows, projections[rows], performance[rows], loadings, self.playing_time_sd, self.trials,
+                  self.percentiles, (self.seed, kindIndex)) for rows in blocks]
+        if workers is None or workers <= 1 or len(tasks) == 1:
+            results = [_simulate_block(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_simulate_block, tasks))
+
+        summary = np.concatenate(results, axis=0) if results else \
+            np.empty((0, len(self.percentiles) + 1, len(loadings)))
+        columns = {}
+        for c, category in enumerate(self.categories[kind]):
+            for p, percentile in enumerate(self.percentiles):
+                columns[f"{category} p{percentile:g}"] = summary[:, p, c]
+            columns[f"{category} mean"] = summary[:, -1, c]
+        return pd.DataFrame(columns, index=getattr(self.lm, kind).index)
+
+
+def _simulate_block(task: tuple) -> np.ndarray:
+    """
+    Simulates one block of players as (players, categories, trials) arrays
+
+    :return: players x (percentiles + mean) x categories
+    """
+    rows, projections, performance, loadings, playingTimeSd, trials, percentiles, seed = task
+    categories = len(loadings)
+    draws = np.empty((len(rows), 2 + categories, trials), dtype=np.float32)
+    for i, row in enumerate(rows):
+        np.random.default_rng([*seed, int(row)]).standard_normal(out=draws[i], dtype=np.float32)
+    # per player: log outcome = playing time + performance + own noise, each scaled by the category loadings
+    scales = np.zeros((len(rows), categories, 2 + categories), dtype=np.float32)
+    scales[:, :, 0] = playingTimeSd * loadings[:, 0]
+    scales[:, :, 1] = performance[:, None] * loadings[:, 1]
+    scales[:, :, 2:] = np.diag(loadings[:, 2])
+    logs = np.matmul(scales, draws)  # players x categories x trials
+    del draws
+    # exp(log - variance / 2) keeps the mean of every category at its projection
+    variance = (scales.astype(np.float64) ** 2).sum(axis=2)
+    logs -= (variance / 2)[:, :, None].astype(np.float32)
+    outcomes = np.exp(logs, out=logs)
+    outcomes *= projections[:, :, None].astype(np.float32)
+    summary = np.empty((len(rows), len(percentiles) + 1, categories))
+    summary[:, -1, :] = outcomes.mean(axis=2, dtype=np.float64)
+    # a full sort beats np.percentile's partitions on float32 rows; linear interpolation as np.percentile does
+    outcomes.sort(axis=2)
+    positions = np.asarray(percentiles, dtype=np.float64) / 100 * (trials - 1)
+    below = np.floor(positions).astype(np.int64)
+    above = np.minimum(below + 1, trials - 1)
+    weight = positions - below
+    low = outcomes[:, :, below].astype(np.float64)
+    summary[:, :-1, :] = np.moveaxis(low + (outcomes[:, :, above] - low) * weight, 2, 1)
+    return summary
@@ -0,0 +1,230 @@
+# TRPSnapshotStore keeps every day's Cards as an append-only columnar history keyed by the players' ESPN ID, so trends
+# and deltas over a season are array scans instead of re-reading old JSON files.
+#   <root>/<kind>.players.npy          ESPN ID of every player ever ingested, in order of first appearance (append only)
+#   <root>/<YYYY-MM-DD>/               one snapshot per date, never rewritten; written as "<date>.tmp" and renamed into
+#                                      place once every kind is complete, so a snapshot holds all its kinds or none
+#       <kind>/rows.npy                position of each Card's player in <kind>.players.npy
+#       <kind>/<i>.npy (+ .categories) one array per Card field, strings as categorical codes
+#       <kind>/meta.json               field names and kinds
+import datetime
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from sources.Model.TRPCardCache import TRPCardCache
+from sources.Model.TRPLeagueManager import TRPLeagueManager
+
+
+class TRPSnapshotStore:
+    kinds = ("hitters", "pitchers")
+    idColumn = "idESPN"
+
+    def __init__(self, root: str = "resources/snapshots"):
+        """
+        :param root: folder holding the snapshot partitions, created on the first ingest
+        """
+        self.root = root
+        self._players = {}  # kind -> (players, sorted players, their order) cached until the next ingest
+        self._partitions = {}  # (kind, date) -> (meta, rows); partitions never change once written
+
+    def dates(self, kind: str = "hitters") -> list:
+        """
+        :return: the ISO dates of every snapshot holding kind, oldest first; "<date>.tmp" folders left by an
+            interrupted ingest are not snapshots
+        """
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if _is_iso_date(name) and os.path.isfile(os.path.join(self.root, name, kind, "meta.json")))
+
+    def ingest(self, date: str = None, frames: dict = None) -> str:
+        """
+        Appends one snapshot of every kind in frames at once.  A date can only be ingested once; an ingest that fails
+        part way leaves no snapshot behind, so it can simply be retried.
+
+        :param date: ISO date of the snapshot, defaults to today
+        :param frames: dict of kind to the full Cards (with their ID keys), defaults to the Cards files in resources/
+        :return: the ISO date written
+        """
+        date = datetime.date.fromisoformat(date).isoformat() if date else datetime.date.today().isoformat()
+        if frames is None:
+            frames = {kind: TRPCardCache(path).load() for kind, path in TRPLeagueManager.cardsPaths.items()}
+        final = os.path.join(self.root, date)
+        if os.path.exists(final):
+            raise ValueError("{} already holds a snapshot for {}".format(self.root, date))
+        partial = final + ".tmp"
+        shutil.rmtree(partial, ignore_errors=True)
+        for kind, frame in frames.items():
+            self._write_partition(kind, date, frame, os.path.join(partial, kind))
+        os.rename(partial, final)
+        return date
+
+    def _write_partition(self, kind: str, date: str, frame: pd.DataFrame, partial: str):
+        ids = frame[self.idColumn].to_numpy(dtype=np.int64)
+        if len(np.unique(ids)) != len(ids):
+            raise ValueError("{} Cards of {} repeat an {}".format(kind, date, self.idColumn))
+        os.makedirs(self.root, exist_ok=True)
+        players, known, order = self._registry(kind)
+        at = np.minimum(np.searchsorted(known, ids), max(len(known) - 1, 0))
+        found = (known[at] == ids) if len(known) else np.zeros(len(ids), dtype=bool)
+        rows = np.empty(len(ids), dtype=np.int64)
+        rows[found] = order[at[found]]
+        rows[~found] = len(players) + np.arange((~found).sum())
+        if not found.all():
+            # the registry only grows, so the rows of older partitions stay valid even if this ingest is interrupted
+            registry = os.path.join(self.root, kind + ".players.npy")
+            with open(registry + ".tmp", "wb") as registry_file:
+                np.save(registry_file, np.concatenate([players, ids[~found]]))
+            os.replace(registry + ".tmp", registry)
+            self._players.pop(kind, None)
+
+        os.makedirs(partial)
+        np.save(os.path.join(partial, "rows.npy"), rows)
+        columns = []
+        for i, name in enumerate(frame.columns):
+            series = frame[name]
+            if pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+                np.save(os.path.join(partial, "{}.npy".format(i)), series.to_numpy())
+                columns.append({"name": name, "kind": "numeric"})
+            else:
+                categorical = series.astype("category")
+                np.save(os.path.join(partial, "{}.npy".format(i)), categorical.cat.codes.to_numpy())
+                np.save(os.path.join(partial, "{}.categories.npy".format(i)),
+                        categorical.cat.categories.to_numpy(dtype=str))
+                columns.append({"name": name, "kind": "category"})
+        with open(os.path.join(partial, "meta.json"), "w", encoding="utf-8") as meta_file:
+            json.dump({"date": date, "columns": columns}, meta_file)
+
+    def _registry(self, kind: str) -> (np.ndarray, np.ndarray, np.ndarray):
+        if kind not in self._players:
+            try:
+                players = np.load(os.path.join(self.root, kind + ".players.npy"))
+            except OSError:
+                players = np.empty(0, dtype=np.int64)
+            order = np.argsort(players, kind="stable")
+            self._players[kind] = (players, players[order], order)
+        return self._players[kind]
+
+    def _partition(self, kind: str, date: str) -> (dict, np.ndarray):
+        key = (kind, date)
+        if key not in self._partitions:
+            folder = os.path.join(self.root, date, kind)
+            with open(os.path.join(folder, "meta.json"), encoding="utf-8") as meta_file:
+                meta = json.load(meta_file)
+            meta["index"] = {column["name"]: i for i, column in enumerate(meta["columns"])}
+            self._partitions[key] = (meta, np.load(os.path.join(folder, "rows.npy"), mmap_mode="r"))
+        return self._partitions[key]
+
+    def _values(self, kind: str, date: str, name: str) -> np.ndarray:
+        meta, _ = self._partition(kind, date)
+        if name not in meta["index"]:
+            raise KeyError("{} snapshot {} has no {!r} field".format(kind, date, name))
+        i = meta["index"][name]
+        folder = os.path.join(self.root, date, kind)
+        values = np.load(os.path.join(folder, "{}.npy".format(i)), mmap_mode="r")
+        if meta["columns"][i]["kind"] == "category":
+            categories = np.load(os.path.join(folder, "{}.categories.npy".format(i)))
+            values = np.where(values >= 0, categories[np.maximum(values, 0)], None).astype(object)
+        return values
+
+    def snapshot(self, kind: str, date: str = None) -> pd.DataFrame:
+        """
+        :param date: ISO date, the latest snapshot on or before it is used; defaults to the latest snapshot
+        :return: the Cards of that snapshot as they were ingested
+        """
+        date = self.resolve(kind, date)
+        meta, _ = self._partition(kind, date)
+        return pd.DataFrame({column["name"]: self._values(kind, date, column["name"]) for column in meta["columns"]})
+
+    def resolve(self, kind: str, date: str = None) -> str:
+        """
+        :return: the date of the latest snapshot on or before date (the latest snapshot when date is None)
+        """
+        dates = self.dates(kind)
+        if date is not None:
+            date = datetime.date.fromisoformat(date).isoformat()
+            dates = [snapshot for snapshot in dates if snapshot <= date]
+        if not dates:
+            raise LookupError("no {} snapshot on or before {}".format(kind, date or "today"))
+        return dates[-1]
+
+    def matrix(self, kind: str, name: str, start: str = None, end: str = None) -> (list, np.ndarray, np.ndarray):
+        """
+        One numeric field over time: a dates x players matrix with NaN where a player is missing from a snapshot
+
+        :param name: numeric Card field, e.g. "xwOBA"
+        :param start: first ISO date included, defaults to the first snapshot
+        :param end: last ISO date included, defaults to the latest snapshot
+        :return: tuple of the dates, the ESPN IDs of the columns and the matrix
+        """
+        dates = [date for date in self.dates(kind) if (start is None or date >= start) and (end is None or date <= end)]
+        players = self._registry(kind)[0]
+        values = np.full((len(dates), len(players)), np.nan)
+        for d, date in enumerate(dates):
+            values[d, self._partition(kind, date)[1]] = self._values(kind, date, name)
+        seen = ~np.isnan(values).all(axis=0)
+        return dates, players[seen], values[:, seen]
+
+    def trend(self, kind: str, name: str, start: str = None, end: str = None, ids=None) -> pd.DataFrame:
+        """
+        :param ids: ESPN IDs to keep, every player by default
+        :return: pd.DataFrame with one row per snapshot date and one column per player (ESPN ID)
+        """
+        dates, players, values = self.matrix(kind, name, start, end)
+        trend = pd.DataFrame(values, index=pd.Index(dates, name="date"), columns=pd.Index(players, name=self.idColumn))
+        return trend if ids is None else trend.reindex(columns=ids)
+
+    def delta(self, kind: str, name: str, since: str, until: str = None) -> pd.DataFrame:
+        """
+        Change of a numeric field per player between two snapshots (the latest on or before since and until)
+
+        :return: pd.DataFrame indexed by ESPN ID with the player's latest Card fields, the field at both dates and
+            "delta", largest first; players missing from either snapshot are left out
+        """
+        before = self.resolve(kind, since)
+        after = self.resolve(kind, until)
+        players = self._registry(kind)[0]
+        old = np.full(len(players), np.nan)
+        old[self._partition(kind, before)[1]] = self._values(kind, before, name)
+        rows = np.asarray(self._partition(kind, after)[1])
+        new = self._values(kind, after, name).astype(np.float64)
+        change = new - old[rows]
+        kept = ~np.isnan(change)
+        frame = pd.DataFrame({field: self._values(kind, after, field)[kept]
+                              for field in ("_name", "pos", "fantasyTeam")},
+                             index=pd.Index(players[rows[kept]], name=self.idColumn))
+        frame[f"{name} {before}"] = old[rows[kept]]
+        frame[f"{name} {after}"] = new[kept]
+        frame["delta"] = change[kept]
+        return frame.sort_values("delta", ascending=False, kind="stable")
+
+    def risers(self, kind: str, name: str, days: int = 7, pos: str = None, fantasy_team: str = "FA",
+               until: str = None, top: int = 10) -> pd.DataFrame:
+        """
+        Biggest risers of a field over the last days, e.g. risers("hitters", "xwOBA", 7, pos="SS") for the free agent
+        shortstops whose xwOBA went up the most in a week.  Fallers are risers of the tail (top=None for everyone).
+
+        :param pos: roster slot the player must be eligible for in the latest snapshot, any slot by default
+        :param fantasy_team: fantasyTeam the player must be on in the latest snapshot, None for everyone
+        :param until: ISO date the window ends at, defaults to the latest snapshot
+        """
+        after = self.resolve(kind, until)
+        since = (datetime.date.fromisoformat(after) - datetime.timedelta(days=days)).isoformat()
+        changes = self.delta(kind, name, since, after)
+        keep = np.ones(len(changes), dtype=bool)
+        if fantasy_team is not None:
+            keep &= (changes["fantasyTeam"] == fantasy_team).to_numpy()
+        if pos is not None:
+            mask = TRPLeagueManager.eligibility_mask(changes)
+            keep &= (mask & TRPLeagueManager.slotBits[pos]) != 0
+        return changes[keep].head(top) if top is not None else changes[keep]
+
+
+def _is_iso_date(name: str) -> bool:
+    try:
+        return datetime.date.fromisoformat(name).isoformat() == name
+    except ValueError:
+        return False
@@ -0,0 +1,173 @@
+# TRPStandings projects every fantasy team's category totals from the Cards of its players and compares the teams
+# head-to-head.  Each team is kept as sums of per-player components (counting stats, and weight * rate plus the weight
+# for the rate stats), so a roster move is one vector addition and every free agent can be tried at once.
+import numpy as np
+import pandas as pd
+
+from sources.Model.TRPLeagueManager import TRPLeagueManager
+
+
+class TRPStandings:
+    kinds = ("hitters", "pitchers")
+    categories = {"hitters": ["R", "HR", "RBI", "SBN", "OBP", "SLG"], "pitchers": ["QS", "SVHD", "K/9", "ERA", "WHIP"]}
+    # rate stat: the counting stat it is weighted by when a team's players are combined
+    weights = {"OBP": "PA", "SLG": "AB", "K/9": "IP", "ERA": "IP", "WHIP": "IP"}
+
+    def __init__(self, lm: TRPLeagueManager, free_agents: str = "FA"):
+        """
+        :param lm: the TRPLeagueManager holding the Cards, every fantasyTeam other than free_agents is a team
+        :param free_agents: fantasyTeam value of the players not on a fantasy team
+        """
+        self.lm = lm
+        self.free_agents = free_agents
+        self.components = {}
+        self._parts = {}  # kind -> [(component of the stat, component of its weight or None)] per category
+        for kind in self.kinds:
+            frame = getattr(lm, kind)
+            columns, parts = [], []
+            for category in self.categories[kind]:
+                values = frame[category].to_numpy(dtype=np.float64)
+                if category in self.weights:
+                    weight = frame[self.weights[category]].to_numpy(dtype=np.float64)
+                    # a player without the rate or the weight does not count towards it
+                    weight = np.where(np.isnan(values) | np.isnan(weight), 0, weight)
+                    parts.append((len(columns), len(columns) + 1))
+                    columns += [np.nan_to_num(values) * weight, weight]
+                else:
+                    parts.append((len(columns), None))
+                    columns.append(np.nan_to_num(values))
+            self.components[kind] = np.column_stack(columns) if columns else np.empty((len(frame), 0))
+            self._parts[kind] = parts
+        self.sign = np.array([-1.0 if category in TRPLeagueManager.lowerIsBetter else 1.0
+                              for kind in self.kinds for category in self.categories[kind]])
+        self.refresh()
+
+    def refresh(self):
+        """
+        Regroups the players by fantasyTeam, needed after the Cards change
+        """
+        self.teams = sorted({team for kind in self.kinds for team in getattr(self.lm, kind)["fantasyTeam"].dropna()
+                             if team != self.free_agents})
+        position = {team: t for t, team in enumerate(self.teams)}
+        self.codes = {}
+        self.sums = {}
+        for kind in self.kinds:
+            teams = getattr(self.lm, kind)["fantasyTeam"].to_numpy()
+            codes = np.array([position.get(team, -1) for team in teams], dtype=np.int64)
+            sums = np.zeros((len(self.teams), self.components[kind].shape[1]))
+            np.add.at(sums, codes[codes >= 0], self.components[kind][codes >= 0])
+            self.codes[kind] = codes
+            self.sums[kind] = sums
+        self.values = np.column_stack([self._values(kind, self.sums[kind]) for kind in self.kinds]) \
+            if self.teams else np.empty((0, len(self.sign)))
+
+    def _values(self, kind: str, sums: np.ndarray) -> np.ndarray:
+        # category values from component sums, works on any leading shape
+        values = np.empty(sums.shape[:-1] + (len(self._parts[kind]),))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for c, (stat, weight) in enumerate(self._parts[kind]):
+                values[..., c] = sums[..., stat] if weight is None else sums[..., stat] / sums[..., weight]
+        return values
+
+    def _team(self, team: str) -> int:
+        if team not in self.teams:
+            raise ValueError("{!r} is not a fantasy team, the teams are: {}".format(team, ", ".join(self.teams)))
+        return self.teams.index(team)
+
+    def _columns(self, kind: str) -> slice:
+        start = 0 if kind == self.kinds[0] else len(self.categories[self.kinds[0]])
+        return slice(start, start + len(self.categories[kind]))
+
+    def _category_wins(self, values: np.ndarray, opponents: np.ndarray) -> np.ndarray:
+        # categories won by values (..., C) against every opponent (T, C), ties count half; a missing value loses
+        difference = (values[..., None, :] - opponents) * self.sign
+        return (difference > 0).sum(axis=-1) + 0.5 * (difference == 0).sum(axis=-1)
+
+    def totals(self) -> pd.DataFrame:
+        """
+        :return: pd.DataFrame indexed by team with its projected value in every category
+        """
+        columns = [category for kind in self.kinds for category in self.categories[kind]]
+        return pd.DataFrame(self.values, index=pd.Index(self.teams, name="fantasyTeam"), columns=columns)
+
+    def matchups(self) -> pd.DataFrame:
+        """
+        Head-to-head matrix of all teams in one broadcast comparison
+
+        :return: pd.DataFrame of the categories the row team wins against the column team (ties count half), NaN on the
+            diagonal
+        """
+        wins = self._category_wins(self.values, self.values)
+        np.fill_diagonal(wins, np.nan)
+        index = pd.Index(self.teams, name="fantasyTeam")
+        return pd.DataFrame(wins, index=index, columns=index)
+
+    def standings(self) -> pd.DataFrame:
+        """
+        :return: pd.DataFrame indexed by team with its rotisserie points per category (best team gets one point per
+            team, ties share), the "roto" total and the head-to-head record against every other team, best first
+        """
+        totals = self.totals()
+        points = pd.DataFrame({category: (totals[category] * sign).rank(method="average", na_option="bottom")
+                               for category, sign in zip(totals.columns, self.sign)})
+        points["roto"] = points.sum(axis=1)
+        wins = self.matchups().to_numpy()
+        lost = len(self.sign) - wins
+        points["W"] = (wins > lost).sum(axis=1)
+        points["L"] = (wins < lost).sum(axis=1)
+        points["T"] = (wins == lost).sum(axis=1)
+        return points.sort_values(["W", "roto"], ascending=False, kind="stable")
+
+    def move(self, team: str, kind: str, add: int = None, drop: int = None):
+        """
+        Moves a player onto and/or off the team, updating only its sums.  The Cards' fantasyTeam is left to the caller
+        (TRPLeagueManager.update_player).
+
+        :param add: row position of the player to add in the Cards, taken off their current team
+        :param drop: row position of a team player to drop to the free agents
+        """
+        t = self._team(team)
+        changed = {t}
+        if drop is not None:
+            if self.codes[kind][drop] != t:
+                raise ValueError("row {} is not on {}".format(drop, team))
+            self.sums[kind][t] -= self.components[kind][drop]
+            self.codes[kind][drop] = -1
+        if add is not None:
+            previous = self.codes[kind][add]
+            if previous >= 0:
+                self.sums[kind][previous] -= self.components[kind][add]
+                changed.add(previous)
+            self.sums[kind][t] += self.components[kind][add]
+            self.codes[kind][add] = t
+        rows = sorted(changed)
+        self.values[rows, self._columns(kind)] = self._values(kind, self.sums[kind][rows])
+
+    def matchup_changes(self, team: str, kind: str = "hitters", drop: int = None, players=None) -> pd.DataFrame:
+        """
+        How adding each player (and dropping drop) changes the team's head-to-head results, for every candidate at once
+
+        :param drop: row position of a team player to drop for each of them
+        :param players: row positions of the candidates, the free agents of kind by default
+        :return: pd.DataFrame of the candidates indexed like the Cards with the change of "categories" won summed over
+            all opponents and of "matchups" won, best first
+        """
+        t = self._team(team)
+        if players is None:
+            players = np.flatnonzero(self.codes[kind] < 0)
+            players = players[getattr(self.lm, kind)["fantasyTeam"].to_numpy()[players] == self.free_agents]
+        players = np.asarray(players, dtype=np.int64)
+        base = self.sums[kind][t] - (self.components[kind][drop] if drop is not None else 0)
+        candidates = np.repeat(self.values[t][None, :], len(players), axis=0)
+        candidates[:, self._columns(kind)] = self._values(kind, base + self.components[kind][players])
+
+        opponents = np.delete(self.values, t, axis=0)
+        before = self._category_wins(self.values[t], opponents)
+        after = self._category_wins(candidates, opponents)  # candidates x opponents
+        total = len(self.sign)
+        frame = getattr(self.lm, kind)
+        changes = pd.DataFrame({"_name": frame["_name"].to_numpy()[players],
+                                "categories": (after - before).sum(axis=1),
+                                "matchups": (after > total - after).sum(axis=1) - (before > total - before).sum()},
+                               index=frame.index[players])
+        return changes.sort_values(["matchups", "categories"], ascending=False, kind="stable")
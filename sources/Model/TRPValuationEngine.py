@@ -0,0 +1,207 @@
+# TRPValuationEngine turns the raw projections of the Cards into position-dependent z-scores measured against the
+# replacement level player of every roster slot (see Post-Processing Reports in the README)
+import numpy as np
+import pandas as pd
+
+from sources.Model.TRPLeagueConfig import TRPLeagueConfig
+from sources.Model.TRPLeagueManager import TRPLeagueManager
+
+
+class _SlotPool:
+    """
+    The hitters or the pitchers of the league laid out for valuation: X holds one row per player and one column per
+    category and mask the slotBits eligibility of every player.  Replacement levels and z-score scales are kept per
+    slot so a change to one player only has to redo the slots that player is eligible for.
+    """
+
+    def __init__(self, X: np.ndarray, mask: np.ndarray, slots: list, categories: list, signs: np.ndarray,
+                 rankKey: np.ndarray, starters: np.ndarray, window: int, order: np.ndarray = None):
+        """
+        X, mask and rankKey are used as given (not copied); only update() writes to them
+        """
+        self.slots = slots
+        self.bits = np.array([TRPLeagueManager.slotBits[slot] for slot in slots], dtype=np.int64)
+        self.categories = categories
+        self.signs = signs  # +1 when more is better, -1 for ERA/WHIP
+        self.X = X
+        self.rankKey = rankKey  # ascending rankKey is the order players are taken off the board
+        self.order = np.argsort(rankKey, kind="stable") if order is None else order
+        self.mask = mask
+        self.starters = starters
+        self.window = window
+        self.replacement = np.full((len(slots), len(categories)), np.nan)
+        self.scale = np.ones((len(slots), len(categories)))
+        self.levels(np.arange(len(slots)))
+
+    def levels(self, rows: np.ndarray):
+        """
+        Recomputes the replacement level and the z-score scale of the slots at rows in one vectorized pass.  The
+        starters of a slot are its teams * roster slots best eligible players; replacement level is the mean of the
+        window players ranked right after them (or the last window eligible players when the slot runs out).  The scale
+        is the standard deviation of each category among the starters.
+        """
+        eligible = (self.mask[self.order][None, :] & self.bits[rows][:, None]) != 0  # slots x players, ranked
+        rank = np.cumsum(eligible, axis=1)
+        starters = self.starters[rows][:, None]
+        replacementStart = np.minimum(starters, np.maximum(rank[:, -1:] - self.window, 0))
+        starterRows = (eligible & (rank <= starters)).astype(np.float64)
+        replacementRows = (eligible & (rank > replacementStart) & (rank <= replacementStart + self.window)) \
+            .astype(np.float64)
+
+        X = self.X[self.order]
+        starterCount = np.maximum(starterRows.sum(axis=1, keepdims=True), 1)
+        mean = starterRows @ X / starterCount
+        variance = np.maximum(starterRows @ (X * X) / starterCount - mean * mean, 0)
+        scale = np.sqrt(variance)
+        scale[scale == 0] = 1
+        self.scale[rows] = scale
+        self.replacement[rows] = replacementRows @ X / np.maximum(replacementRows.sum(axis=1, keepdims=True), 1)
+
+    def z_scores(self, slotRow: int, players: np.ndarray) -> np.ndarray:
+        """
+        :return: players x categories z-scores against the replacement level of the slot at slotRow
+        """
+        return self.signs * (self.X[players] - self.replacement[slotRow]) / self.scale[slotRow]
+
+    def slot_totals(self) -> np.ndarray:
+        """
+        :return: slots x players summed z-scores, -inf where the player is not eligible for the slot
+        """
+        weights = self.signs / self.scale  # slots x categories
+        totals = weights @ self.X.T - (weights * self.replacement).sum(axis=1, keepdims=True)
+        eligible = (self.mask[None, :] & self.bits[:, None]) != 0
+        return np.where(eligible, totals, -np.inf)
+
+    def update(self, player: int, values: np.ndarray, rankKey: float, mask: int) -> np.ndarray:
+        """
+        Replaces one player's categories, rank and eligibility and redoes only the slots they are or were eligible for
+
+        :return: rows of the recomputed slots
+        """
+        affected = np.flatnonzero(self.bits & (self.mask[player] | mask))
+        self.X[player] = values
+        self.mask[player] = mask
+        if rankKey != self.rankKey[player]:
+            # move the player to their new spot instead of re-sorting everyone
+            self.order = self.order[self.order != player]
+            self.rankKey[player] = rankKey
+            at = np.searchsorted(self.rankKey[self.order], rankKey, side="right")
+            self.order = np.insert(self.order, at, player)
+        if len(affected):
+            self.levels(affected)
+        return affected
+
+
+class TRPValuationEngine:
+    hitterCategories = ["R", "HR", "RBI", "SBN", "OBP", "SLG"]
+    pitcherCategories = ["QS", "SVHD", "K/9", "ERA", "WHIP"]
+
+    def __init__(self, lm: TRPLeagueManager, config: TRPLeagueConfig = None, replacement_window: int = 5):
+        """
+        Values every player at every slot they are eligible for.  Hitters are taken off the board by wRAA and pitchers
+        by xERA, so the result does not depend on the order of the Cards.
+
+        :param lm: the TRPLeagueManager holding the Cards
+        :param config: league shape, teams * roster slots players start at every slot; defaults to TRPLeagueConfig()
+        :param replacement_window: number of players past the starters averaged into the replacement level
+        """
+        self.lm = lm
+        self.config = config or TRPLeagueConfig()
+        self.replacement_window = replacement_window
+        self.value()
+
+    def value(self):
+        """
+        Full valuation of both pools, needed again only when the Cards are reloaded
+        """
+        self.pools = {kind: self.pool(self.config, kind, *self.pool_arrays(self.lm, kind),
+                                      replacement_window=self.replacement_window)
+                      for kind in ("hitters", "pitchers")}
+
+    @classmethod
+    def pool_arrays(cls, lm: TRPLeagueManager, kind: str) -> (np.ndarray, np.ndarray, np.ndarray):
+        """
+        :param lm: the TRPLeagueManager holding the Cards
+        :param kind: "hitters" or "pitchers"
+        :return: fresh (categories matrix, eligibility mask, rank key) arrays a _SlotPool is built from
+        """
+        frame = getattr(lm, kind)
+        categories = cls.hitterCategories if kind == "hitters" else cls.pitcherCategories
+        rankColumn = TRPLeagueManager.rankColumns[kind]
+        rankKey = frame[rankColumn].to_numpy(dtype=np.float64, copy=True)
+        if rankColumn not in TRPLeagueManager.lowerIsBetter:
+            rankKey = -rankKey  # e.g. more wRAA goes first
+        mask = lm.hitterMask if kind == "hitters" else lm.pitcherMask
+        return frame[categories].to_numpy(dtype=np.float64, copy=True), mask.copy(), rankKey
+
+    @classmethod
+    def pool(cls, config: TRPLeagueConfig, kind: str, X: np.ndarray, mask: np.ndarray, rankKey: np.ndarray,
+             order: np.ndarray = None, replacement_window: int = 5) -> _SlotPool:
+        """
+        Values one side of the league for config straight from arrays, e.g. views of shared memory
+        """
+        slots = TRPLeagueManager.bats if kind == "hitters" else TRPLeagueManager.arms
+        categories = cls.hitterCategories if kind == "hitters" else cls.pitcherCategories
+        signs = np.array([-1.0 if category in TRPLeagueManager.lowerIsBetter else 1.0 for category in categories])
+        starters = np.array([config.starters(slot) for slot in slots])
+        return _SlotPool(X, mask, slots, categories, signs, rankKey, starters, replacement_window, order)
+
+    def _pool_for(self, pos: str) -> _SlotPool:
+        return self.pools["pitchers" if pos in self.lm.arms else "hitters"]
+
+    def replacement_levels(self, kind: str = "hitters") -> pd.DataFrame:
+        """
+        :param kind: "hitters" or "pitchers"
+        :return: pd.DataFrame with the replacement level of every category (columns) at every slot (rows)
+        """
+        pool = self.pools[kind]
+        return pd.DataFrame(pool.replacement, index=pool.slots, columns=pool.categories)
+
+    def slot_values(self, pos: str) -> pd.DataFrame:
+        """
+        :param pos: a string representation of the roster slot
+        :return: pd.DataFrame indexed like lm.pos_group(pos) with a z-score per category and their sum in "value"
+        """
+        pool = self._pool_for(pos)
+        players = self.lm.eligibility[pos]
+        z = pool.z_scores(pool.slots.index(pos), players)
+        values = pd.DataFrame(z, index=self.lm.frame_for(pos).index[players],
+                              columns=[f"z{category}" for category in pool.categories])
+        values["value"] = z.sum(axis=1)
+        return values
+
+    def player_values(self, kind: str = "hitters") -> pd.DataFrame:
+        """
+        Multi-eligible players are valued at the slot where they are worth the most.
+
+        :param kind: "hitters" or "pitchers"
+        :return: pd.DataFrame indexed like the Cards with the best "value" and its "slot"
+        """
+        pool = self.pools[kind]
+        totals = pool.slot_totals()
+        best = np.argmax(totals, axis=0)
+        value = totals[best, np.arange(totals.shape[1])]
+        slot = np.array(pool.slots, dtype=object)[best]
+        slot[np.isneginf(value)] = None  # not eligible anywhere
+        return pd.DataFrame({"value": value, "slot": slot}, index=getattr(self.lm, kind).index)
+
+    def update_player(self, kind: str, row: int, changes: dict) -> list:
+        """
+        Applies changes to one player's Card and recomputes only the slots that player affects.  Changing nothing but
+        the fantasyTeam recomputes no slot at all.
+
+        :param kind: "hitters" or "pitchers"
+        :param row: row position of the player in the frame
+        :param changes: dict of column name to new value
+        :return: list of the recomputed slots
+        """
+        self.lm.update_player(kind, row, changes)
+        frame = getattr(self.lm, kind)
+        pool = self.pools[kind]
+        rankColumn = TRPLeagueManager.rankColumns[kind]
+        if not set(changes) & set(pool.categories + [rankColumn, "pos"]):
+            return []
+        rankKey = float(frame[rankColumn].iloc[row]) * (1 if rankColumn in TRPLeagueManager.lowerIsBetter else -1)
+        mask = int((self.lm.hitterMask if kind == "hitters" else self.lm.pitcherMask)[row])
+        values = frame[pool.categories].iloc[row].to_numpy(dtype=np.float64)
+        return [pool.slots[i] for i in pool.update(row, values, rankKey, mask)]
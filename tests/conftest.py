@@ -0,0 +1,61 @@
+# Shared fixtures: the Cards in resources/ are loaded once per session, straight from the JSON so no cache is written,
+# tests that write next to the Cards get a copy of them in a temporary folder and tests of edited Cards build a league
+# from frames without touching any file
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from sources.Model.TRPLeagueManager import TRPLeagueManager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="session")
+def root() -> str:
+    """
+    :return: the repository root, which relative resource paths such as the report support files start from
+    """
+    return ROOT
+
+
+@pytest.fixture(scope="session")
+def lm() -> TRPLeagueManager:
+    cwd = os.getcwd()
+    os.chdir(ROOT)  # the Cards paths are relative to the repository root
+    try:
+        return TRPLeagueManager(use_cache=False)
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture
+def cards_dir(tmp_path, monkeypatch) -> str:
+    """
+    :return: temporary folder holding a copy of the Cards, TRPLeagueManager.cardsPaths point into it
+    """
+    paths = {}
+    for kind, path in TRPLeagueManager.cardsPaths.items():
+        paths[kind] = str(tmp_path / os.path.basename(path))
+        shutil.copy(os.path.join(ROOT, path), paths[kind])
+    monkeypatch.setattr(TRPLeagueManager, "cardsPaths", paths)
+    return str(tmp_path)
+
+
+@pytest.fixture
+def league_of(lm):
+    """
+    :return: function building a TRPLeagueManager from Cards frames (with their ESPN IDs), lm's where not given
+    """
+    def league_of(hitters: pd.DataFrame = None, pitchers: pd.DataFrame = None, ids: dict = None) -> TRPLeagueManager:
+        league = TRPLeagueManager.__new__(TRPLeagueManager)
+        league.use_cache = False
+        league.low_memory = False
+        league.hitters = lm.hitters if hitters is None else hitters
+        league.pitchers = lm.pitchers if pitchers is None else pitchers
+        league.ids = {kind: lm.ids[kind] for kind in ("hitters", "pitchers")}
+        league.ids.update(ids or {})
+        league._index_positions()
+        return league
+    return league_of
@@ -0,0 +1,91 @@
+# TRPCardCache: the cache holds exactly what the reader parses, follows the Cards file and keeps its columns mapped
+import json
+import mmap
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sources.Model.TRPCardCache import TRPCardCache
+from sources.Model.TRPCardReader import read_cards_compact
+from sources.Model.TRPLeagueManager import TRPLeagueManager
+
+
+def _mapped(values) -> bool:
+    # True when the array is a view of a memory map rather than its own copy in memory
+    while values is not None:
+        if isinstance(values, (np.memmap, mmap.mmap)):
+            return True
+        values = getattr(values, "base", None)
+    return False
+
+
+@pytest.mark.parametrize("kind", ["hitters", "pitchers"])
+def test_round_trip_matches_the_json(cards_dir, kind):
+    path = TRPLeagueManager.cardsPaths[kind]
+    cache = TRPCardCache(path)
+    built = cache.load()
+    assert os.path.exists(os.path.join(cache.cache_dir, "meta.json"))
+    cached = cache.load()
+    pd.testing.assert_frame_equal(built, pd.read_json(path))
+    pd.testing.assert_frame_equal(cached, built)
+
+
+def test_round_trip_with_the_compact_reader(cards_dir):
+    path = TRPLeagueManager.cardsPaths["hitters"]
+    cache = TRPCardCache(path, read_cards_compact)
+    cache.load()
+    cached = cache.load()
+    pd.testing.assert_frame_equal(cached, read_cards_compact(path))
+    assert isinstance(cached["fantasyTeam"].dtype, pd.CategoricalDtype)
+
+
+def test_numeric_columns_and_category_codes_stay_memory_mapped(cards_dir):
+    path = TRPLeagueManager.cardsPaths["hitters"]
+    TRPCardCache(path).load()
+    cached = TRPCardCache(path).load()
+    for name in cached.select_dtypes("number").columns:
+        assert _mapped(cached[name].to_numpy()), name
+    TRPCardCache(path, read_cards_compact).load()
+    compact = TRPCardCache(path, read_cards_compact).load()
+    assert _mapped(compact["fantasyTeam"].array.codes)
+
+
+def test_changed_cards_rebuild_the_cache(cards_dir):
+    path = TRPLeagueManager.cardsPaths["pitchers"]
+    cache = TRPCardCache(path)
+    cache.load()
+    with open(path, encoding="utf-8") as cards_file:
+        records = json.load(cards_file)[:10]
+    with open(path, "w", encoding="utf-8") as cards_file:
+        json.dump(records, cards_file)
+    pd.testing.assert_frame_equal(cache.load(), pd.read_json(path))
+    assert len(cache.load()) == 10
+
+
+def test_reader_is_part_of_the_key(cards_dir):
+    path = TRPLeagueManager.cardsPaths["hitters"]
+    TRPCardCache(path).load()
+    assert TRPCardCache(path).fingerprint() != TRPCardCache(path, read_cards_compact).fingerprint()
+    pd.testing.assert_frame_equal(TRPCardCache(path, read_cards_compact).load(), read_cards_compact(path))
+
+
+def test_interrupted_build_is_not_used(cards_dir):
+    path = TRPLeagueManager.cardsPaths["hitters"]
+    cache = TRPCardCache(path)
+    cache.load()
+    os.remove(os.path.join(cache.cache_dir, "meta.json"))
+    os.remove(os.path.join(cache.cache_dir, "0.npy"))
+    pd.testing.assert_frame_equal(cache.load(), pd.read_json(path))
+
+
+def test_missing_strings_round_trip(tmp_path):
+    path = str(tmp_path / "cards.json")
+    with open(path, "w", encoding="utf-8") as cards_file:
+        json.dump([{"_name": "A", "tm": "NYY", "PA": 10}, {"_name": "B", "tm": None, "PA": 20}], cards_file)
+    cache = TRPCardCache(path)
+    cache.load()
+    cached = cache.load()
+    pd.testing.assert_frame_equal(cached, pd.read_json(path))
+    assert cached["tm"].isna().tolist() == [False, True]
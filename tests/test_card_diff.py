@@ -0,0 +1,73 @@
+# TRPCardDiff: players added, removed or changed between two loads of the Cards and the slots they touch
+import numpy as np
+import pandas as pd
+
+from sources.Model.TRPCardDiff import TRPCardDiff
+from sources.Model.TRPLeagueManager import TRPLeagueManager
+
+
+def _slots(lm: TRPLeagueManager, kind: str, rows) -> set:
+    mask = np.bitwise_or.reduce((lm.hitterMask if kind == "hitters" else lm.pitcherMask)[rows])
+    slots = TRPLeagueManager.bats if kind == "hitters" else TRPLeagueManager.arms
+    return {slot for slot in slots if mask & TRPLeagueManager.slotBits[slot]}
+
+
+def test_identical_loads_change_nothing(lm, league_of):
+    diff = TRPCardDiff(lm, league_of())
+    assert all(len(diff.changed[kind]) == len(diff.added[kind]) == len(diff.removed[kind]) == 0
+               for kind in TRPCardDiff.kinds)
+    assert diff.affected_slots == []
+    assert repr(diff) == "TRPCardDiff(hitters +0 -0 ~0, pitchers +0 -0 ~0; slots none)"
+
+
+def test_a_changed_stat_touches_the_players_slots(lm, league_of):
+    row = 7
+    hitters = lm.hitters.copy()
+    hitters.iloc[row, hitters.columns.get_loc("HR")] += 1
+    diff = TRPCardDiff(lm, league_of(hitters))
+    assert diff.changed["hitters"].tolist() == [lm.ids["hitters"][row]]
+    assert diff.slots == _slots(lm, "hitters", [row]) and len(diff.changed["pitchers"]) == 0
+
+
+def test_float_noise_is_no_change(lm, league_of):
+    pitchers = lm.pitchers.assign(ERA=lm.pitchers["ERA"] * (1 + 1e-15))
+    assert len(TRPCardDiff(lm, league_of(pitchers=pitchers)).changed["pitchers"]) == 0
+    assert TRPCardDiff.same_cards(lm.pitchers, pitchers)
+
+
+def test_swapped_ranks_change_both_players(lm, league_of):
+    order = np.arange(len(lm.pitchers))
+    order[[3, 4]] = [4, 3]
+    diff = TRPCardDiff(lm, league_of(pitchers=lm.pitchers.iloc[order], ids={"pitchers": lm.ids["pitchers"][order]}))
+    assert sorted(diff.changed["pitchers"]) == sorted(lm.ids["pitchers"][[3, 4]])
+    assert diff.slots == _slots(lm, "pitchers", [3, 4])
+
+
+def test_added_and_removed_players(lm, league_of):
+    keep = np.arange(1, len(lm.hitters))
+    newcomer = lm.hitters.iloc[[5]].assign(pos="C")
+    hitters = pd.concat([lm.hitters.iloc[keep], newcomer])
+    ids = np.concatenate([lm.ids["hitters"][keep], [999999999]])
+    diff = TRPCardDiff(lm, league_of(hitters, ids={"hitters": ids}))
+    assert diff.added["hitters"].tolist() == [999999999]
+    assert diff.removed["hitters"].tolist() == [lm.ids["hitters"][0]]
+    assert len(diff.changed["hitters"]) == 0  # everyone else kept their relative order
+    assert diff.slots == _slots(lm, "hitters", [0]) | {"C"}
+
+
+def test_a_new_field_changes_every_card(lm, league_of):
+    diff = TRPCardDiff(lm, league_of(pitchers=lm.pitchers.assign(note="x")))
+    assert np.array_equal(diff.changed["pitchers"], np.unique(lm.ids["pitchers"]))
+    assert diff.slots == set(TRPLeagueManager.arms)
+
+
+def test_repeated_ids_are_reported_and_count_as_changed(lm, league_of):
+    hitters = pd.concat([lm.hitters, lm.hitters.iloc[[2]]])
+    ids = np.concatenate([lm.ids["hitters"], lm.ids["hitters"][[2]]])
+    hitters.iloc[10, hitters.columns.get_loc("R")] += 1
+    diff = TRPCardDiff(lm, league_of(hitters, ids={"hitters": ids}))
+    repeated = lm.ids["hitters"][2]
+    assert diff.duplicates["hitters"].tolist() == [repeated] and len(diff.duplicates["pitchers"]) == 0
+    assert sorted(diff.changed["hitters"]) == sorted([repeated, lm.ids["hitters"][10]])
+    assert diff.slots == _slots(lm, "hitters", [2, 10])
+    assert "(1 repeated IDs)" in repr(diff)
@@ -0,0 +1,80 @@
+# TRPCardReader: streamed records, compact dtypes and the low-memory TRPLeagueManager built on them
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sources.Model.TRPCardReader import compact_frame, iter_cards, read_cards_compact
+from sources.Model.TRPLeagueManager import TRPLeagueManager
+
+
+@pytest.mark.parametrize("buffer_size", [7, 64, 1 << 16])
+def test_iter_cards_yields_every_record_whatever_the_buffer(cards_dir, buffer_size):
+    path = TRPLeagueManager.cardsPaths["hitters"]
+    with open(path, encoding="utf-8") as cards_file:
+        records = json.load(cards_file)
+    assert list(iter_cards(path, buffer_size)) == records
+
+
+def test_iter_cards_rejects_truncated_and_non_array_files(tmp_path):
+    truncated = tmp_path / "truncated.json"
+    truncated.write_text('[{"_name": "A"}, {"_name": "B"', encoding="utf-8")
+    with pytest.raises(ValueError, match="ends inside"):
+        list(iter_cards(str(truncated), 8))
+    record = tmp_path / "record.json"
+    record.write_text('{"_name": "A"}', encoding="utf-8")
+    with pytest.raises(ValueError, match="not a JSON array"):
+        list(iter_cards(str(record)))
+
+
+def test_compact_frame_downcasts_only_where_exact():
+    frame = pd.DataFrame({"small": [1, 2, 3, 4], "exact": [0.5, 1.25, 2.0, 3.0], "inexact": [0.1, 0.2, 0.3, 0.4],
+                          "repeated": ["NYY", "NYY", "BOS", "NYY"], "unique": ["A", "B", "C", "D"],
+                          "ids": ["36969", "101", "7", "8"]})
+    compact = compact_frame(frame)
+    assert compact["small"].dtype == np.int8
+    assert compact["exact"].dtype == np.float32
+    assert compact["inexact"].dtype == np.float64
+    assert isinstance(compact["repeated"].dtype, pd.CategoricalDtype)
+    assert not isinstance(compact["unique"].dtype, pd.CategoricalDtype)
+    assert compact["ids"].tolist() == [36969, 101, 7, 8]
+    pd.testing.assert_frame_equal(compact.astype(frame.dtypes.to_dict() | {"ids": np.int64}),
+                                  frame.assign(ids=frame["ids"].astype(np.int64)), check_dtype=False)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 50, 10_000])
+def test_read_cards_compact_holds_the_same_values_as_read_json(cards_dir, chunk_size):
+    path = TRPLeagueManager.cardsPaths["pitchers"]
+    compact = read_cards_compact(path, chunk_size)
+    parsed = pd.read_json(path, precise_float=True)  # the json module's exact float parsing
+    assert list(compact.columns) == list(parsed.columns)
+    for name in parsed.columns:
+        if pd.api.types.is_numeric_dtype(parsed[name].dtype):
+            assert np.array_equal(compact[name].to_numpy(dtype=np.float64), parsed[name].to_numpy(dtype=np.float64))
+        else:
+            assert compact[name].astype(str).tolist() == parsed[name].astype(str).tolist(), name
+
+
+def test_chunks_with_different_categories_concatenate_as_categoricals(cards_dir):
+    path = TRPLeagueManager.cardsPaths["hitters"]
+    compact = read_cards_compact(path, 7)
+    assert isinstance(compact["fantasyTeam"].dtype, pd.CategoricalDtype)
+    assert set(compact["fantasyTeam"].cat.categories) == set(pd.read_json(path)["fantasyTeam"])
+
+
+@pytest.mark.parametrize("use_cache", [False, True])
+def test_low_memory_league_matches_and_is_smaller(lm, cards_dir, use_cache):
+    low = TRPLeagueManager(use_cache=use_cache, low_memory=True)
+    for kind in ("hitters", "pitchers"):
+        pd.testing.assert_frame_equal(getattr(low, kind), getattr(lm, kind), check_dtype=False,
+                                      check_categorical=False)
+        assert low.memory_usage()[kind] < lm.memory_usage()[kind]
+    assert all(np.array_equal(low.eligibility[slot], lm.eligibility[slot]) for slot in TRPLeagueManager.slotBits)
+
+
+def test_low_memory_update_adds_new_categories(cards_dir):
+    low = TRPLeagueManager(use_cache=False, low_memory=True)
+    low.update_player("hitters", 0, {"fantasyTeam": "Brand New Team"})
+    assert low.hitters["fantasyTeam"].iloc[0] == "Brand New Team"
+    assert isinstance(low.hitters["fantasyTeam"].dtype, pd.CategoricalDtype)
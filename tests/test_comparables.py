@@ -0,0 +1,87 @@
+# TRPComparables: standardized profiles and the KD-tree searches over them, checked against exhaustive distances
+import numpy as np
+import pytest
+
+from sources.Model.TRPComparables import TRPComparables, _KDTree
+from sources.Model.TRPLeagueManager import TRPLeagueManager
+
+
+@pytest.fixture(scope="module")
+def comparables(lm) -> TRPComparables:
+    return TRPComparables(lm, leaf_size=8)
+
+
+def _exhaustive(vectors: np.ndarray, query: np.ndarray, accepted: np.ndarray, k: int) -> np.ndarray:
+    # squared distances of the k nearest accepted points, nearest first
+    distances = ((vectors[accepted] - query) ** 2).sum(axis=1)
+    return np.sort(distances)[:k]
+
+
+@pytest.mark.parametrize("leaf_size", [1, 4, 32, 1000])
+def test_kd_tree_query_finds_the_nearest_accepted_points(leaf_size):
+    rng = np.random.default_rng(3)
+    points = rng.normal(size=(300, 4))
+    tree = _KDTree(points, leaf_size)
+    queries = rng.normal(size=(25, 4))
+    odd = lambda indices: indices % 2 == 1
+    for query in queries:
+        found, distances = tree.query(query, 6, odd)
+        assert (found % 2 == 1).all() and len(set(found)) == 6
+        np.testing.assert_allclose(distances, ((points[found] - query) ** 2).sum(axis=1))
+        np.testing.assert_allclose(distances, _exhaustive(points, query, np.arange(300) % 2 == 1, 6))
+    found, distances = tree.query_many(queries, 6, lambda numbers, indices: np.broadcast_to(
+        odd(indices), (len(numbers), len(indices))))
+    for query, row, rowDistances in zip(queries, found, distances):
+        np.testing.assert_allclose(rowDistances, _exhaustive(points, query, np.arange(300) % 2 == 1, 6))
+        np.testing.assert_allclose(rowDistances, ((points[row] - query) ** 2).sum(axis=1))
+
+
+def test_query_many_pads_queries_with_too_few_points():
+    points = np.arange(10.0)[:, None]
+    tree = _KDTree(points, 2)
+    below = lambda numbers, indices: indices[None, :] < numbers[:, None] + 1  # query q accepts points 0..q
+    found, distances = tree.query_many(np.zeros((3, 1)), 3, below)
+    assert found.tolist() == [[0, -1, -1], [0, 1, -1], [0, 1, 2]]
+    assert np.isinf(distances[0, 1:]).all() and distances[2].tolist() == [0, 1, 4]
+
+
+def test_profiles_are_standardized_with_missing_stats_as_average(lm, comparables):
+    for kind, stats in TRPComparables.profiles.items():
+        vectors = comparables.vectors[kind]
+        assert vectors.shape == (len(getattr(lm, kind)), len(stats))
+        np.testing.assert_allclose(vectors.mean(axis=0), 0, atol=1e-9)
+        np.testing.assert_allclose(vectors.std(axis=0), 1)
+
+
+@pytest.mark.parametrize("kind,pos", [("hitters", None), ("hitters", "SS"), ("pitchers", None), ("pitchers", "RP")])
+def test_comparables_are_the_nearest_free_agents_fitting_the_slot(lm, comparables, kind, pos):
+    frame = getattr(lm, kind)
+    mask = lm.hitterMask if kind == "hitters" else lm.pitcherMask
+    vectors = comparables.vectors[kind]
+    for row in np.flatnonzero(frame["fantasyTeam"].to_numpy() != "FA")[:15]:
+        required = TRPLeagueManager.slotBits[pos] if pos else mask[row]
+        accepted = (frame["fantasyTeam"].to_numpy() == "FA") & ((mask & required) != 0)
+        result = comparables.comparables(kind, int(row), k=4, pos=pos)
+        assert (result["fantasyTeam"] == "FA").all()
+        assert ((mask[frame.index.get_indexer(result.index)] & required) != 0).all()
+        np.testing.assert_allclose(result["distance"] ** 2, _exhaustive(vectors, vectors[row], accepted, 4))
+
+
+def test_comparables_never_return_the_player(lm, comparables):
+    row = int(np.flatnonzero(lm.hitters["fantasyTeam"].to_numpy() == "FA")[0])
+    result = comparables.comparables("hitters", row, k=10)
+    assert lm.hitters.index[row] not in result.index
+
+
+@pytest.mark.parametrize("kind", ["hitters", "pitchers"])
+def test_for_roster_matches_the_single_queries(lm, comparables, kind):
+    roster = comparables.for_roster(kind, k=3)
+    teams = getattr(lm, kind)["fantasyTeam"].to_numpy()
+    assert sorted(set(roster["playerRow"])) == np.flatnonzero(teams != "FA").tolist()
+    for row, group in roster.groupby("playerRow"):
+        single = comparables.comparables(kind, int(row), k=3)
+        assert group["rank"].tolist() == list(range(1, len(single) + 1))
+        np.testing.assert_allclose(group["distance"], single["distance"])
+        assert (teams[group["comparableRow"]] == "FA").all() and (group["comparableRow"] != row).all()
+    team = teams[teams != "FA"][0]
+    assert set(comparables.for_roster(kind, k=2, team=team)["playerRow"]) == set(np.flatnonzero(teams == team))
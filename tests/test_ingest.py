@@ -0,0 +1,126 @@
+# TRPIngest on small synthetic exports: the join on the universe IDs, the unmatched report and the Cards written
+import os
+
+import pandas as pd
+import pytest
+
+from sources.Model.TRPCardCache import TRPCardCache
+from sources.Model.TRPIngest import TRPIngest
+
+UNIVERSE = """Name,pos,Team,fantasyTeam,idESPN,idFangraphs,idSavant
+Hitter Low,OF,NYY,Team A,1,101,201
+Hitter High,1B/DH,BOS,,2,102,202
+Hitter Unprojected,SS,TOR,Team B,3,103,203
+Pitcher Unexpected,SP,TB,Team A,4,104,204
+Pitcher Late,RP,BAL,,5,105,205
+Pitcher Ace,SP,NYM,Team B,6,106,206
+Hitter Repeated,C,LAD,Team A,1,107,207
+No ESPN ID,2B,SD,Team A,,108,208
+"""
+FANGRAPHS_HITTERS = """Name,PlayerId,PA,AB,R,HR,RBI,SB,CS,OBP,SLG,wOBA
+Hitter Low,101,400.4,360.6,50,10,45,5,2,0.310,0.400,0.300
+Hitter High,102,500,450,70,25,80,8,1,0.360,0.500,0.370
+Somebody Else,999,300,280,30,5,20,1,0,0.300,0.380,0.290
+"""
+SAVANT_HITTERS = """player_id,est_woba,est_slg
+201,0.305,0.410
+202,0.365,0.510
+203,0.320,0.420
+998,0.300,0.400
+997,0.300,0.400
+"""
+FANGRAPHS_PITCHERS = """Name,PlayerId,IP,QS,SV,HLD,K/9,ERA,WHIP,FIP
+Pitcher Unexpected,104,150,12,0,0,9.1,3.80,1.20,3.70
+Pitcher Late,105,60,0,20,5,10.5,3.20,1.10,3.10
+Pitcher Ace,106,180,18,0,0,10.0,2.90,1.00,2.80
+"""
+SAVANT_PITCHERS = """player_id,xera
+205,3.40
+206,2.70
+"""
+
+
+@pytest.fixture
+def ingest(tmp_path) -> TRPIngest:
+    paths = {}
+    for name, text in [("universe", UNIVERSE), ("fangraphs_hitters", FANGRAPHS_HITTERS),
+                       ("savant_hitters", SAVANT_HITTERS), ("fangraphs_pitchers", FANGRAPHS_PITCHERS),
+                       ("savant_pitchers", SAVANT_PITCHERS)]:
+        paths[name] = str(tmp_path / (name + ".csv"))
+        with open(paths[name], "w", encoding="utf-8") as source_file:
+            source_file.write(text)
+    return TRPIngest(paths["universe"],
+                     {"hitters": paths["fangraphs_hitters"], "pitchers": paths["fangraphs_pitchers"]},
+                     {"hitters": paths["savant_hitters"], "pitchers": paths["savant_pitchers"]}, chunk_size=2)
+
+
+def test_universe_keeps_the_first_row_of_each_espn_id(ingest):
+    universe = ingest.read_universe()
+    assert universe["idESPN"].tolist() == [1, 2, 3, 4, 5, 6]
+    assert universe.loc[0, "_name"] == "Hitter Low"
+    assert universe["fantasyTeam"].tolist() == ["Team A", "FA", "Team B", "Team A", "FA", "Team B"]
+
+
+def test_universe_from_html_matches_csv(ingest, tmp_path):
+    rows = [line.split(",") for line in UNIVERSE.splitlines()]
+    table = "<table><tr>{}</tr>{}</table>".format(
+        "".join("<th>{}</th>".format(cell) for cell in rows[0]),
+        "".join("<tr>{}</tr>".format("".join("<td> {} </td>".format(cell) for cell in row)) for row in rows[1:]))
+    ingest.universe_path = str(tmp_path / "universe.html")
+    with open(ingest.universe_path, "w", encoding="utf-8") as universe_file:
+        universe_file.write(table)
+    html = ingest.read_universe()
+    ingest.universe_path = str(tmp_path / "universe.csv")
+    pd.testing.assert_frame_equal(html, ingest.read_universe(), check_dtype=False)
+
+
+def test_join_builds_the_matched_cards_best_first(ingest):
+    cards = ingest.run()
+    hitters, pitchers = cards["hitters"], cards["pitchers"]
+    assert list(hitters.columns) == TRPIngest.cardColumns["hitters"]
+    assert list(pitchers.columns) == TRPIngest.cardColumns["pitchers"]
+    # hitters by wRAA descending, pitchers by xERA ascending
+    assert hitters["_name"].tolist() == ["Hitter High", "Hitter Low"]
+    assert pitchers["_name"].tolist() == ["Pitcher Ace", "Pitcher Late"]
+    low = hitters.iloc[1]
+    assert (low["idESPN"], low["idFangraphs"], low["idSavant"]) == (1, 101, 201)
+    assert (low["PA"], low["AB"], low["SBN"]) == (400, 361, 3)
+    assert low["xwOBA"] == pytest.approx(0.305) and low["xSLG"] == pytest.approx(0.410)
+    assert low["wRAA"] == pytest.approx((0.300 - TRPIngest.lgwOBA) / TRPIngest.wOBAScale * 400)
+    late = pitchers.iloc[1]
+    assert (late["SVHD"], late["fantasyTeam"]) == (25, "FA")
+    assert late["wFIP"] == pytest.approx(3.10 * 60)
+
+
+def test_unmatched_players_are_reported_with_the_reason(ingest):
+    ingest.run()
+    hitters, pitchers = ingest.unmatched["hitters"], ingest.unmatched["pitchers"]
+    assert hitters["_name"].tolist() == ["Hitter Unprojected"]
+    assert hitters["reason"].tolist() == ["no Fangraphs projection"]
+    assert pitchers["_name"].tolist() == ["Pitcher Unexpected"]
+    assert pitchers["reason"].tolist() == ["no Savant expected stats"]
+
+
+def test_source_rows_outside_the_universe_are_counted(ingest):
+    ingest.run()
+    assert ingest.ignored == {"Fangraphs hitters": 1, "Savant hitters": 2,
+                              "Fangraphs pitchers": 0, "Savant pitchers": 0}
+
+
+def test_write_keeps_the_json_and_the_cache_in_step(ingest, tmp_path):
+    cards = ingest.run()
+    paths = {kind: str(tmp_path / (kind + ".json")) for kind in TRPIngest.kinds}
+    written = ingest.write(cards, paths)
+    assert set(written) == set(paths.values()) | {TRPCardCache(path).cache_dir for path in paths.values()}
+    for kind, path in paths.items():
+        parsed = pd.read_json(path)
+        pd.testing.assert_frame_equal(parsed, cards[kind])
+        pd.testing.assert_frame_equal(TRPCardCache(path).load(), parsed)
+    # Cards ingested again replace both, so the cache and the JSON readers never disagree
+    fewer = {kind: frame.iloc[:1] for kind, frame in cards.items()}
+    ingest.write(fewer, paths)
+    for kind, path in paths.items():
+        assert os.listdir(tmp_path).count(kind + ".json.tmp") == 0
+        parsed = pd.read_json(path)
+        pd.testing.assert_frame_equal(parsed, fewer[kind], check_dtype=False)
+        pd.testing.assert_frame_equal(TRPCardCache(path).load(), parsed)
@@ -0,0 +1,74 @@
+# TRPLeagueManager: the slotBits eligibility index and the top-k query API
+import numpy as np
+import pandas as pd
+import pytest
+
+from sources.Model.TRPLeagueManager import TRPLeagueManager
+
+
+def _eligible(frame: pd.DataFrame, slot: str) -> np.ndarray:
+    return np.array([slot in pos.split("/") for pos in frame["pos"]], dtype=bool)
+
+
+@pytest.mark.parametrize("slot", TRPLeagueManager.bats + TRPLeagueManager.arms)
+def test_eligibility_lists_the_rows_holding_the_slot(lm, slot):
+    frame = lm.frame_for(slot)
+    assert np.array_equal(lm.eligibility[slot], np.flatnonzero(_eligible(frame, slot)))
+    assert lm.pos_group(slot).index.equals(frame.index[_eligible(frame, slot)])
+
+
+def test_eligibility_mask_ors_every_listed_slot():
+    frame = pd.DataFrame({"pos": ["OF", "1B/DH", "SS/2B/3B", "XX", "SP/RP", "C/XX"]})
+    bits = TRPLeagueManager.slotBits
+    expected = [bits["OF"], bits["1B"] | bits["DH"], bits["SS"] | bits["2B"] | bits["3B"], 0,
+                bits["SP"] | bits["RP"], bits["C"]]
+    assert TRPLeagueManager.eligibility_mask(frame).tolist() == expected
+
+
+def test_changing_pos_reindexes(cards_dir):
+    lm = TRPLeagueManager(use_cache=False)
+    row = int(np.flatnonzero(~_eligible(lm.hitters, "C"))[0])
+    lm.update_player("hitters", row, {"pos": "C/1B"})
+    assert row in lm.eligibility["C"] and row in lm.eligibility["1B"]
+    assert np.array_equal(lm.eligibility["C"], np.flatnonzero(_eligible(lm.hitters, "C")))
+
+
+def _sorted(frame: pd.DataFrame, by: str, ascending: bool) -> pd.DataFrame:
+    # what top() answers: missing stats last and ties kept in Cards order
+    return frame.sort_values(by, ascending=ascending, kind="stable", na_position="last")
+
+
+@pytest.mark.parametrize("pos,by,k", [("OF", None, 10), ("SP", None, 5), ("RP", "SVHD", 8), ("C", "HR", 1000),
+                                      (None, "SBN", 3), ("SS", "OBP", 0)])
+def test_top_is_the_head_of_the_sorted_players(lm, pos, by, k):
+    kind = "pitchers" if pos in lm.arms else "hitters"
+    by = by or TRPLeagueManager.rankColumns[kind]
+    players = lm.pos_group(pos) if pos else getattr(lm, kind)
+    expected = _sorted(players, by, by in TRPLeagueManager.lowerIsBetter).head(k)
+    pd.testing.assert_frame_equal(lm.top(pos, by=by, k=k), expected)
+
+
+def test_top_filters_by_fantasy_and_mlb_team(lm):
+    team = lm.hitters["tm"].mode()[0]
+    expected = _sorted(lm.hitters[(lm.hitters["fantasyTeam"] == "FA") & (lm.hitters["tm"] == team)], "wRAA", False)
+    pd.testing.assert_frame_equal(lm.top(fantasy_team="FA", team=team), expected)
+    assert lm.top(kind="pitchers", by="ERA", k=4, ascending=False)["ERA"].tolist() == \
+        sorted(lm.pitchers["ERA"], reverse=True)[:4]
+
+
+def test_top_keeps_ties_and_missing_stats_in_order(cards_dir):
+    lm = TRPLeagueManager(use_cache=False)
+    for row in (5, 2, 9):
+        lm.update_player("hitters", row, {"HR": 99})
+    lm.update_player("hitters", 0, {"wOBA": np.nan})
+    assert lm.top(by="HR", k=3).index.tolist() == lm.hitters.index[[2, 5, 9]].tolist()
+    assert lm.top(by="wOBA", ascending=True).index[-1] == lm.hitters.index[0]
+
+
+def test_top_answers_are_cached_until_the_cards_change(cards_dir):
+    lm = TRPLeagueManager(use_cache=False)
+    first = lm.top("OF", k=3)
+    assert lm.top("OF", k=3).index.equals(first.index) and len(lm._queries) == 1
+    lm.update_player("hitters", int(lm.eligibility["OF"][-1]), {"wRAA": 1000.0})
+    assert lm._queries == {}
+    assert lm.top("OF", k=1).index[0] == lm.hitters.index[lm.eligibility["OF"][-1]]
@@ -0,0 +1,40 @@
+# plot_util: Free Agent labelling and label decluttering of the position scatter plots
+import matplotlib
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import pytest
+
+from sources.Export.plot_util import declutter_labels, draw_position_scatter
+
+
+@pytest.fixture
+def ax():
+    fig, ax = plt.subplots()
+    yield ax
+    plt.close(fig)
+
+
+def test_declutter_keeps_the_highest_priority_point_per_cell():
+    x = np.array([0.0, 0.001, 0.5, 1.0])
+    y = np.array([0.0, 0.001, 0.5, 1.0])
+    assert list(declutter_labels(x, y, np.array([1.0, 2.0, 0.0, 0.0]), bins=10)) == [1, 2, 3]
+    assert list(declutter_labels(x, y, np.array([3.0, 2.0, 0.0, 0.0]), bins=10)) == [0, 2, 3]
+    assert len(declutter_labels(np.array([]), np.array([]), np.array([]))) == 0
+
+
+def test_only_free_agents_are_labelled_at_their_points(ax):
+    data = pd.DataFrame({"_name": ["A", "B", "A"], "fantasyTeam": ["FA", "Team", "FA"], "OBP": [0.30, 0.35, 0.40],
+                         "SLG": [0.40, 0.45, 0.50], "wRAA": [1.0, 2.0, 3.0]})
+    draw_position_scatter(ax, "1B", data)
+    assert [(text.get_text(), text.get_position()) for text in ax.texts] == [("A", (0.30, 0.40)), ("A", (0.40, 0.50))]
+
+
+def test_decluttered_pitchers_keep_the_lowest_xera(ax):
+    # two free agents on top of each other: the better (lower) xERA keeps the label
+    data = pd.DataFrame({"_name": ["Worse", "Better"], "fantasyTeam": ["FA", "FA"], "WHIP": [1.2, 1.2],
+                         "ERA": [3.5, 3.5], "xERA": [4.5, 2.5]})
+    draw_position_scatter(ax, "SP", data, declutter=True)
+    assert [text.get_text() for text in ax.texts] == ["Better"]
@@ -0,0 +1,103 @@
+# report_server: pages, charts and table data rendered on first request and revalidated with ETag/Last-Modified
+import asyncio
+import http.client
+import json
+import os
+import re
+import threading
+
+import matplotlib
+import pytest
+
+from sources.Export.report_server import ReportServer
+from sources.Model.TRPLeagueManager import TRPLeagueManager
+
+
+@pytest.fixture
+def server(cards_dir, root, monkeypatch):
+    """
+    :return: tuple of a ReportServer over a copy of the Cards and the port it listens on, served from its own thread
+    """
+    matplotlib.use("Agg")
+    monkeypatch.setattr(ReportServer, "support_folder", os.path.join(root, ReportServer.support_folder))
+    report = ReportServer(TRPLeagueManager(use_cache=False))
+    loop = asyncio.new_event_loop()
+    listener = loop.run_until_complete(asyncio.start_server(report._handle, "127.0.0.1", 0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield report, listener.sockets[0].getsockname()[1]
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    listener.close()
+    loop.run_until_complete(listener.wait_closed())
+    loop.close()
+    report.executor.shutdown()
+
+
+def _get(port: int, path: str, method: str = "GET", **headers) -> (int, dict, bytes):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    try:
+        connection.request(method, path, headers={name.replace("_", "-"): value for name, value in headers.items()})
+        response = connection.getresponse()
+        return response.status, {name.lower(): value for name, value in response.getheaders()}, response.read()
+    finally:
+        connection.close()
+
+
+def test_index_revalidates_with_etag_and_last_modified(server):
+    _, port = server
+    status, headers, body = _get(port, "/")
+    assert status == 200 and b"pos/SS/" in body
+    assert _get(port, "/", If_None_Match=headers["etag"])[0] == 304
+    assert _get(port, "/", If_Modified_Since=headers["last-modified"])[0] == 304
+    assert _get(port, "/", If_None_Match='"other"', If_Modified_Since=headers["last-modified"])[0] == 200
+    status, _, body = _get(port, "/", "HEAD")
+    assert status == 200 and body == b""
+
+
+def test_page_charts_and_tables_are_rendered_on_request(server):
+    report, port = server
+    status, headers, page = _get(port, "/pos/C/")
+    assert status == 200 and headers["transfer-encoding"] == "chunked"
+    images = re.findall(r"<img src='([0-9a-f]{32}\.png)'/>", page.decode())
+    tables = re.findall(r"src='(table\d+\.js)'", page.decode())
+    assert images and tables
+    # nothing but the page is rendered until the browser asks for it
+    assert not any(path.endswith((".png", ".js")) for path in report._responses)
+    # the cached page is answered again in one piece
+    status, headers, again = _get(port, "/pos/C/")
+    assert again == page and "content-length" in headers
+
+    status, headers, image = _get(port, "/pos/C/" + images[0])
+    assert status == 200 and headers["content-type"] == "image/png" and image.startswith(b"\x89PNG")
+    assert _get(port, "/pos/C/" + images[0], If_None_Match=headers["etag"])[0] == 304
+
+    status, headers, script = _get(port, "/pos/C/" + tables[0])
+    assert status == 200 and headers["content-type"].startswith("text/javascript")
+    rows = json.loads(re.search(r"trpTableData\[\d+\] = (.*);$", script.decode()).group(1))
+    assert len(rows) == report.config.pool_size("C")
+
+
+def test_static_files_redirects_and_errors(server):
+    _, port = server
+    status, headers, _ = _get(port, "/pos/SS/html_support_files/style.css")
+    assert status == 200 and headers["cache-control"] == "max-age=3600"
+    status, headers, _ = _get(port, "/pos/SS")
+    assert status == 301 and headers["location"] == "/pos/SS/"
+    assert _get(port, "/pos/XX/")[0] == 404
+    assert _get(port, "/pos/SS/missing.png")[0] == 404
+    assert _get(port, "/pos/SS/html_support_files/../../../../main.py")[0] == 404
+    assert _get(port, "/", "POST")[0] == 405
+
+
+def test_changed_cards_start_a_new_version(server):
+    report, port = server
+    _, headers, _ = _get(port, "/pos/SS/")
+    path = TRPLeagueManager.cardsPaths["hitters"]
+    with open(path, encoding="utf-8") as cards_file:
+        records = json.load(cards_file)
+    with open(path, "w", encoding="utf-8") as cards_file:
+        json.dump(records[:50], cards_file)
+    status, changed, _ = _get(port, "/pos/SS/", If_None_Match=headers["etag"])
+    assert status == 200 and changed["etag"] != headers["etag"]
+    assert report.version == 1 and len(report.lm.hitters) == 50
@@ -0,0 +1,101 @@
+# report_util: figures are content addressed by their data and by the code that draws them, tables are written column
+# by column into the page or as JSON data files
+import functools
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import sources.Export.report_util as report_util
+
+
+def _draw_one(values, figure):
+    pass
+
+
+def _draw_other(values, figure):
+    pass
+
+
+def _fingerprint(draw, values) -> str:
+    figure = report_util.Figure()
+    figure.set_draw(functools.partial(draw, values), "plot", values)
+    return figure.fingerprint
+
+
+def test_same_data_and_code_give_the_same_fingerprint():
+    values = np.arange(5.0)
+    assert _fingerprint(_draw_one, values) == _fingerprint(_draw_one, values.copy())
+    assert report_util.figure_fingerprint(pd.Series(values)) == report_util.figure_fingerprint(values)
+
+
+def test_data_changes_the_fingerprint():
+    assert _fingerprint(_draw_one, np.arange(5.0)) != _fingerprint(_draw_one, np.arange(1.0, 6.0))
+    assert report_util.figure_fingerprint(np.arange(4.0)) != report_util.figure_fingerprint(np.arange(4.0)[::-1])
+
+
+def test_draw_code_changes_the_fingerprint(monkeypatch):
+    values = np.arange(5.0)
+    first = _fingerprint(_draw_one, values)
+    assert _fingerprint(_draw_other, values) != first
+    monkeypatch.setattr(_draw_one, "draw_version", 2, raising=False)
+    assert _fingerprint(_draw_one, values) != first
+    monkeypatch.delattr(_draw_one, "draw_version")
+    monkeypatch.setattr(report_util, "FIGURE_DRAW_VERSION", report_util.FIGURE_DRAW_VERSION + 1)
+    assert _fingerprint(_draw_one, values) != first
+
+
+ROWS = [["Soto <OF>", "A & B", 22, 0.415], ["Judge", "FA", 40, 0.43]]
+
+
+def _report(rows=ROWS, column_wise: bool = True) -> report_util.Report:
+    report = report_util.Report("tables")
+    table = report.add_section("Hitters").add_table()
+    table.set_header(["_name", "fantasyTeam", "HR", "wOBA"])
+    table.caption = "Hitters & more"
+    if column_wise:
+        table.set_column_data([np.array([row[i] for row in rows], dtype=object if i < 2 else None)
+                               for i in range(4)])
+    else:
+        table.set_data(rows)
+    return report
+
+
+def _page(tmp_path, report: report_util.Report, table_data: str = "html") -> str:
+    report_util.HTMLReportContext(str(tmp_path), table_data).generate(report, "tables", workers=1)
+    with open(os.path.join(str(tmp_path), "tables.html"), encoding="utf-8") as page:
+        return page.read()
+
+
+def test_column_data_writes_the_same_rows_as_row_data(tmp_path):
+    page = _page(tmp_path, _report())
+    assert page == _page(tmp_path, _report(column_wise=False))
+    assert "<tr><td>Soto &lt;OF&gt;</td><td>A &amp; B</td><td>22</td><td>0.415</td></tr>" in page
+    assert "<caption>Table 1. Hitters &amp; more</caption>" in page
+
+
+def test_rows_are_written_in_buffered_chunks(tmp_path, monkeypatch):
+    rows = [["p{}".format(i), "FA", i, i / 1000] for i in range(25)]
+    expected = _page(tmp_path, _report(rows))
+    monkeypatch.setattr(report_util.HTMLReportContext, "table_rows_per_write", 4)
+    assert _page(tmp_path, _report(rows)) == expected
+
+
+def test_json_table_data_goes_to_a_script_beside_the_page(tmp_path):
+    page = _page(tmp_path, _report(), "json")
+    assert "<script type='text/javascript' src='tables_table1.js'></script>" in page
+    assert "<table data-table-source='1'>" in page and "<tbody></tbody>" in page
+    with open(os.path.join(str(tmp_path), "tables_table1.js"), encoding="utf-8") as data_file:
+        script = data_file.read()
+    rows = json.loads(re.fullmatch(r"window\.trpTableData = window\.trpTableData \|\| \{\};trpTableData\[1\] = (.*);",
+                                   script).group(1))
+    # numbers stay numbers, text is escaped since DataTables inserts cells as html
+    assert rows == [["Soto &lt;OF&gt;", "A &amp; B", 22, 0.415], ["Judge", "FA", 40, 0.43]]
+
+
+def test_unknown_table_data_mode_is_rejected():
+    with pytest.raises(ValueError, match="table_data"):
+        report_util.HTMLReportContext("", "csv")
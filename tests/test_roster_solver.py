@@ -0,0 +1,101 @@
+# TRPRosterSolver against brute force enumeration of every assignment of players to slots
+import itertools
+
+import numpy as np
+import pytest
+
+from sources.Model.TRPRosterSolver import TRPRosterSolver, _emptySlot, _Lineup
+from sources.Model.TRPValuationEngine import TRPValuationEngine
+
+
+def brute_force(slotValues: np.ndarray, players: list) -> float:
+    """
+    :return: the best total of filled slot values, fewest empty slots first (as the solver's empty-slot cost does)
+    """
+    slots = len(slotValues)
+    columns = list(players) + [None] * slots
+    best = (-np.inf, -np.inf)
+    for chosen in itertools.permutations(range(len(columns)), slots):
+        picked = [columns[c] for c in chosen]
+        if any(player is not None and not np.isfinite(slotValues[s, player]) for s, player in enumerate(picked)):
+            continue
+        filled = sum(slotValues[s, player] for s, player in enumerate(picked) if player is not None)
+        best = max(best, (-picked.count(None), filled))
+    return best[1]
+
+
+def random_values(rng: np.random.Generator, slots: int, players: int) -> np.ndarray:
+    values = np.round(rng.normal(0, 3, (slots, players)), 1)
+    if rng.random() < 0.3:
+        values = np.round(values)  # plenty of ties
+    values[rng.random((slots, players)) < 0.4] = -np.inf
+    return values
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_lineup_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    slotValues = random_values(rng, int(rng.integers(1, 5)), int(rng.integers(1, 7)))
+    players = list(range(slotValues.shape[1]))
+    lineup = _Lineup(slotValues, np.array(players))
+    assert lineup.total == pytest.approx(brute_force(slotValues, players))
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_incremental_add_and_drop_match_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    slotValues = random_values(rng, int(rng.integers(1, 5)), int(rng.integers(2, 8)))
+    start = int(rng.integers(0, slotValues.shape[1]))
+    players = list(range(start))
+    lineup = _Lineup(slotValues, np.array(players, dtype=np.int64))
+    for player in range(start, slotValues.shape[1]):
+        lineup = lineup.with_player(player)
+        players.append(player)
+        assert lineup.total == pytest.approx(brute_force(slotValues, players))
+        # the duals stay feasible and the unmatched columns at zero, so later steps can start from them
+        assert (lineup.cost - lineup.u[:, None] - lineup.v[None, :] >= -1e-9).all()
+        assert np.allclose(lineup.v[lineup.row4col < 0], 0)
+        assert (lineup.row4col[lineup.col4row] == np.arange(len(lineup.col4row))).all()
+
+    dropped = players[int(rng.integers(len(players)))]
+    without = lineup.copy_without(dropped)
+    assert without.total == pytest.approx(brute_force(slotValues, [p for p in players if p != dropped]))
+    assert without.with_player(dropped).total == pytest.approx(lineup.total)
+
+
+def test_solver_gains_match_rebuilt_lineups(lm):
+    solver = TRPRosterSolver(TRPValuationEngine(lm))
+    team = next(team for team in lm.hitters["fantasyTeam"].unique() if team != "FA")
+    rows = solver._team_rows("hitters", team)
+    gains = solver.waiver_values(team, "hitters").head(10)
+    for row, gain in zip(lm.hitters.index.get_indexer(gains.index), gains["gain"]):
+        rebuilt = _Lineup(solver.slotValues["hitters"], np.append(rows, row))
+        assert gain == pytest.approx(rebuilt.total - solver.total(team, "hitters"))
+    # brute_force ranks fewer empty slots first, which holds while no slot value outweighs an empty slot
+    assert _emptySlot > np.abs(solver.slotValues["hitters"][np.isfinite(solver.slotValues["hitters"])]).max()
+
+
+def test_lineup_starts_eligible_players_once(lm):
+    solver = TRPRosterSolver(TRPValuationEngine(lm))
+    team = next(team for team in lm.pitchers["fantasyTeam"].unique() if team != "FA")
+    lineup = solver.lineup(team, "pitchers")
+    assert list(lineup["slot"]) == list(solver.slots["pitchers"])
+    started = lineup["row"][lineup["row"] >= 0].to_numpy()
+    assert len(np.unique(started)) == len(started)
+    assert (lm.pitchers["fantasyTeam"].to_numpy()[started] == team).all()
+    assert lineup["value"].sum() == pytest.approx(solver.total(team, "pitchers"))
+
+
+def test_move_keeps_the_bench_and_matches_add_value(lm):
+    solver = TRPRosterSolver(TRPValuationEngine(lm))
+    team = next(team for team in lm.hitters["fantasyTeam"].unique() if team != "FA")
+    rows = solver._team_rows("hitters", team)
+    add = int(solver._team_rows("hitters", "FA")[0])
+    drop = int(solver.lineup(team)["row"].iloc[0])
+    before = solver.total(team)
+    gain = solver.add_value(team, "hitters", add, drop=drop)
+    solver.move(team, "hitters", add=add, drop=drop)
+    moved = solver._lineup("hitters", team)
+    assert sorted(moved.players) == sorted(np.append(rows[rows != drop], add))
+    assert solver.total(team) - before == pytest.approx(gain)
+    assert solver.total(team) == pytest.approx(_Lineup(solver.slotValues["hitters"], moved.players).total)
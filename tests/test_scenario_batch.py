@@ -0,0 +1,66 @@
+# TRPScenarioBatch: pools, cutoffs and values of several league shapes from one shared copy of the Cards
+import numpy as np
+import pytest
+
+from sources.Model.TRPLeagueConfig import TRPLeagueConfig
+from sources.Model.TRPLeagueManager import TRPLeagueManager
+from sources.Model.TRPScenarioBatch import TRPScenarioBatch
+from sources.Model.TRPValuationEngine import TRPValuationEngine
+
+configs = [TRPLeagueConfig("default"),
+           TRPLeagueConfig("small", teams=8, hitter_cutoff=10, pitcher_buffer=5),
+           TRPLeagueConfig("deep", teams=14, roster_slots={"OF": 5, "1B": 1, "C": 2, "SP": 6, "RP": 3},
+                           hitter_cutoff=40, hitter_cutoffs={"OF": 116})]
+
+
+@pytest.fixture(scope="module")
+def results(lm):
+    with TRPScenarioBatch(lm) as batch:
+        yield batch, batch.run(configs, workers=1), batch.run(configs, workers=2)
+
+
+@pytest.mark.parametrize("config", configs, ids=lambda config: config.name)
+def test_pools_are_the_best_of_each_group_and_cutoffs_keep_the_sign(lm, results, config):
+    batch, serial, _ = results
+    result = serial[config.name]
+    for pos in lm.bats + lm.arms:
+        kind = "pitchers" if pos in lm.arms else "hitters"
+        stat = TRPLeagueManager.rankColumns[kind]
+        expected = lm.pos_group(pos).sort_values(stat, ascending=stat in TRPLeagueManager.lowerIsBetter,
+                                                 kind="stable").head(config.pool_size(pos))
+        assert batch.pool_frame(result, pos).index.equals(expected.index)
+        assert result["cutoffs"][pos] == pytest.approx(expected[stat].iloc[-1])
+
+
+@pytest.mark.parametrize("config", configs, ids=lambda config: config.name)
+def test_values_match_a_valuation_engine_for_the_config(lm, results, config):
+    batch, serial, _ = results
+    for kind in TRPScenarioBatch.kinds:
+        expected = TRPValuationEngine(lm, config).player_values(kind)
+        np.testing.assert_allclose(serial[config.name]["values"][kind], expected["value"])
+        assert (serial[config.name]["slots"][kind] == expected["slot"].to_numpy()).all()
+        rankings = batch.rankings(serial[config.name], kind)
+        assert rankings["value"].is_monotonic_decreasing
+        assert rankings.index.sort_values().equals(getattr(lm, kind).index.sort_values())
+
+
+def test_worker_processes_match_the_serial_run(results):
+    _, serial, shared = results
+    for config in configs:
+        for kind in TRPScenarioBatch.kinds:
+            assert np.array_equal(serial[config.name]["values"][kind], shared[config.name]["values"][kind])
+            assert np.array_equal(serial[config.name]["slots"][kind], shared[config.name]["slots"][kind])
+        assert serial[config.name]["cutoffs"] == pytest.approx(shared[config.name]["cutoffs"], nan_ok=True)
+
+
+def test_a_slot_nobody_fills_has_no_cutoff(lm):
+    with TRPScenarioBatch(lm) as batch:
+        result = batch.run([TRPLeagueConfig("none", hitter_cutoff=0, hitter_cutoffs={})], workers=1)["none"]
+    assert len(result["pools"]["C"]) == 0 and np.isnan(result["cutoffs"]["C"])
+
+
+def test_close_releases_the_shared_block(lm):
+    batch = TRPScenarioBatch(lm)
+    batch.close()
+    assert batch.memory is None and batch.arrays == {}
+    batch.close()
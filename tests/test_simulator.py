@@ -0,0 +1,74 @@
+# TRPSimulator: rest-of-season distributions from the Cards' projections, seeded per player
+import types
+
+import numpy as np
+import pytest
+
+from sources.Model.TRPSimulator import TRPSimulator
+
+
+@pytest.fixture(scope="module")
+def few(lm):
+    # a dozen players of each kind keep the trial counts affordable
+    return types.SimpleNamespace(hitters=lm.hitters.head(12), pitchers=lm.pitchers.head(12))
+
+
+def _outcomes(simulator: TRPSimulator, kind: str, row: int) -> np.ndarray:
+    """
+    One player's categories x trials outcomes as the model describes them: log outcome = playing time factor +
+    performance factor + own noise, each scaled by the category loadings, centred so the mean is the projection
+    """
+    projections, performance, loadings = simulator.parameters(kind)
+    kindIndex = list(TRPSimulator.categories).index(kind)
+    draws = np.random.default_rng([simulator.seed, kindIndex, row]).standard_normal(
+        (2 + len(loadings), simulator.trials), dtype=np.float32).astype(np.float64)
+    scales = np.column_stack([simulator.playing_time_sd * loadings[:, 0], performance[row] * loadings[:, 1],
+                              loadings[:, 2]])
+    logs = scales[:, :1] * draws[0] + scales[:, 1:2] * draws[1] + scales[:, 2:] * draws[2:]
+    return projections[row][:, None] * np.exp(logs - (scales ** 2).sum(axis=1, keepdims=True) / 2)
+
+
+@pytest.mark.parametrize("kind", ["hitters", "pitchers"])
+def test_summaries_follow_the_model(few, kind):
+    simulator = TRPSimulator(few, trials=2000, seed=3, percentiles=(5, 50, 95))
+    simulated = simulator.simulate(kind)
+    assert simulated.index.equals(getattr(few, kind).index)
+    for row in range(len(simulated)):
+        outcomes = _outcomes(simulator, kind, row)
+        for c, category in enumerate(TRPSimulator.categories[kind]):
+            expected = [np.percentile(outcomes[c], p) for p in (5, 50, 95)] + [outcomes[c].mean()]
+            columns = [f"{category} p5", f"{category} p50", f"{category} p95", f"{category} mean"]
+            # the simulator draws and sums in float32
+            np.testing.assert_allclose(simulated.iloc[row][columns].to_numpy(dtype=np.float64), expected, rtol=1e-4)
+
+
+def test_performance_spread_grows_with_the_expected_stats_gap(few):
+    simulator = TRPSimulator(few)
+    _, performance, _ = simulator.parameters("hitters")
+    wOBA, xwOBA = few.hitters["wOBA"].to_numpy(), few.hitters["xwOBA"].to_numpy()
+    gap = np.minimum(np.abs(wOBA - xwOBA) / xwOBA, TRPSimulator.maxGap)
+    np.testing.assert_allclose(performance, simulator.performance_sd + gap)
+    simulated = simulator.simulate("hitters")
+    spread = simulated["SLG p90"] / simulated["SLG p10"]
+    widest, narrowest = np.argmax(gap), np.argmin(gap)
+    assert spread.iloc[widest] > spread.iloc[narrowest]
+
+
+def test_seed_decides_the_draws(few):
+    first = TRPSimulator(few, trials=300, seed=1).simulate("pitchers")
+    assert first.equals(TRPSimulator(few, trials=300, seed=1).simulate("pitchers"))
+    assert not first.equals(TRPSimulator(few, trials=300, seed=2).simulate("pitchers"))
+
+
+def test_results_do_not_depend_on_blocks_or_workers(few):
+    whole = TRPSimulator(few, trials=500).simulate("hitters")
+    perPlayer = 500 * (2 + 2 * len(TRPSimulator.categories["hitters"])) * 4
+    blocked = TRPSimulator(few, trials=500, memory_budget=3 * perPlayer)
+    assert blocked.simulate("hitters").equals(whole)
+    assert blocked.simulate("hitters", workers=2).equals(whole)
+
+
+def test_means_stay_at_the_projections(few):
+    simulated = TRPSimulator(few, trials=200_000).simulate("pitchers")
+    for category in TRPSimulator.categories["pitchers"]:
+        np.testing.assert_allclose(simulated[f"{category} mean"], few.pitchers[category], rtol=0.01)
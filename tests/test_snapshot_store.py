@@ -0,0 +1,97 @@
+# TRPSnapshotStore: dated snapshots of the Cards and the trend, delta and risers queries over them
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sources.Model.TRPSnapshotStore import TRPSnapshotStore
+
+
+def _cards(lm, kind: str) -> pd.DataFrame:
+    # the Cards as ingested, with the ESPN ID the snapshots are keyed by
+    return getattr(lm, kind).assign(idESPN=lm.ids[kind]).reset_index(drop=True)
+
+
+@pytest.fixture
+def history(lm, tmp_path):
+    """
+    Three weekly snapshots: the second drops the first hitter and raises every xwOBA by the hitter's row / 1000, the
+    third adds a new hitter
+    """
+    store = TRPSnapshotStore(str(tmp_path / "snapshots"))
+    hitters, pitchers = _cards(lm, "hitters"), _cards(lm, "pitchers")
+    store.ingest("2022-06-01", {"hitters": hitters, "pitchers": pitchers})
+    raised = hitters.assign(xwOBA=hitters["xwOBA"] + np.arange(len(hitters)) / 1000).iloc[1:]
+    store.ingest("2022-06-08", {"hitters": raised, "pitchers": pitchers})
+    rookie = raised.iloc[:1].assign(idESPN=1, _name="Rookie", fantasyTeam="FA")
+    store.ingest("2022-06-15", {"hitters": pd.concat([raised, rookie]), "pitchers": pitchers})
+    return store, hitters, raised
+
+
+def test_snapshots_round_trip(lm, history):
+    store, hitters, raised = history
+    assert store.dates() == store.dates("pitchers") == ["2022-06-01", "2022-06-08", "2022-06-15"]
+    pd.testing.assert_frame_equal(store.snapshot("hitters", "2022-06-01"), hitters, check_dtype=False)
+    pd.testing.assert_frame_equal(store.snapshot("pitchers"), _cards(lm, "pitchers"), check_dtype=False)
+    # the latest snapshot on or before the date
+    pd.testing.assert_frame_equal(store.snapshot("hitters", "2022-06-10"), raised.reset_index(drop=True),
+                                  check_dtype=False)
+    with pytest.raises(LookupError):
+        store.resolve("hitters", "2022-05-31")
+
+
+def test_a_date_is_ingested_once(lm, history):
+    store = history[0]
+    with pytest.raises(ValueError, match="already holds"):
+        store.ingest("2022-06-15", {"hitters": _cards(lm, "hitters")})
+
+
+def test_failed_ingest_leaves_no_snapshot_and_can_be_retried(lm, history, monkeypatch):
+    store = history[0]
+    frames = {"hitters": _cards(lm, "hitters"), "pitchers": _cards(lm, "pitchers")}
+    write = TRPSnapshotStore._write_partition
+
+    def fail_on_pitchers(self, kind, *args):
+        if kind == "pitchers":
+            raise OSError("disk full")
+        return write(self, kind, *args)
+
+    monkeypatch.setattr(TRPSnapshotStore, "_write_partition", fail_on_pitchers)
+    with pytest.raises(OSError):
+        store.ingest("2022-06-22", frames)
+    assert "2022-06-22" not in store.dates() and os.path.isdir(os.path.join(store.root, "2022-06-22.tmp"))
+    monkeypatch.undo()
+    store.ingest("2022-06-22", frames)
+    assert store.dates()[-1] == store.dates("pitchers")[-1] == "2022-06-22"
+    assert not os.path.exists(os.path.join(store.root, "2022-06-22.tmp"))
+
+
+def test_repeated_ids_are_refused(lm, tmp_path):
+    hitters = _cards(lm, "hitters")
+    with pytest.raises(ValueError, match="repeat"):
+        TRPSnapshotStore(str(tmp_path)).ingest("2022-06-01", {"hitters": pd.concat([hitters, hitters.iloc[:1]])})
+
+
+def test_trend_has_a_column_per_player_and_nan_when_missing(history):
+    store, hitters, raised = history
+    trend = store.trend("hitters", "xwOBA")
+    assert trend.index.tolist() == store.dates()
+    assert trend.columns.tolist() == hitters["idESPN"].tolist() + [1]
+    first = hitters["idESPN"].iloc[0]
+    assert np.isnan(trend[first].iloc[1:]).all() and trend[1].isna().tolist() == [True, True, False]
+    np.testing.assert_allclose(trend.loc["2022-06-08", raised["idESPN"]], raised["xwOBA"])
+    assert store.trend("hitters", "xwOBA", start="2022-06-08", ids=[first, 1]).shape == (2, 2)
+
+
+def test_delta_and_risers(history):
+    store, hitters, raised = history
+    delta = store.delta("hitters", "xwOBA", "2022-06-01", "2022-06-08")
+    # players missing from either snapshot are left out, the rest by change, largest first
+    assert delta.index.tolist() == raised["idESPN"].iloc[::-1].tolist()
+    np.testing.assert_allclose(delta["delta"], np.arange(len(hitters) - 1, 0, -1) / 1000)
+    risers = store.risers("hitters", "xwOBA", days=7, pos="SS", until="2022-06-08", top=3)
+    eligible = raised[(raised["fantasyTeam"] == "FA") & raised["pos"].str.split("/").map(lambda pos: "SS" in pos)]
+    assert risers.index.tolist() == eligible["idESPN"].iloc[::-1].head(3).tolist()
+    everyone = store.risers("hitters", "xwOBA", days=7, fantasy_team=None, until="2022-06-08", top=None)
+    assert len(everyone) == len(raised)
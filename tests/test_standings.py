@@ -0,0 +1,90 @@
+# TRPStandings: team totals with rate stats weighted by playing time, head-to-head results and roster moves
+import copy
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sources.Model.TRPStandings import TRPStandings
+
+HITTERS = pd.DataFrame({"_name": ["a1", "a2", "b1", "f1"], "fantasyTeam": ["A", "A", "B", "FA"],
+                        "R": [10, 20, 25, 5], "HR": [5, 1, 8, 10], "RBI": [10, 5, 20, 12], "SBN": [1, 3, 0, 5],
+                        "OBP": [0.300, 0.400, 0.350, 0.320], "PA": [100, 300, 400, 200],
+                        "SLG": [0.400, 0.500, 0.450, 0.600], "AB": [90, 270, 360, 180]})
+PITCHERS = pd.DataFrame({"_name": ["pa", "pb", "pb2", "pf"], "fantasyTeam": ["A", "B", "B", "FA"],
+                         "QS": [10, 8, 0, 2], "SVHD": [0, 10, 20, 30], "K/9": [9.0, 10.0, 12.0, 11.0],
+                         "ERA": [3.0, 4.0, 2.0, 1.0], "WHIP": [1.1, 1.2, 1.0, 0.9], "IP": [100, 80, 20, 50]})
+
+
+@pytest.fixture
+def tiny():
+    return types.SimpleNamespace(hitters=HITTERS.copy(), pitchers=PITCHERS.copy())
+
+
+def test_totals_weight_the_rate_stats(tiny):
+    totals = TRPStandings(tiny).totals()
+    assert totals.index.tolist() == ["A", "B"]
+    expected = {"A": [30, 6, 15, 4, 0.375, 0.475, 10, 0, 9.0, 3.0, 1.1],
+                "B": [25, 8, 20, 0, 0.350, 0.450, 8, 30, 10.4, 3.6, 1.16]}
+    for team, values in expected.items():
+        np.testing.assert_allclose(totals.loc[team].to_numpy(), values)
+
+
+def test_matchups_and_standings(tiny):
+    standings = TRPStandings(tiny)
+    # A wins R, SBN, OBP, SLG, QS and the lower ERA and WHIP
+    matchups = standings.matchups()
+    assert matchups.loc["A", "B"] == 7 and matchups.loc["B", "A"] == 4 and np.isnan(matchups.loc["A", "A"])
+    table = standings.standings()
+    assert table.index.tolist() == ["A", "B"]
+    assert table.loc["A", ["roto", "W", "L", "T"]].tolist() == [18, 1, 0, 0]
+    assert table.loc["B", ["roto", "W", "L", "T"]].tolist() == [15, 0, 1, 0]
+
+
+def test_matchup_changes_of_free_agents(tiny):
+    standings = TRPStandings(tiny)
+    hitter = standings.matchup_changes("A", "hitters")
+    assert hitter.loc[3, ["categories", "matchups"]].tolist() == [2, 0]  # f1 adds HR and RBI, A already wins
+    pitcher = standings.matchup_changes("A", "pitchers")
+    assert pitcher.loc[3, "categories"] == 0.5  # pf only ties SVHD at 30
+    swap = standings.matchup_changes("B", "pitchers", drop=2)
+    assert swap.loc[3, ["categories", "matchups"]].tolist() == [2.5, 1]  # pf for pb2 turns B's loss into a win
+
+
+def test_missing_rates_do_not_count(tiny):
+    tiny.hitters.loc[1, "OBP"] = np.nan
+    assert TRPStandings(tiny).totals().loc["A", "OBP"] == pytest.approx(0.300)
+
+
+def test_move_updates_only_the_sums(tiny):
+    standings = TRPStandings(tiny)
+    standings.move("B", "hitters", add=3, drop=2)
+    tiny.hitters.loc[3, "fantasyTeam"] = "B"
+    tiny.hitters.loc[2, "fantasyTeam"] = "FA"
+    pd.testing.assert_frame_equal(standings.totals(), TRPStandings(tiny).totals())
+    with pytest.raises(ValueError, match="not on"):
+        standings.move("A", "hitters", drop=3)
+
+
+def test_unknown_team_is_rejected(tiny):
+    with pytest.raises(ValueError, match="not a fantasy team"):
+        TRPStandings(tiny).matchup_changes("FA")
+
+
+def test_matchup_changes_agree_with_moves_on_the_cards(lm):
+    # every candidate's change is what actually moving them onto the team (and dropping drop) does
+    standings = TRPStandings(lm)
+    team = standings.teams[1]
+    drop = int(np.flatnonzero(standings.codes["pitchers"] == standings.teams.index(team))[0])
+    changes = standings.matchup_changes(team, "pitchers", drop=drop)
+    assert changes["matchups"].is_monotonic_decreasing
+    t = standings.teams.index(team)
+    before = standings.matchups().loc[team].drop(team).to_numpy()
+    for row in changes.index[:10]:
+        moved = copy.deepcopy(standings)
+        moved.move(team, "pitchers", add=lm.pitchers.index.get_loc(row), drop=drop)
+        after = moved._category_wins(moved.values[t], np.delete(moved.values, t, axis=0))
+        assert changes.loc[row, "categories"] == pytest.approx(after.sum() - before.sum())
+        total = len(standings.sign)
+        assert changes.loc[row, "matchups"] == (after > total - after).sum() - (before > total - before).sum()
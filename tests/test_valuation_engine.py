@@ -0,0 +1,94 @@
+# TRPValuationEngine: replacement levels and z-scores per slot, written out with plain pandas for comparison
+import numpy as np
+import pandas as pd
+import pytest
+
+from sources.Model.TRPLeagueConfig import TRPLeagueConfig
+from sources.Model.TRPLeagueManager import TRPLeagueManager
+from sources.Model.TRPValuationEngine import TRPValuationEngine
+
+SMALL = TRPLeagueConfig("small", teams=4)
+
+
+@pytest.fixture(scope="module")
+def engine(lm) -> TRPValuationEngine:
+    return TRPValuationEngine(lm, SMALL)
+
+
+def _board(lm: TRPLeagueManager, pos: str) -> pd.DataFrame:
+    # the slot's eligible players in the order they come off the board
+    kind = "pitchers" if pos in lm.arms else "hitters"
+    rank = TRPLeagueManager.rankColumns[kind]
+    return lm.pos_group(pos).sort_values(rank, ascending=rank in TRPLeagueManager.lowerIsBetter, kind="stable")
+
+
+def _categories(pos: str) -> list:
+    return TRPValuationEngine.pitcherCategories if pos in TRPLeagueManager.arms else \
+        TRPValuationEngine.hitterCategories
+
+
+@pytest.mark.parametrize("pos", TRPLeagueManager.bats + TRPLeagueManager.arms)
+def test_replacement_level_follows_the_starters(lm, engine, pos):
+    board = _board(lm, pos)[_categories(pos)]
+    starters = min(SMALL.starters(pos), len(board))
+    start = min(starters, max(len(board) - engine.replacement_window, 0))
+    expected = board.iloc[start:start + engine.replacement_window].mean()
+    kind = "pitchers" if pos in lm.arms else "hitters"
+    np.testing.assert_allclose(engine.replacement_levels(kind).loc[pos].to_numpy(), expected.to_numpy())
+
+
+@pytest.mark.parametrize("pos", ["OF", "C", "SP", "RP"])
+def test_slot_values_are_signed_z_scores(lm, engine, pos):
+    categories = _categories(pos)
+    board = _board(lm, pos)[categories]
+    scale = board.iloc[:SMALL.starters(pos)].std(ddof=0).replace(0, 1)
+    kind = "pitchers" if pos in lm.arms else "hitters"
+    replacement = engine.replacement_levels(kind).loc[pos]
+    signs = np.where([category in TRPLeagueManager.lowerIsBetter for category in categories], -1.0, 1.0)
+    expected = signs * (lm.pos_group(pos)[categories] - replacement) / scale
+    values = engine.slot_values(pos)
+    assert values.index.equals(lm.pos_group(pos).index)
+    np.testing.assert_allclose(values[["z" + category for category in categories]].to_numpy(), expected.to_numpy())
+    np.testing.assert_allclose(values["value"], expected.sum(axis=1))
+
+
+def test_lower_era_scores_higher(lm, engine):
+    values = engine.slot_values("SP")
+    era = lm.pos_group("SP")["ERA"]
+    assert values["zERA"].loc[era.idxmin()] == values["zERA"].max()
+    assert values["zERA"].loc[era.idxmax()] == values["zERA"].min()
+
+
+@pytest.mark.parametrize("kind", ["hitters", "pitchers"])
+def test_player_values_take_the_best_slot(lm, engine, kind):
+    values = engine.player_values(kind)
+    slots = lm.bats if kind == "hitters" else lm.arms
+    bySlot = pd.concat({slot: engine.slot_values(slot)["value"] for slot in slots}, axis=1)
+    bySlot = bySlot.reindex(getattr(lm, kind).index)
+    np.testing.assert_allclose(values["value"], bySlot.max(axis=1).fillna(-np.inf))
+    eligible = values["slot"].notna()
+    assert (values.loc[eligible, "slot"] == bySlot[eligible].idxmax(axis=1)).all()
+
+
+def test_values_do_not_depend_on_the_order_of_the_cards(lm, engine, league_of):
+    rng = np.random.default_rng(7)
+    shuffled = league_of(lm.hitters.iloc[rng.permutation(len(lm.hitters))],
+                         lm.pitchers.iloc[rng.permutation(len(lm.pitchers))])
+    other = TRPValuationEngine(shuffled, SMALL)
+    for kind in ("hitters", "pitchers"):
+        pd.testing.assert_frame_equal(other.replacement_levels(kind), engine.replacement_levels(kind))
+        pd.testing.assert_frame_equal(other.player_values(kind).sort_index(), engine.player_values(kind))
+
+
+def test_update_player_matches_a_full_revaluation(cards_dir):
+    lm = TRPLeagueManager(use_cache=False)
+    engine = TRPValuationEngine(lm, SMALL)
+    assert engine.update_player("hitters", 3, {"fantasyTeam": "FA"}) == []
+    changed = engine.update_player("hitters", 3, {"HR": 60, "wRAA": 80.0, "pos": "C"})
+    assert set(changed) >= {"C"}
+    changed = engine.update_player("pitchers", 10, {"ERA": 1.5, "xERA": 1.0})
+    assert set(changed) <= set(lm.arms) and changed
+    fresh = TRPValuationEngine(lm, SMALL)
+    for kind in ("hitters", "pitchers"):
+        pd.testing.assert_frame_equal(engine.replacement_levels(kind), fresh.replacement_levels(kind))
+        pd.testing.assert_frame_equal(engine.player_values(kind), fresh.player_values(kind))